@@ -24,7 +24,7 @@ if %ERRORLEVEL%==0 (
 set "MAIN=gallery_dl_manager.py"
 if not exist "%MAIN%" (
   echo Could not find %MAIN% in "%CD%"
-  echo Make sure this .bat sits next to %MAIN%.
+  echo Make sure this .bat sits next to %MAIN% and gdlm_app.py.
   pause
   exit /b 1
 )
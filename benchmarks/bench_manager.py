@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark for Gallery-DL Manager's own cost per URL.
+
+A fake `gallery_dl` package (configurable latency, exit codes and output volume) is put on
+PYTHONPATH and the manager is pointed at `python -m gallery_dl`. Each scenario then drives
+download_for_site() or the ALL flow (run_all) over synthetic URL lists with zero delays, in a
+fresh child process with its own temporary root, and reports:
+  - wall time, URLs/s, per-URL overhead (wall minus the fake's simulated latency)
+  - manager overhead beyond a bare `python -m gallery_dl` spawn (spawn baseline)
+  - peak RSS of the manager process
+Results are printed as JSON and appended to benchmarks/history.jsonl; each scenario is compared
+with its previous result there so regressions show up.
+
+  python benchmarks/bench_manager.py                      # sizes 10, 1000, 100000
+  python benchmarks/bench_manager.py --sizes 10,1000 --modes process,worker,batch --flows site
+"""
+
+from __future__ import annotations
+import os, sys, json, time, argparse, platform, subprocess, tempfile, shutil
+from pathlib import Path
+from typing import Dict, List, Optional
+
+HERE=Path(__file__).resolve().parent
+REPO=HERE.parent
+DEFAULT_HISTORY=HERE/"history.jsonl"
+
+# ----------------------------- FAKE GALLERY-DL -----------------------------
+# Importable (resident worker mode) and runnable as `python -m gallery_dl` (process/batch modes).
+FAKE_INIT = r'''
+import os, sys, time
+__version__ = "0.0-bench"
+def main():
+    args = sys.argv[1:]
+    latency = float(os.environ.get("BENCH_LATENCY", "0"))
+    lines = int(os.environ.get("BENCH_LINES", "1"))
+    fail_every = int(os.environ.get("BENCH_FAIL_EVERY", "0"))
+    fail_rc = int(os.environ.get("BENCH_FAIL_RC", "4"))
+    urls = [a for a in args if a.startswith("http")]
+    if "--input-file" in args:
+        with open(args[args.index("--input-file")+1], encoding="utf-8") as f: urls = [l.strip() for l in f if l.strip()]
+    errf = args[args.index("--error-file")+1] if "--error-file" in args else None
+    dest = args[args.index("--dest")+1] if "--dest" in args else "."
+    rc = 0
+    for u in urls:
+        if latency: time.sleep(latency)
+        n = int(u.rsplit("/", 1)[-1]) if u.rsplit("/", 1)[-1].isdigit() else 0
+        if fail_every and n % fail_every == 0:
+            sys.stderr.write("[bench][error] HttpError: '503 Service Unavailable' for '%s'\n" % u); rc |= fail_rc
+            if errf:
+                with open(errf, "a", encoding="utf-8") as f: f.write(u + "\n")
+            continue
+        for i in range(lines): sys.stdout.write("# %s/bench/%d_%d.bin\n" % (dest, n, i))
+    sys.stdout.flush()
+    return rc
+'''
+FAKE_CONFIG = "def clear(): pass\n"
+FAKE_JOB = "class Job:\n    ulog = None\n"
+FAKE_MAIN = "import sys\nfrom gallery_dl import main\nsys.exit(main())\n"
+
+def write_fake(pkg_root:Path):
+    pkg=pkg_root/"gallery_dl"; pkg.mkdir(parents=True, exist_ok=True)
+    for name,src in (("__init__.py",FAKE_INIT),("config.py",FAKE_CONFIG),("job.py",FAKE_JOB),("__main__.py",FAKE_MAIN)):
+        (pkg/name).write_text(src, encoding="utf-8")
+
+# ----------------------------- CHILD (one scenario) ------------------------
+def peak_rss_mb()->Optional[float]:
+    try: import resource
+    except ImportError: return None  # Windows
+    rss=resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss/(1024*1024) if sys.platform=="darwin" else rss/1024, 1)
+
+def relocate(m, root:Path):
+    """Point every manager folder/file under a scratch root."""
+    for k,v in m.relocated_paths(root).items(): setattr(m, k, v)
+    m.ensure_dirs()
+
+def run_child(spec:Dict)->Dict:
+    root=Path(tempfile.mkdtemp(prefix="gdlm-bench-"))
+    try:
+        write_fake(root/"fake")
+        os.environ["PYTHONPATH"]=str(root/"fake")+os.pathsep+os.environ.get("PYTHONPATH","")
+        os.environ.update({"BENCH_LATENCY":str(spec["latency"]), "BENCH_LINES":str(spec["lines"]),
+                           "BENCH_FAIL_EVERY":str(spec["fail_every"]), "BENCH_FAIL_RC":str(spec["fail_rc"])})
+        sys.path.insert(0, str(REPO))
+        import gdlm_app as m
+        relocate(m, root); m.HEADLESS.update(on=True, no_color=True)
+        n=spec["size"]; sites=max(1, spec["sites"]) if spec["flow"]=="all" else 1
+        for s in range(sites):
+            urls=[f"https://localhost/{s}/{i}" for i in range(s, n, sites)]
+            (m.DIR_URL_LISTS/f"site{s}.txt").write_text("\n".join(urls)+"\n", encoding="utf-8")
+        app=m.load_app_settings()
+        app.update({"gallery_dl_path":f"{sys.executable} -m gallery_dl", "max_parallel_sites":spec["jobs"],
+                    "execution_mode":"worker" if spec["mode"]=="worker" else "process"})
+        m.save_json(m.FILE_APP_SETTINGS, app)
+        cfg=m.load_site_settings()
+        for s in cfg: cfg[s].update({"delay_between_urls_sec":0,"base_sleep_sec":0,"jitter_sec":0.0,
+                                     "batch_size":spec["batch"] if spec["mode"]=="batch" else 0})
+        m.save_json(m.FILE_SITE_SETTINGS, cfg)
+
+        spawn=None
+        if spec.get("spawn_baseline"):
+            k=10; t=time.perf_counter()
+            for i in range(k): subprocess.run([sys.executable,"-m","gallery_dl","--dest",str(root),f"https://localhost/0/{i+1}"], stdout=subprocess.DEVNULL)
+            spawn=(time.perf_counter()-t)/k
+
+        real_stdout=sys.stdout; sys.stdout=open(os.devnull, "w")  # the echo is still paid for, just not shown
+        try:
+            t0=time.perf_counter()
+            if spec["flow"]=="site":
+                stats=m.RunStats(); m.download_for_site("site0", m.load_app_settings(), m.load_site_settings(), stats)
+            else:
+                stats,_=m.run_all(jobs=spec["jobs"])
+            wall=time.perf_counter()-t0
+        finally:
+            sys.stdout.close(); sys.stdout=real_stdout
+        simulated=n*spec["latency"]/(spec["jobs"] if spec["flow"]=="all" else 1)
+        res={"wall_sec":round(wall,3), "urls_per_sec":round(n/wall,2) if wall else None,
+             "overhead_ms_per_url":round((wall-simulated)/n*1000,3),
+             "attempted":stats.attempted, "ok":stats.succeeded, "fail":stats.failed,
+             "peak_rss_mb":peak_rss_mb()}
+        if spawn is not None: res["spawn_ms"]=round(spawn*1000,3)
+        return res
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+# ----------------------------- DRIVER --------------------------------------
+def scenario_name(spec:Dict)->str:
+    name=f"{spec['flow']}-{spec['mode']}-{spec['size']}"
+    if spec["flow"]=="all": name+=f"-s{spec['sites']}j{spec['jobs']}"
+    return name
+
+def git_rev()->Optional[str]:
+    try: return subprocess.check_output(["git","-C",str(REPO),"rev-parse","--short","HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except Exception: return None
+
+def last_results(history:Path)->Dict[str,Dict]:
+    last={}
+    if history.exists():
+        for line in history.read_text(encoding="utf-8", errors="ignore").splitlines():
+            try: rec=json.loads(line)
+            except Exception: continue
+            if rec.get("scenario"): last[rec["scenario"]]=rec
+    return last
+
+def main(argv:List[str])->int:
+    ap=argparse.ArgumentParser(description="Measure Gallery-DL Manager overhead and throughput against a fake gallery-dl.")
+    ap.add_argument("--sizes", default="10,1000,100000", help="URL list sizes (default 10,1000,100000)")
+    ap.add_argument("--modes", default="process,worker,batch", help="process, worker and/or batch (default all)")
+    ap.add_argument("--flows", default="site,all", help="site (download_for_site) and/or all (run_all)")
+    ap.add_argument("--max-spawn-urls", type=int, default=1000, help="skip process/worker scenarios above this size (default 1000)")
+    ap.add_argument("--batch", type=int, default=500, help="batch_size for batch mode (default 500)")
+    ap.add_argument("--sites", type=int, default=4, help="sites in the ALL flow (default 4)")
+    ap.add_argument("--jobs", type=int, default=2, help="max_parallel_sites in the ALL flow (default 2)")
+    ap.add_argument("--latency", type=float, default=0.0, help="fake gallery-dl seconds per URL (default 0)")
+    ap.add_argument("--lines", type=int, default=1, help="output lines per URL (default 1)")
+    ap.add_argument("--fail-every", type=int, default=0, help="every Nth URL fails (default 0 = never)")
+    ap.add_argument("--fail-rc", type=int, default=4, help="return code of failing URLs (default 4)")
+    ap.add_argument("--history", type=Path, default=DEFAULT_HISTORY, help=f"results file (default {DEFAULT_HISTORY.relative_to(REPO)})")
+    ap.add_argument("--no-save", action="store_true", help="don't append to the history file")
+    ap.add_argument("--child", help=argparse.SUPPRESS)
+    args=ap.parse_args(argv)
+    if args.child:
+        print(json.dumps(run_child(json.loads(args.child)))); return 0
+
+    prev=last_results(args.history); rev=git_rev(); failed=0; first=True
+    for flow in [f.strip() for f in args.flows.split(",") if f.strip()]:
+        for mode in [x.strip() for x in args.modes.split(",") if x.strip()]:
+            for size in [int(x) for x in args.sizes.split(",") if x.strip()]:
+                spec={"flow":flow,"mode":mode,"size":size,"batch":args.batch,"sites":args.sites,"jobs":args.jobs,
+                      "latency":args.latency,"lines":args.lines,"fail_every":args.fail_every,"fail_rc":args.fail_rc,
+                      "spawn_baseline":first}
+                name=scenario_name(spec)
+                if mode!="batch" and size>args.max_spawn_urls:
+                    print(f"{name}: skipped (> --max-spawn-urls {args.max_spawn_urls})", file=sys.stderr); continue
+                print(f"{name}: running...", file=sys.stderr)
+                proc=subprocess.run([sys.executable, __file__, "--child", json.dumps(spec)], capture_output=True, text=True)
+                if proc.returncode!=0 or not proc.stdout.strip():
+                    print(f"{name}: FAILED\n{proc.stderr[-2000:]}", file=sys.stderr); failed+=1; continue
+                res=json.loads(proc.stdout.strip().splitlines()[-1]); first=False
+                spawn=res.pop("spawn_ms", None)
+                if spawn is not None: args._spawn_ms=spawn
+                base=getattr(args, "_spawn_ms", None)
+                if base is not None and mode=="process" and flow=="site": res["manager_ms_per_url"]=round(res["overhead_ms_per_url"]-base,3)
+                rec={"scenario":name,"ts":time.strftime("%Y-%m-%dT%H:%M:%S"),"git":rev,"python":platform.python_version(),
+                     "platform":platform.platform(terse=True),"spec":{k:v for k,v in spec.items() if k!="spawn_baseline"},
+                     **({"spawn_ms":base} if base is not None else {}),**res}
+                old=prev.get(name)
+                if old and old.get("overhead_ms_per_url"):
+                    rec["vs_previous_pct"]=round((res["overhead_ms_per_url"]/old["overhead_ms_per_url"]-1)*100,1)
+                print(json.dumps(rec))
+                if not args.no_save:
+                    with open(args.history, "a", encoding="utf-8") as f: f.write(json.dumps(rec)+"\n")
+    return 1 if failed else 0
+
+if __name__=="__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,3284 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Gallery-DL Manager v1.0.2
+- NEW: Sleep mode 'item' → Base sleep ± Jitter is passed as --sleep low-high to gallery-dl (per-file random sleep)
+- Validation: in Settings, if Jitter > Base and mode=item, it re-prompts (prevents negative ranges)
+- Lines starting with '#', '-', '*' in URL-Lists are ignored (in addition to blanks/numbers)
+- All v1.0.1 features retained: themes, color toggle, Ctrl+C menu, CMD titles, updater,
+  backups, links builder, per-site settings, run logs, etc.
+"""
+
+from __future__ import annotations
+import os, sys, json, time, datetime as dt, shlex, re, signal, threading, copy
+# subprocess, zipfile, socket, ctypes, random, sqlite3... are imported where used so that
+# `gallery_dl_manager.py --help` / `stats` start fast (see cli_main)
+from pathlib import Path
+from typing import Dict, List, Tuple, Optional, Iterator, Sequence
+
+APP_NAME = "Gallery-DL Manager"
+APP_VERSION = "v1.0.2"
+
+# ----------------------------- THEMES & UI ---------------------------------
+THEMES = {
+    "default": {
+        "RESET":"\033[0m","CYAN":"\033[36m","YELLOW":"\033[33m","GREEN":"\033[32m",
+        "RED":"\033[31m","MAGENTA":"\033[35m","WHITE":"\033[97m","BLUE":"\033[34m",
+        "TITLE":"\033[36m",
+    },
+    "bright": {
+        "RESET":"\033[0m","CYAN":"\033[96m","YELLOW":"\033[33m","GREEN":"\033[92m",
+        "RED":"\033[31m","MAGENTA":"\033[95m","WHITE":"\033[97m","BLUE":"\033[94m",
+        "TITLE":"\033[33m",
+    },
+    "high_contrast": {
+        "RESET":"\033[0m","CYAN":"\033[96m","YELLOW":"\033[33m","GREEN":"\033[92m",
+        "RED":"\033[91m","MAGENTA":"\033[95m","WHITE":"\033[97m","BLUE":"\033[94m",
+        "TITLE":"\033[97m",
+    },
+    "mono": {
+        "RESET":"\033[0m","CYAN":"\033[0m","YELLOW":"\033[0m","GREEN":"\033[0m",
+        "RED":"\033[0m","MAGENTA":"\033[0m","WHITE":"\033[0m","BLUE":"\033[0m",
+        "TITLE":"\033[0m",
+    },
+}
+
+# runtime color vars (filled by apply_theme)
+RESET=CYAN=YELLOW=GREEN=RED=MAGENTA=WHITE=BLUE=TITLE=None
+USE_COLOR=True  # can be toggled in settings
+HEADLESS={"on": False, "no_color": False}  # set by cli_main(): no prompts, no screen clearing
+
+def apply_theme(name: str):
+    t = THEMES.get(name, THEMES["default"])
+    global RESET, CYAN, YELLOW, GREEN, RED, MAGENTA, WHITE, BLUE, TITLE
+    RESET=t["RESET"]; CYAN=t["CYAN"]; YELLOW=t["YELLOW"]; GREEN=t["GREEN"]
+    RED=t["RED"]; MAGENTA=t["MAGENTA"]; WHITE=t["WHITE"]; BLUE=t["BLUE"]
+    TITLE=t["TITLE"]
+
+def c(t, col): return f"{col}{t}{RESET}" if USE_COLOR else t
+
+def banner(title: str, root: Path):
+    line = c("="*60, CYAN)
+    print(line)
+    print(c(f"  {title}   ", TITLE), c(f"Root: {root}", WHITE))
+    print(line)
+
+def section(title: str):
+    print()
+    print(c(title, YELLOW))
+
+def prompt(label: str) -> str:
+    return input(c(label, GREEN))
+
+def set_console_title(title: str):
+    if os.name == "nt":
+        try:
+            import ctypes
+            ctypes.windll.kernel32.SetConsoleTitleW(str(title))
+        except Exception:
+            pass
+
+# ----------------------------- PATHS/DEFAULTS ------------------------------
+ROOT=Path(__file__).resolve().parent
+DIR_DOWNLOADS=ROOT/"Downloads"; DIR_LINKS=ROOT/"Links"; DIR_URL_LISTS=ROOT/"URL-Lists"
+DIR_CONFIG=ROOT/"config"; DIR_ARCHIVES=ROOT/"archives"; DIR_LOGS=ROOT/"logs"; DIR_BACKUPS=ROOT/"backups"
+FILE_APP_SETTINGS=DIR_CONFIG/"app-settings.json"; FILE_SITE_SETTINGS=DIR_CONFIG/"site-delays.json"
+FILE_URL_STATE=DIR_CONFIG/"url-state.sqlite"; FILE_DNS_CACHE=DIR_CONFIG/"dns-cache.json"
+FILE_HOST_PACING=DIR_CONFIG/"host-pacing.json"; FILE_HISTORY=DIR_LOGS/"history.sqlite"
+FILE_DEDUP_INDEX=DIR_CONFIG/"dedup-index.sqlite"; DIR_URL_CACHE=DIR_CONFIG/"url-cache"
+GDL_OPTIONS_URL="https://github.com/mikf/gallery-dl/blob/master/docs/options.md"
+
+def relocated_paths(root:Path)->Dict[str,Path]:
+    """ROOT and every DIR_*/FILE_* under it, moved to `root` (for tests and benchmarks in a scratch folder).
+    Scans the module at call time, so paths defined further down are included."""
+    out={"ROOT":root}
+    for k,v in list(globals().items()):
+        if (k.startswith("DIR_") or k.startswith("FILE_")) and isinstance(v, Path):
+            try: out[k]=root/v.relative_to(ROOT)
+            except ValueError: pass
+    return out
+
+DEFAULT_DELAY=30
+DEFAULT_BASE_SLEEP=1
+DEFAULT_JITTER=1.0
+
+# want: Ctrl+C pending, stop: user chose Abort (all workers), gen: Ctrl+C count,
+# act/act_gen: the answer to the last prompt and the Ctrl+C it covers (shared by every interrupted worker)
+ABORT = {"want": False, "stop": False, "gen": 0, "act": None, "act_gen": 0}
+_SIGINT_LOCK = threading.Lock()
+_WAKE = threading.Condition()  # notified on Ctrl+C/SIGTERM, Abort and whenever a gallery-dl child reports back
+
+def wake_waiters():
+    with _WAKE: _WAKE.notify_all()
+
+def wait_until(pred, timeout:Optional[float]=None)->bool:
+    """Block until pred() holds (→ True) or timeout passes; woken by wake_waiters(), not by polling.
+    On Windows a blocked main thread can't run the Ctrl+C handler, so it looks up once a second."""
+    end=None if timeout is None else time.time()+timeout
+    with _WAKE:
+        while not pred():
+            left=None if end is None else end-time.time()
+            if left is not None and left<=0: return False
+            if os.name=="nt": left=1.0 if left is None else min(left, 1.0)
+            _WAKE.wait(left)
+    return True
+
+def _sigint_handler(signum, frame):
+    ABORT["gen"] += 1; ABORT["want"] = True  # gen first: a worker that sees want also sees its gen
+    # The handler may interrupt the main thread inside _WAKE itself: notify from another thread.
+    threading.Thread(target=wake_waiters, daemon=True).start()
+signal.signal(signal.SIGINT, _sigint_handler)
+
+# ----------------------------- UTILITIES -----------------------------------
+def now_ts(): return dt.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+def ts_for_filename(): return dt.datetime.now().strftime("%Y%m%d-%H%M%S")
+def ensure_dirs():
+    for d in [DIR_DOWNLOADS,DIR_LINKS,DIR_URL_LISTS,DIR_CONFIG,DIR_ARCHIVES,DIR_LOGS,DIR_BACKUPS]:
+        d.mkdir(parents=True, exist_ok=True)
+def load_json(p:Path,default):
+    if p.exists():
+        try: return json.loads(p.read_text(encoding="utf-8"))
+        except Exception: return default
+    return default
+def save_json(p:Path,data):
+    """Atomic write: temp file in the same folder, fsync, then rename over the target."""
+    p.parent.mkdir(parents=True, exist_ok=True)
+    tmp=p.with_name(f"{p.name}.{os.getpid()}-{threading.get_ident()}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(json.dumps(data, indent=2, ensure_ascii=False)); f.flush(); os.fsync(f.fileno())
+    for attempt in range(5):
+        try: os.replace(tmp, p); break
+        except PermissionError:  # Windows: target briefly held open by a reader/AV scanner
+            if attempt==4: raise
+            time.sleep(0.1)
+    with _SETTINGS_LOCK: _SETTINGS_CACHE.pop(p, None)
+def file_sig(p:Path)->Optional[Tuple[int,int]]:
+    """(mtime_ns, size) or None if missing — cheap change detection for cached files."""
+    try: st=p.stat(); return (st.st_mtime_ns, st.st_size)
+    except OSError: return None
+def clear_screen():
+    if not HEADLESS["on"]: os.system("cls" if os.name=="nt" else "clear")
+def which(cmd:str)->Optional[str]:
+    from shutil import which as _which; return _which(cmd)
+def input_default(prompt_txt:str, default_val:str)->str:
+    s=input(c(f"{prompt_txt} [{default_val}]: ", YELLOW)).strip()
+    return s if s else default_val
+def _normalize_args_to_string(val)->str:
+    if isinstance(val, list):
+        flat=[]
+        for x in val:
+            if isinstance(x, list): flat += [str(i) for i in x]
+            else: flat.append(str(x))
+        return " ".join(flat).strip()
+    return str(val or "").strip()
+
+# ----------------------------- SETTINGS ------------------------------------
+# Settings files are read once and re-read only when their mtime/size changes, so the per-URL
+# loop can call load_app_settings() freely (live edits still apply on the next URL).
+_SETTINGS_CACHE: Dict[Path, Tuple[object, Dict]] = {}
+_SETTINGS_LOCK = threading.RLock()
+_SITES_CACHE = {"sig": None, "sites": []}
+
+def _cached_settings(p:Path, normalize, extra_key=None)->Dict:
+    with _SETTINGS_LOCK:
+        key=(file_sig(p), extra_key); hit=_SETTINGS_CACHE.get(p)
+        if hit and hit[0]==key: return copy.deepcopy(hit[1])
+        raw=load_json(p, {})
+        data=normalize(copy.deepcopy(raw))
+        if data!=raw or key[0] is None:   # write back only when normalization changed something
+            save_json(p, data); key=(file_sig(p), extra_key)
+        _SETTINGS_CACHE[p]=(key, data)
+        return copy.deepcopy(data)
+
+def _normalize_app_settings(s:Dict)->Dict:
+    if "gallery_dl_path" not in s: s["gallery_dl_path"]=None
+    if "global_extra_args" not in s: s["global_extra_args"]=""
+    if "use_color" not in s: s["use_color"]=True
+    if "theme" not in s: s["theme"]="default"
+    if "max_parallel_sites" not in s: s["max_parallel_sites"]=1
+    if s.get("execution_mode") not in ("process","worker"): s["execution_mode"]="process"
+    if "preflight_timeout_sec" not in s: s["preflight_timeout_sec"]=10
+    if "dns_cache_ttl_sec" not in s: s["dns_cache_ttl_sec"]=3600
+    if "log_keep_days" not in s: s["log_keep_days"]=30            # older run-*.json are zipped into logs/archive/
+    if "history_keep_days" not in s: s["history_keep_days"]=365   # per-URL rows kept in logs/history.sqlite
+    if "dedup_mode" not in s: s["dedup_mode"]="hardlink"          # hardlink | reflink | report
+    if "dedup_after_run" not in s: s["dedup_after_run"]=False     # dedup Downloads/ after each run
+    if "dedup_min_size" not in s: s["dedup_min_size"]=1024
+    if "archive_wal" not in s: s["archive_wal"]="auto"            # WAL journal for archives/*.sqlite (auto: off on network shares)
+    if "archive_vacuum_days" not in s: s["archive_vacuum_days"]=30
+    if "archive_analyze_days" not in s: s["archive_analyze_days"]=7
+    if "archive_maint_after_run" not in s: s["archive_maint_after_run"]=True  # due VACUUM/ANALYZE after runs
+    if "bandwidth_limit" not in s: s["bandwidth_limit"]=0         # bytes/s for all downloads together, e.g. "5M" (0 = unlimited)
+    if "max_concurrent_processes" not in s: s["max_concurrent_processes"]=0  # gallery-dl runs at once (0 = one per running site)
+    if "max_processes_per_host" not in s: s["max_processes_per_host"]=0
+    if "backup_keep" not in s: s["backup_keep"]=10                # incremental snapshots kept (0 = all)
+    if "metrics_port" not in s: s["metrics_port"]=0               # >0: serve /metrics on 127.0.0.1
+    if "daemon_times" not in s: s["daemon_times"]=[]            # e.g. ["02:00"] → daemon runs ALL then
+    if "daemon_every_minutes" not in s: s["daemon_every_minutes"]=0
+    s["global_extra_args"]=_normalize_args_to_string(s.get("global_extra_args",""))
+    return s
+
+def load_app_settings()->Dict:
+    s=_cached_settings(FILE_APP_SETTINGS, _normalize_app_settings)
+    # reflect prefs
+    global USE_COLOR; USE_COLOR = bool(s.get("use_color", True)) and not HEADLESS["no_color"]
+    apply_theme(s.get("theme","default"))
+    return s
+
+def get_sites()->List[str]:
+    """Sites are URL-Lists/<site>.txt files and URL-Lists/<site>/ folders of *.txt shards."""
+    top=file_sig(DIR_URL_LISTS)  # directory mtime changes when lists are added/removed/renamed
+    if top is None: return []
+    try: dirs=sorted(e.name for e in os.scandir(DIR_URL_LISTS) if e.is_dir())
+    except OSError: dirs=[]
+    sig=(top, tuple((d, file_sig(DIR_URL_LISTS/d)) for d in dirs))  # shards added to an existing folder
+    with _SETTINGS_LOCK:
+        if sig!=_SITES_CACHE["sig"]:
+            sites={p.stem for p in DIR_URL_LISTS.glob("*.txt")}
+            sites.update(d for d in dirs if any((DIR_URL_LISTS/d).glob("*.txt")))
+            _SITES_CACHE["sites"]=sorted(sites); _SITES_CACHE["sig"]=sig
+        return list(_SITES_CACHE["sites"])
+
+def seed_site_defaults(site_cfg:Dict[str,Dict], sites:List[str])->bool:
+    changed=False
+    for s in sites:
+        if s not in site_cfg:
+            site_cfg[s]={
+                "delay_between_urls_sec": DEFAULT_DELAY,
+                "base_sleep_sec": DEFAULT_BASE_SLEEP,
+                "jitter_sec": DEFAULT_JITTER,
+                "sleep_mode": "url",        # NEW (url | item)
+                "batch_size": 0,            # >1: URLs per gallery-dl call (item mode or delay=0 only)
+                "min_recheck_hours": 0,     # >0: skip URLs checked more recently (doubles per empty run)
+                "max_recheck_hours": 168,
+                "adaptive_delay": False,    # True: per-host AIMD delay within min/max_delay_sec
+                "min_delay_sec": 5,
+                "max_delay_sec": 300,
+                "retry_max_attempts": 0,    # >0: failed URLs are retried after the main pass
+                "retry_backoff_sec": 60,    # doubles per attempt
+                "retry_on_rc": [1, 4],      # gallery-dl rc bits worth retrying (1=general, 4=HTTP)
+                "url_order": "file",        # file | yield (productive and overdue URLs first)
+                "max_run_minutes": 0,       # >0: stop starting new URLs of this site after N minutes
+                "dest_pool": [],            # [{"path": "E:/gdl", "weight": 1, "min_free_gb": 20}, ...]; empty = Downloads/
+                "min_free_gb": 0,           # hold URLs back when no destination has this much free
+                "extra_args": ""
+            }
+            changed=True
+    return changed
+
+def _normalize_site_settings(s:Dict[str,Dict])->Dict[str,Dict]:
+    for site,cfg in list(s.items()):
+        if "delay_between_urls_sec" not in cfg: cfg["delay_between_urls_sec"]=DEFAULT_DELAY
+        if "base_sleep_sec" not in cfg: cfg["base_sleep_sec"]=DEFAULT_BASE_SLEEP
+        if "jitter_sec" not in cfg: cfg["jitter_sec"]=DEFAULT_JITTER
+        if "sleep_mode" not in cfg: cfg["sleep_mode"]="url"  # NEW
+        if "batch_size" not in cfg: cfg["batch_size"]=0
+        if "min_recheck_hours" not in cfg: cfg["min_recheck_hours"]=0
+        if "max_recheck_hours" not in cfg: cfg["max_recheck_hours"]=168
+        if "adaptive_delay" not in cfg: cfg["adaptive_delay"]=False
+        if "min_delay_sec" not in cfg: cfg["min_delay_sec"]=5
+        if "max_delay_sec" not in cfg: cfg["max_delay_sec"]=300
+        if "retry_max_attempts" not in cfg: cfg["retry_max_attempts"]=0
+        if "retry_backoff_sec" not in cfg: cfg["retry_backoff_sec"]=60
+        if "retry_on_rc" not in cfg: cfg["retry_on_rc"]=[1,4]
+        if "url_order" not in cfg: cfg["url_order"]="file"
+        if "max_run_minutes" not in cfg: cfg["max_run_minutes"]=0
+        if "dest_pool" not in cfg: cfg["dest_pool"]=[]
+        if "min_free_gb" not in cfg: cfg["min_free_gb"]=0
+        extra=_normalize_args_to_string(cfg.get("extra_args",""))
+        # If base sleep > 0 and mode=url, strip any --sleep from extra args (avoid double sleeping)
+        if cfg.get("base_sleep_sec", DEFAULT_BASE_SLEEP)>0 and cfg.get("sleep_mode","url")=="url" and extra:
+            toks=shlex.split(extra); kept=[]; i=0
+            while i<len(toks):
+                if toks[i]=="--sleep" and i+1<len(toks): i+=2; continue
+                kept.append(toks[i]); i+=1
+            extra=" ".join(kept)
+        if extra!=cfg.get("extra_args",""): cfg["extra_args"]=extra
+    seed_site_defaults(s, get_sites())
+    return s
+
+def load_site_settings()->Dict[str,Dict]:
+    sites=get_sites()
+    return _cached_settings(FILE_SITE_SETTINGS, _normalize_site_settings, extra_key=tuple(sites))
+
+# ----------------------------- URL LISTS -----------------------------------
+# A site's list is URL-Lists/<site>.txt followed by URL-Lists/<site>/*.txt (name order). Lines are
+# streamed, duplicates dropped by url_key(), and the parsed list is cached until a file changes.
+_URL_LISTS: Dict[str,Dict] = {}
+_URL_LISTS_LOCK = threading.Lock()
+
+def site_list_files(site:str)->List[Path]:
+    f=DIR_URL_LISTS/f"{site}.txt"; d=DIR_URL_LISTS/site
+    return ([f] if f.is_file() else []) + (sorted(d.glob("*.txt")) if d.is_dir() else [])
+
+def site_list_sig(site:str)->Tuple:
+    return tuple((p.name, file_sig(p)) for p in site_list_files(site))
+
+_URL_KEY_RE=re.compile(r"([A-Za-z][\w+.-]*)://([^/?#]*)([^?#]*)(\?[^#]*)?")
+
+def url_key(url:str)->str:
+    """Identity used for dedup: http/https, host case, default port, trailing slash and #fragment
+    don't make a different URL."""
+    m=_URL_KEY_RE.match(url)
+    if not m: return url
+    scheme,host,path,query=m.groups(); scheme=scheme.lower(); host=host.lower()
+    if scheme=="http": scheme="https"
+    if host.endswith((":80",":443")): host=host.rsplit(":",1)[0]
+    return f"{scheme}://{host}{path.rstrip('/')}{query or ''}"
+
+def iter_site_urls(site:str, info:Optional[Dict]=None)->Iterator[str]:
+    """Yield a site's URLs lazily, first occurrence wins. Blanks, comments, disabled markers and
+    stray numeric indices are skipped; info["dupes"] counts dropped duplicates."""
+    seen=set()
+    for p in site_list_files(site):
+        try: fh=open(p, encoding="utf-8-sig", errors="ignore")
+        except OSError: continue
+        with fh:
+            for ln in fh:
+                ln=ln.strip()
+                if not ln or ln.startswith(("#","-","*")) or ln.isdigit(): continue
+                k=url_key(ln)
+                if k in seen:
+                    if info is not None: info["dupes"]=info.get("dupes",0)+1
+                    continue
+                seen.add(k); yield ln
+
+def _url_cache_load(site:str, sig:str)->Optional[Dict]:
+    """Parsed list from config/url-cache/<site>.txt: a JSON header line (list signature, dupes), then
+    the deduplicated URLs one per line. None if missing or written for other list files."""
+    try:
+        with open(DIR_URL_CACHE/f"{site}.txt", "r", encoding="utf-8") as f:
+            head=json.loads(f.readline() or "{}")
+            if head.get("sig")!=sig: return None
+            body=f.read()
+    except (OSError, ValueError): return None
+    return {"sig":sig, "urls":tuple(body.split("\n")) if body else (), "dupes":head.get("dupes",0)}
+
+def _url_cache_save(site:str, hit:Dict):
+    p=DIR_URL_CACHE/f"{site}.txt"; tmp=p.with_suffix(".tmp")
+    try:
+        p.parent.mkdir(parents=True, exist_ok=True)
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(json.dumps({"sig":hit["sig"], "dupes":hit["dupes"]})+"\n"); f.write("\n".join(hit["urls"]))
+        os.replace(tmp, p)
+    except OSError: pass  # read-only config: parse again next time
+
+def read_site_urls(site:str, info:Optional[Dict]=None)->Tuple[str,...]:
+    """The site's parsed, deduplicated URLs (shared, read-only tuple). Parsed once per change of its
+    list files: cached in memory and in config/url-cache/, so later processes (CLI runs, cron, the
+    daemon) read the finished list instead of parsing and deduplicating it again."""
+    sig=json.dumps(site_list_sig(site))
+    with _URL_LISTS_LOCK:
+        hit=_URL_LISTS.get(site)
+    if not hit or hit["sig"]!=sig:
+        hit=_url_cache_load(site, sig)
+        if hit is None:
+            parsed: Dict={}; hit={"sig":sig, "urls":tuple(iter_site_urls(site, parsed)), "dupes":parsed.get("dupes",0)}
+            _url_cache_save(site, hit)
+        with _URL_LISTS_LOCK: _URL_LISTS[site]=hit
+    if info is not None: info["dupes"]=hit["dupes"]
+    return hit["urls"]
+
+# ----------------------------- URL STATE -----------------------------------
+# Per (site, URL) history in config/url-state.sqlite: last attempt/success, rc, duration and how
+# many new items the last runs produced. Drives the min_recheck_hours refresh policy.
+_URL_STATE = {"conn": None}
+_URL_STATE_LOCK = threading.Lock()
+
+def _url_state_db():
+    if _URL_STATE["conn"] is None:
+        import sqlite3
+        FILE_URL_STATE.parent.mkdir(parents=True, exist_ok=True)
+        conn=sqlite3.connect(str(FILE_URL_STATE), timeout=30, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL"); conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("""CREATE TABLE IF NOT EXISTS url_state(
+            site TEXT NOT NULL, url TEXT NOT NULL,
+            last_attempt REAL, last_success REAL, last_rc INTEGER, last_duration REAL, last_new_items INTEGER,
+            attempts INTEGER NOT NULL DEFAULT 0, successes INTEGER NOT NULL DEFAULT 0,
+            total_new_items INTEGER NOT NULL DEFAULT 0, zero_streak INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY(site, url))""")
+        conn.commit(); _URL_STATE["conn"]=conn
+    return _URL_STATE["conn"]
+
+def url_state_for_site(site:str)->Dict[str,Dict]:
+    with _URL_STATE_LOCK:
+        conn=_url_state_db(); cur=conn.execute("SELECT * FROM url_state WHERE site=?", (site,))
+        cols=[d[0] for d in cur.description]
+        return {row[1]: dict(zip(cols,row)) for row in cur.fetchall()}
+
+def url_state_record(site:str, url:str, rc:int, duration:float, new_items:Optional[int]=None):
+    """Record one attempt. new_items=None means unknown (e.g. batched runs) and leaves the
+    empty-run streak untouched."""
+    ok=1 if rc==0 else 0; now=time.time()
+    with _URL_STATE_LOCK:
+        conn=_url_state_db()
+        conn.execute("""INSERT INTO url_state(site,url,last_attempt,last_success,last_rc,last_duration,last_new_items,
+                                              attempts,successes,total_new_items,zero_streak)
+            VALUES(?,?,?,?,?,?,?,1,?,?,?)
+            ON CONFLICT(site,url) DO UPDATE SET
+                last_attempt=excluded.last_attempt, last_rc=excluded.last_rc, last_duration=excluded.last_duration,
+                last_success=COALESCE(excluded.last_success, last_success),
+                last_new_items=CASE WHEN ? THEN excluded.last_new_items ELSE last_new_items END,
+                attempts=attempts+1, successes=successes+excluded.successes,
+                total_new_items=total_new_items+excluded.total_new_items,
+                zero_streak=CASE WHEN NOT ? OR excluded.last_new_items IS NULL THEN zero_streak
+                                 WHEN excluded.last_new_items=0 THEN zero_streak+1 ELSE 0 END""",
+            (site, url, now, now if ok else None, rc, round(duration,2), new_items if ok else None,
+             ok, (new_items or 0) if ok else 0, 1 if ok and new_items==0 else 0, ok, ok))
+        conn.commit()
+
+def recheck_interval_hours(row:Optional[Dict], cfg:Dict)->float:
+    """min_recheck_hours, doubled for every consecutive successful run that found nothing new,
+    capped at max_recheck_hours."""
+    base=float(cfg.get("min_recheck_hours", 0) or 0)
+    if base<=0 or not row: return 0.0
+    cap=max(base, float(cfg.get("max_recheck_hours", 168) or base))
+    return min(cap, base*(2**min(int(row.get("zero_streak") or 0), 16)))
+
+def url_is_due(row:Optional[Dict], cfg:Dict, now:Optional[float]=None)->bool:
+    if not row or row.get("last_rc")!=0 or not row.get("last_attempt"): return True  # new or last attempt failed
+    hours=recheck_interval_hours(row, cfg)
+    return hours<=0 or ((now or time.time())-row["last_attempt"])>=hours*3600
+
+def url_priority(row:Optional[Dict], cfg:Dict, now:float)->float:
+    """Higher runs earlier with url_order=yield: average new items per successful check (+1, so
+    empty URLs still age) times how overdue the URL is relative to its recheck interval (24h when
+    the site has no refresh policy). Never-checked URLs come first."""
+    if not row or not row.get("last_attempt"): return float("inf")
+    avg=(row.get("total_new_items") or 0)/max(1, row.get("successes") or 0)
+    interval=recheck_interval_hours(row, cfg) or 24.0
+    return (avg+1)*max(0.0, now-row["last_attempt"])/3600/interval
+
+def order_urls_by_yield(urls:Sequence[str], state:Dict[str,Dict], cfg:Dict, now:Optional[float]=None)->List[str]:
+    now=now or time.time(); pos={u:i for i,u in enumerate(urls)}
+    return sorted(urls, key=lambda u: (-url_priority(state.get(u), cfg, now), pos[u]))  # ties keep file order
+
+def archive_item_count(archive:Path)->Optional[int]:
+    """Rows in a gallery-dl download archive (read-only; a full scan, so for reports only)."""
+    if not archive.exists(): return 0
+    try:
+        import sqlite3
+        conn=sqlite3.connect(f"file:{archive.as_posix()}?mode=ro", uri=True, timeout=10)
+        try: return int(conn.execute("SELECT COUNT(*) FROM archive").fetchone()[0])
+        finally: conn.close()
+    except Exception:
+        return None
+
+# ----------------------------- GALLERY-DL ----------------------------------
+# Tool discovery is cached: the PATH probe per (gallery_dl_path, PATH) while the resolved file is
+# unchanged, the installed version per invocation in config/tool-cache.json (keyed on the
+# executable or package file's mtime/size), and PyPI's latest version for LATEST_TTL_SEC,
+# refreshed in a background thread so menus never wait on pip.
+FILE_TOOL_CACHE=DIR_CONFIG/"tool-cache.json"
+LATEST_TTL_SEC=6*3600
+_TOOLS: Dict[str,object] = {"find": None, "disk": None, "refreshing": False}
+_TOOLS_LOCK = threading.Lock()
+
+def _tool_cache()->Dict:
+    if _TOOLS["disk"] is None: _TOOLS["disk"]=load_json(FILE_TOOL_CACHE, {"versions":{}, "latest":None, "latest_at":0})
+    return _TOOLS["disk"]
+
+def find_gallery_dl(app:Dict, refresh:bool=False)->Tuple[Optional[str], Optional[str]]:
+    key=[app.get("gallery_dl_path"), os.environ.get("PATH","")]
+    with _TOOLS_LOCK:  # held while probing, so parallel sites wait for one probe instead of each doing it
+        hit=_TOOLS["find"]
+        if not refresh and hit and hit["key"]==key and hit["sig"]==file_sig(Path(hit["value"][1])): return hit["value"]
+        value=_find_gallery_dl(app)
+        if value[0]: _TOOLS["find"]={"key":key, "value":value, "sig":file_sig(Path(value[1]))}  # misses aren't cached: a fresh install is found right away
+        return value
+
+def _find_gallery_dl(app:Dict)->Tuple[Optional[str], Optional[str]]:
+    path=app.get("gallery_dl_path")
+    if path and Path(path.split()[0]).exists():
+        exe = path.split()[0]
+        resolved = which(exe) if " " not in path else which(exe)
+        return path, resolved or exe
+    for candidate in ["gallery-dl","gallery_dl","python -m gallery_dl","py -m gallery_dl"]:
+        exe = which(candidate.split()[0]) if " " not in candidate else which(candidate.split()[0])
+        if exe: return candidate, exe
+    return None, None
+
+def interpreter_for_script(script_path:str)->Optional[str]:
+    try:
+        with open(script_path, "r", encoding="utf-8") as f:
+            first=f.readline().strip()
+        if first.startswith("#!"): return first[2:].strip().strip('"')
+    except Exception:
+        pass
+    return None
+
+def gallery_dl_version(invocation:str, resolved:Optional[str]=None, refresh:bool=False)->str:
+    """Installed version, spawned only when the invocation's executable (or, for `-m gallery_dl`,
+    the package's version.py) changed since the last probe."""
+    with _TOOLS_LOCK:
+        hit=_tool_cache()["versions"].get(invocation)
+        if not refresh and hit and hit["sig"]==list(file_sig(Path(hit["stamp"])) or []): return hit["version"]
+    import subprocess
+    toks=invocation.split(" ")
+    try:
+        if "-m" in toks:  # the interpreter doesn't change on upgrade; the package does
+            out=subprocess.check_output(toks[:toks.index("-m")]+["-c", "import gallery_dl as g,os;print(g.__version__);print(os.path.dirname(g.__file__))"],
+                                        text=True, stderr=subprocess.STDOUT, timeout=30).strip().splitlines()
+            version, stamp = out[0].strip(), str(Path(out[-1].strip())/"version.py")
+        else:
+            version=subprocess.check_output(toks+["--version"], text=True, stderr=subprocess.STDOUT, timeout=30).strip()
+            stamp=resolved or which(toks[0]) or toks[0]
+    except Exception as e:
+        return f"(failed: {e})"
+    sig=file_sig(Path(stamp))
+    if sig:
+        with _TOOLS_LOCK:
+            _tool_cache()["versions"][invocation]={"version":version, "stamp":stamp, "sig":list(sig)}; save_json(FILE_TOOL_CACHE, _TOOLS["disk"])
+    return version
+
+def latest_gallery_dl_version(refresh:bool=False)->Optional[str]:
+    """Cached latest version on PyPI (None until the first lookup finished). A stale or forced
+    lookup runs in the background; the cached value is returned right away."""
+    with _TOOLS_LOCK:
+        cache=_tool_cache(); stale=refresh or time.time()-float(cache.get("latest_at") or 0)>=LATEST_TTL_SEC
+        if stale and not _TOOLS["refreshing"]:
+            _TOOLS["refreshing"]=True; threading.Thread(target=_refresh_latest, daemon=True, name="pypi-latest").start()
+        return cache.get("latest")
+
+def latest_check_running()->bool:
+    return bool(_TOOLS["refreshing"])
+
+def _refresh_latest():
+    try:
+        latest=_pip_latest_version()
+        with _TOOLS_LOCK:
+            cache=_tool_cache(); cache["latest_at"]=time.time()
+            if latest: cache["latest"]=latest
+            save_json(FILE_TOOL_CACHE, cache)
+    finally:
+        _TOOLS["refreshing"]=False
+
+def _pip_latest_version()->Optional[str]:
+    import subprocess
+    exe = which("pip") or which("pip3") or which("py")
+    if not exe: return None
+    try:
+        cmdline = [exe,"index","versions","gallery-dl"] if "py" not in exe else [exe,"-m","pip","index","versions","gallery-dl"]
+        out = subprocess.check_output(cmdline, text=True, stderr=subprocess.STDOUT, timeout=30)
+        for line in out.splitlines():
+            if "LATEST:" in line.upper(): return line.split(":",1)[1].strip()
+        m=re.search(r"\b\d+\.\d+\.\d+\b", out); return m.group(0) if m else None
+    except Exception: return None
+
+def matching_pip_for(invocation:str, resolved_path:str)->Optional[List[str]]:
+    if invocation and (invocation.startswith("python ") or invocation.startswith("py ")):
+        interp = invocation.split()[0]
+        return [interp, "-m", "pip"]
+    if resolved_path:
+        sheb = interpreter_for_script(resolved_path)
+        if sheb: return [sheb, "-m", "pip"]
+    exe = which("pip") or which("pip3") or which("py")
+    if exe:
+        return [exe] if exe!="py" else [exe,"-m","pip"]
+    return None
+
+# -q/-w make gallery-dl switch its file output off (output.mode=null, applied after every -o), which
+# would leave GdlOutput nothing to count; they are dropped from user args with a one-time warning.
+_QUIET_ARGS=("-q","--quiet","-w","--warning")
+_ARGS_WARNED={"quiet":False}
+
+def _drop_quiet(args:List[str])->List[str]:
+    kept=[a for a in args if a not in _QUIET_ARGS]
+    if len(kept)<len(args) and not _ARGS_WARNED["quiet"]:
+        _ARGS_WARNED["quiet"]=True
+        print(c("Ignoring -q/--quiet/-w/--warning in extra args: gallery-dl would stop listing the files it downloads.", YELLOW))
+    return kept
+
+def gallery_dl_args(url:Optional[str], dest_dir:Path, archive_path:Path, global_args:str, site_args:str, extra:Optional[List[str]]=None)->List[str]:
+    """gallery-dl arguments for one URL (everything after the executable). `extra` is appended
+    verbatim (not shlex-split), e.g. --input-file paths for batched runs where url is None.
+    output.mode=pipe comes last so a gallery-dl.conf or -o in extra args can't change the
+    one-path-per-file output GdlOutput parses."""
+    parts: List[str] = ["--download-archive", str(archive_path), "--dest", str(dest_dir)]
+    if archive_is_wal(archive_path): parts += ["-o", "archive-pragma="+json.dumps(ARCHIVE_PRAGMA)]
+    gdl_conf = ROOT / "gallery-dl.conf"
+    if gdl_conf.exists(): parts += ["--config", str(gdl_conf)]
+    ga=_normalize_args_to_string(global_args); sa=_normalize_args_to_string(site_args)
+    if ga: parts += _drop_quiet(shlex.split(ga))
+    if sa: parts += _drop_quiet(shlex.split(sa))
+    if extra: parts += extra
+    parts += ["-o", "output.mode=pipe"]
+    if url: parts += [url]
+    return parts
+
+_ANSI_RE=re.compile(r"\x1b\[[0-9;?]*[A-Za-z]")
+
+class GdlOutput:
+    """Counts parsed from one gallery-dl run while its output is echoed live. With stdout piped,
+    gallery-dl prints one path per downloaded file and "# <path>" per file skipped via the archive;
+    log lines go to stderr."""
+    def __init__(self, echo:bool=True):
+        self.new_files=0; self.skipped_files=0; self.errors=0; self.bytes=0
+        self.error_lines: List[str]=[]; self.warn_lines: List[str]=[]; self.echo=echo
+        self.unparsed=0  # stdout lines that were neither a file path nor "# <path>"
+
+    def feed(self, line:str, err:bool=False):
+        if self.echo:
+            out=sys.stderr if err else sys.stdout; out.write(line if line.endswith("\n") else line+"\n"); out.flush()
+        t=_ANSI_RE.sub("", line).strip()
+        if not t: return
+        if err:
+            if "[error]" in t or "Traceback" in t:
+                self.errors+=1
+                if len(self.error_lines)<50: self.error_lines.append(t)
+            elif "[warning]" in t and len(self.warn_lines)<50: self.warn_lines.append(t)  # downloader retries log the HTTP status here
+        elif t.startswith("# "): self.skipped_files+=1
+        else:
+            try: size=os.path.getsize(t)
+            except (OSError, ValueError): self.unparsed+=1; return  # not a file path (e.g. -g/-j output, moved by a post-processor)
+            self.new_files+=1; self.bytes+=size
+
+    @property
+    def known(self)->bool:
+        """False if gallery-dl printed output but no file line in it: the file counts are unknown, not 0."""
+        return not self.unparsed or bool(self.new_files or self.skipped_files)
+
+    def new_files_known(self)->Optional[int]:
+        return self.new_files if self.known else None
+
+    def summary(self)->str:
+        if not self.known: return "file counts unknown" + (f", {self.errors} errors" if self.errors else "")
+        return f"{self.new_files} new, {self.skipped_files} skipped" + (f", {human_bytes(self.bytes)}" if self.bytes else "") \
+               + (f", {self.errors} errors" if self.errors else "")
+
+def human_bytes(n:float)->str:
+    for unit in ("B","KB","MB","GB","TB"):
+        if abs(n)<1024 or unit=="TB": return f"{n:.0f} {unit}" if unit=="B" else f"{n:.1f} {unit}"
+        n/=1024
+
+def _read_stream(stream, out:GdlOutput, err:bool):
+    for raw in iter(stream.readline, b""): out.feed(raw.decode("utf-8", errors="replace"), err)
+    stream.close()
+
+def run_gallery_dl(invocation:str, url:Optional[str], dest_dir:Path, archive_path:Path, global_args:str, site_args:str,
+                   worker:Optional["GdlWorker"]=None, extra:Optional[List[str]]=None, out:Optional[GdlOutput]=None)->int:
+    """Run gallery-dl once → rc (130 on Ctrl+C/Abort). Output is echoed and counted into `out`."""
+    args = gallery_dl_args(url, dest_dir, archive_path, global_args, site_args, extra)
+    out = out if out is not None else GdlOutput()
+    if worker is not None and worker.usable:
+        if os.environ.get("MG_DEBUG")=="1":
+            print(c("DEBUG (worker):", MAGENTA), " ".join(args))
+        rc = worker.run(args, out)
+        if rc is not None: return rc
+        print(c("Resident gallery-dl worker unavailable → falling back to one process per URL.", YELLOW))
+    parts: List[str] = (invocation.split(" ") if " " in invocation else [invocation]) + args
+    if os.environ.get("MG_DEBUG")=="1":
+        print(c("DEBUG:", MAGENTA), " ".join(parts))
+    import subprocess
+    try:
+        proc=subprocess.Popen(parts, stdout=subprocess.PIPE, stderr=subprocess.PIPE, env={**os.environ, "PYTHONUNBUFFERED":"1"})
+        readers=[threading.Thread(target=_read_stream, args=(proc.stdout, out, False), daemon=True),
+                 threading.Thread(target=_read_stream, args=(proc.stderr, out, True), daemon=True)]
+        for t in readers: t.start()
+        done=threading.Event(); gen=ABORT["gen"]
+        def waiter():
+            proc.wait()
+            for t in readers: t.join()
+            done.set(); wake_waiters()
+        threading.Thread(target=waiter, daemon=True).start()
+        wait_until(lambda: done.is_set() or interrupted_since(gen))  # gallery-dl exited, or Ctrl+C/Abort
+        if not done.is_set():
+            try: proc.terminate()
+            except Exception: pass
+            try: proc.kill()
+            except Exception: pass
+            return 130
+        return proc.returncode
+    except KeyboardInterrupt:
+        return 130
+
+# Resident worker: one Python child per site imports gallery_dl once and runs gallery_dl.main()
+# for each argv it receives as a JSON line on stdin. Results come back as marker lines on stdout.
+_WORKER_MARK = "\x1e@@MGDL "
+_GDL_WORKER_SRC = r'''
+import os, sys, json, logging, traceback
+MARK = "\x1e@@MGDL "
+try:
+    import gallery_dl
+    from gallery_dl import config, job
+except Exception as e:
+    sys.stdout.write(MARK + "NOIMPORT %s\n" % e); sys.stdout.flush(); sys.exit(3)
+# requests arrive on a private copy of stdin; gallery-dl reconfigures sys.stdin on every run
+requests = open(os.dup(sys.stdin.fileno()), "r", encoding="utf-8")
+sys.stdin = open(os.devnull, "r")
+sys.stdout.write(MARK + "READY %s\n" % gallery_dl.__version__); sys.stdout.flush()
+for line in requests:
+    if not line.strip(): continue
+    argv = json.loads(line)["argv"]
+    # gallery_dl.main() is written for one run per process: reset global config and logging handlers
+    config.clear(); job.Job.ulog = None
+    loggers = [logging.getLogger()] + [l for l in logging.Logger.manager.loggerDict.values() if isinstance(l, logging.Logger)]
+    for lg in loggers:
+        for h in list(lg.handlers):
+            lg.removeHandler(h)
+            try: h.close()
+            except Exception: pass
+    sys.argv = ["gallery-dl"] + argv
+    try:
+        rc = gallery_dl.main()
+    except SystemExit as e:
+        rc = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+    except BaseException:
+        traceback.print_exc(); rc = 1
+    sys.stdout.flush()
+    sys.stderr.write(MARK + "END\n"); sys.stderr.flush()   # lets the manager know stderr is drained
+    sys.stdout.write(MARK + "RC %d\n" % (rc or 0)); sys.stdout.flush()
+'''
+
+def worker_interpreter(invocation:str, resolved:Optional[str])->List[str]:
+    """Python command that can `import gallery_dl` for this invocation."""
+    toks = invocation.split()
+    if "-m" in toks: return toks[:toks.index("-m")]
+    if resolved:
+        sheb = interpreter_for_script(resolved)
+        if sheb: return shlex.split(sheb)
+        rp = Path(resolved)
+        if rp.parent.name.lower()=="scripts" and (rp.parent.parent/"python.exe").exists():  # Windows pip launcher
+            return [str(rp.parent.parent/"python.exe")]
+    return [sys.executable]
+
+class GdlWorker:
+    """Long-lived gallery-dl child for one site. run() mirrors run_gallery_dl()'s return codes
+    (130 on Ctrl+C/Abort) and returns None if the worker cannot be used."""
+    def __init__(self, interpreter:List[str]):
+        self.interpreter=interpreter; self.proc=None; self.msgs=None; self.usable=True; self.version=None
+        self.out=GdlOutput()  # output of the current run
+
+    def _pump(self, stream, msgs, err:bool):
+        for raw in iter(stream.readline, b""):
+            line = raw.decode("utf-8", errors="replace")
+            if line.startswith(_WORKER_MARK): msgs.put(line[len(_WORKER_MARK):].strip()); wake_waiters()
+            else: self.out.feed(line, err)
+        if not err: msgs.put(None); wake_waiters()
+
+    def _start(self)->bool:
+        import queue, subprocess
+        try:
+            self.proc = subprocess.Popen(self.interpreter+["-u","-c",_GDL_WORKER_SRC], stdin=subprocess.PIPE,
+                                         stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        except Exception as e:
+            print(c(f"Could not start gallery-dl worker: {e}", RED)); self.usable=False; return False
+        self.msgs = queue.Queue()
+        threading.Thread(target=self._pump, args=(self.proc.stdout, self.msgs, False), daemon=True).start()
+        threading.Thread(target=self._pump, args=(self.proc.stderr, self.msgs, True), daemon=True).start()
+        msg = self.msgs.get()
+        if not msg or not msg.startswith("READY"):
+            print(c(f"gallery-dl worker failed to start ({msg or 'no response'}).", RED))
+            self.close(); self.usable=False; return False
+        self.version = msg[len("READY"):].strip()
+        return True
+
+    def run(self, args:List[str], out:Optional[GdlOutput]=None)->Optional[int]:
+        import queue
+        if not self.usable: return None
+        if self.proc is None or self.proc.poll() is not None:
+            if not self._start(): return None
+        self.out=out if out is not None else GdlOutput(); rc=None; drained=False; gen=ABORT["gen"]
+        try:
+            self.proc.stdin.write((json.dumps({"argv": args})+"\n").encode("utf-8")); self.proc.stdin.flush()
+        except Exception:
+            self.close(); return None
+        while True:
+            wait_until(lambda: not self.msgs.empty() or interrupted_since(gen))
+            try: msg = self.msgs.get_nowait()
+            except queue.Empty:
+                self.close(kill=True); return 130   # Ctrl+C/Abort; restarted on the next URL
+            if msg is None:  # child died mid-URL
+                rc = self.proc.wait(); self.proc = None
+                return rc if rc else 1
+            if msg=="END": drained=True
+            elif msg.startswith("RC "): rc=int(msg[3:])
+            if rc is not None and drained: return rc
+
+    def close(self, kill:bool=False):
+        proc, self.proc = self.proc, None
+        if proc is None: return
+        try: proc.stdin.close()
+        except Exception: pass
+        try:
+            if kill: proc.terminate()
+            proc.wait(timeout=2)
+        except Exception:
+            try: proc.kill()
+            except Exception: pass
+
+# ----------------------------- BACKUPS/LOGS --------------------------------
+class RunStats:
+    _GLOBAL_KEYS={"attempted":"attempted","ok":"succeeded","fail":"failed","skipped":"skipped",
+                  "retried":"retried","recovered":"recovered",
+                  "new_files":"new_files","skipped_files":"skipped_files","errors":"errors","bytes":"bytes"}
+    def __init__(self):
+        self.start=time.time(); self.per_site={}; self.attempted=0; self.succeeded=0; self.failed=0; self.skipped=0
+        self.retried=0; self.recovered=0  # retry attempts / URLs that succeeded on a retry
+        self.lock=threading.Lock()  # sites may run in parallel (max_parallel_sites)
+        self.resumed=0              # times this run was resumed from its journal
+        self.new_files=0; self.skipped_files=0; self.errors=0; self.bytes=0  # parsed from gallery-dl output
+        self.dedup=None             # dedup_downloads() result when dedup_after_run is on
+    def bump(self, site_stats:Dict, key:str, n:int=1):
+        """Increment a per-site counter and its run-wide twin (thread-safe)."""
+        with self.lock:
+            site_stats[key]=site_stats.get(key,0)+n
+            g=self._GLOBAL_KEYS.get(key)
+            if g: setattr(self, g, getattr(self, g)+n)
+    def to_dict(self):
+        return {"start": dt.datetime.fromtimestamp(self.start).isoformat(timespec="seconds"),
+                "elapsed_sec": round(time.time()-self.start,2),
+                "attempted": self.attempted, "succeeded": self.succeeded,
+                "failed": self.failed, "skipped": self.skipped, "retried": self.retried, "recovered": self.recovered,
+                "new_files": self.new_files, "skipped_files": self.skipped_files, "errors": self.errors, "bytes": self.bytes,
+                "per_site": {s:{k:(round(v,2) if isinstance(v,float) else v) for k,v in d.items()} for s,d in self.per_site.items()},
+                **({"resumed": self.resumed} if self.resumed else {}), **({"dedup": self.dedup} if self.dedup else {})}
+
+def write_run_log(stats:RunStats, tag:str, path:Optional[Path]=None):
+    p=path or DIR_LOGS/f"run-{tag}-{ts_for_filename()}.json"; save_json(p, stats.to_dict())
+    try: history_end(stats, tag, p); history_rotate()
+    except Exception as e: print(c(f"Run history not updated: {e}", YELLOW))
+    return p
+
+def pid_alive(pid:int)->bool:
+    if not pid or pid<=0: return False
+    if os.name=="nt":
+        import ctypes
+        k=ctypes.windll.kernel32; h=k.OpenProcess(0x1000, False, pid)  # PROCESS_QUERY_LIMITED_INFORMATION
+        if not h: return False
+        code=ctypes.c_ulong(); k.GetExitCodeProcess(h, ctypes.byref(code)); k.CloseHandle(h)
+        return code.value==259  # STILL_ACTIVE
+    try: os.kill(pid, 0)
+    except PermissionError: return True
+    except OSError: return False
+    return True
+
+def _host_name()->str:
+    import socket
+    return socket.gethostname()
+
+JOURNAL_STALE_SEC=3600   # a journal of another machine counts as abandoned after this long without writes
+_JOURNAL_COUNTS=("new_files","skipped_files","errors","bytes")
+
+class RunJournal:
+    """Append-only, fsync'd record of every finished URL in a run (logs/journal-<tag>-<ts>.jsonl),
+    so a run killed by a crash/reboot (or aborted) can be resumed where it stopped. The header (and
+    an owner record per resume) names the process running it, so live runs are never offered for Resume."""
+    def __init__(self, path:Path, header:Dict, done:Optional[Dict[str,set]]=None, log_path:Optional[Path]=None):
+        self.path=path; self.header=header; self.done=done or {}; self.log_path=log_path; self.lock=threading.Lock()
+        self.pending: Dict[str,Dict] = {}   # site → output counts not yet written with a URL line
+
+    @classmethod
+    def create(cls, mode:str, site:Optional[str]=None)->"RunJournal":
+        tag=site if mode=="site" else "all"
+        header={"type":"start","mode":mode,"site":site,"tag":tag,"start":time.time(),"pid":os.getpid(),"host":_host_name()}
+        j=cls(DIR_LOGS/f"journal-{tag}-{ts_for_filename()}.jsonl", header); j._append(header); return j
+
+    def claim(self):
+        """This process resumes the run from now on."""
+        self._append({"type":"owner","pid":os.getpid(),"host":_host_name(),"ts":time.time()})
+
+    def _append(self, rec:Dict):
+        with self.lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(rec, ensure_ascii=False)+"\n"); f.flush(); os.fsync(f.fileno())
+
+    def is_done(self, site:str, url:str)->bool: return url in self.done.get(site, ())
+
+    def set_run_id(self, run_id:int):
+        """Tie the journal to its runs row in history.sqlite, so Resume closes that row instead of opening a new one."""
+        if self.header.get("run_id")!=run_id: self.header["run_id"]=run_id; self._append({"type":"run","run_id":run_id})
+
+    def add_output(self, site:str, out:"GdlOutput", elapsed:float):
+        """File counts and gallery-dl seconds of one call; written with the site's next URL line."""
+        with self.lock:
+            acc=self.pending.setdefault(site, {})
+            for k in _JOURNAL_COUNTS:
+                if getattr(out, k): acc[k]=acc.get(k,0)+getattr(out, k)
+            acc["dl"]=round(acc.get("dl",0.0)+elapsed, 2)
+
+    def record(self, site:str, url:str, rc:int, ok:bool, elapsed:float):
+        with self.lock: counts=self.pending.pop(site, {})
+        self._append({"type":"url","site":site,"url":url,"rc":rc,"ok":ok,"elapsed":round(elapsed,2),"ts":time.time(), **counts})
+        with self.lock: self.done.setdefault(site,set()).add(url)
+
+    def finish(self, log_path:Path, complete:bool):
+        """Completed runs drop their journal; aborted ones keep it (with the log path) for Resume."""
+        if complete:
+            try: self.path.unlink()
+            except OSError: pass
+        else:
+            with self.lock: pending,self.pending=self.pending,{}
+            for site,counts in pending.items(): self._append({"type":"out","site":site,**counts})
+            self._append({"type":"end","complete":False,"log":str(log_path),"ts":time.time()})
+
+    @staticmethod
+    def is_live(path:Path)->bool:
+        """True while the process that runs (or resumed) this journal is still going: no end record
+        after its last owner, and that process exists (same host) or wrote recently (other host)."""
+        owner={}; ended=False
+        try:
+            with open(path, "r", encoding="utf-8", errors="ignore") as f:
+                for line in f:
+                    if line.startswith('{"type": "url"'): continue
+                    try: rec=json.loads(line)
+                    except Exception: continue
+                    if rec.get("type") in ("start","owner"): owner=rec; ended=False
+                    elif rec.get("type")=="end": ended=True
+        except OSError: return False
+        if ended: return False
+        if owner.get("host") not in (None, _host_name()):
+            try: return time.time()-path.stat().st_mtime<JOURNAL_STALE_SEC
+            except OSError: return False
+        return pid_alive(owner.get("pid") or 0)
+
+    @staticmethod
+    def head(path:Path)->Dict:
+        """Start record (plus run_id) without reading the URL lines."""
+        header={}
+        try:
+            with open(path, "r", encoding="utf-8", errors="ignore") as f:
+                for line in f:
+                    try: rec=json.loads(line)
+                    except Exception: break
+                    if rec.get("type")=="start": header=rec
+                    elif rec.get("type")=="run": header["run_id"]=rec.get("run_id")
+                    else: break
+        except OSError: pass
+        return header
+
+    @classmethod
+    def load(cls, path:Path)->Tuple["RunJournal", RunStats]:
+        """Rebuild the journal and its RunStats (counts of everything already finished)."""
+        header={}; done={}; log_path=None; stats=RunStats()
+        with open(path, "r", encoding="utf-8", errors="ignore") as f:
+            for line in f:
+                try: rec=json.loads(line)
+                except Exception: continue  # torn last line after a crash
+                if rec.get("type")=="start": header=rec
+                elif rec.get("type")=="run": header["run_id"]=rec.get("run_id")
+                elif rec.get("type")=="end": log_path=Path(rec["log"]) if rec.get("log") else None
+                elif rec.get("type") in ("url","out") and rec.get("site"):
+                    ss=stats.per_site.setdefault(rec["site"], {"attempted":0,"ok":0,"fail":0})
+                    for k in _JOURNAL_COUNTS:
+                        if rec.get(k): stats.bump(ss, k, rec[k])
+                    if rec.get("dl"): ss["download_sec"]=round(ss.get("download_sec",0)+rec["dl"], 2)
+                    if rec["type"]=="url" and rec.get("url") not in done.get(rec["site"], ()):
+                        done.setdefault(rec["site"],set()).add(rec["url"])
+                        stats.bump(ss,"attempted"); stats.bump(ss,"ok" if rec.get("ok") else "fail")
+        stats.start=header.get("start", stats.start); stats.resumed=1
+        return cls(path, header, done, log_path), stats
+
+# Run history: every run (runs + site_runs) and every gallery-dl call (url_runs) in one indexed
+# SQLite file, so recent runs and trends are queries instead of parsing every run-*.json.
+_HISTORY={"conn":None, "run_id":None}
+_HISTORY_LOCK=threading.Lock()
+
+def _history_db():
+    if _HISTORY["conn"] is None:
+        import sqlite3
+        FILE_HISTORY.parent.mkdir(parents=True, exist_ok=True)
+        conn=sqlite3.connect(str(FILE_HISTORY), timeout=30, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL"); conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS runs(id INTEGER PRIMARY KEY, tag TEXT, start REAL, end REAL,
+                attempted INTEGER, succeeded INTEGER, failed INTEGER, skipped INTEGER, retried INTEGER,
+                new_files INTEGER, bytes INTEGER, log TEXT UNIQUE);
+            CREATE INDEX IF NOT EXISTS runs_start ON runs(start);
+            CREATE TABLE IF NOT EXISTS site_runs(run_id INTEGER NOT NULL, site TEXT NOT NULL, attempted INTEGER, ok INTEGER,
+                fail INTEGER, skipped INTEGER, new_files INTEGER, bytes INTEGER, download_sec REAL, sleep_sec REAL,
+                PRIMARY KEY(run_id, site));
+            CREATE TABLE IF NOT EXISTS url_runs(run_id INTEGER, site TEXT NOT NULL, url TEXT, ts REAL NOT NULL, rc INTEGER,
+                duration REAL, new_files INTEGER, bytes INTEGER);
+            CREATE INDEX IF NOT EXISTS url_runs_site_ts ON url_runs(site, ts);
+            CREATE TABLE IF NOT EXISTS meta(key TEXT PRIMARY KEY, value TEXT);""")
+        _HISTORY["conn"]=conn
+        if not conn.execute("SELECT 1 FROM meta WHERE key='imported_logs'").fetchone(): _history_import_logs(conn)
+    return _HISTORY["conn"]
+
+def _history_save_run(conn, run_id:Optional[int], tag:str, start:float, end:Optional[float], d:Dict, log:Optional[str])->int:
+    vals=(tag, start, end, d.get("attempted",0), d.get("succeeded",0), d.get("failed",0), d.get("skipped",0),
+          d.get("retried",0), d.get("new_files",0), d.get("bytes",0), log)
+    if run_id is None:
+        run_id=conn.execute("INSERT INTO runs(tag,start,end,attempted,succeeded,failed,skipped,retried,new_files,bytes,log) "
+                            "VALUES(?,?,?,?,?,?,?,?,?,?,?)", vals).lastrowid
+    else:
+        conn.execute("UPDATE runs SET tag=?,start=?,end=?,attempted=?,succeeded=?,failed=?,skipped=?,retried=?,new_files=?,bytes=?,log=? "
+                     "WHERE id=?", vals+(run_id,))
+    conn.execute("DELETE FROM site_runs WHERE run_id=?", (run_id,))
+    conn.executemany("INSERT INTO site_runs VALUES(?,?,?,?,?,?,?,?,?,?)",
+        [(run_id, site, v.get("attempted",0), v.get("ok",0), v.get("fail",0), v.get("skipped",0), v.get("new_files",0),
+          v.get("bytes",0), v.get("download_sec"), v.get("sleep_sec")) for site,v in (d.get("per_site") or {}).items()])
+    return run_id
+
+def _history_import_logs(conn):
+    """One-time import of run-*.json written before the history store existed."""
+    n=0
+    for p in sorted(DIR_LOGS.glob("run-*.json")):
+        d=load_json(p, None)
+        if not isinstance(d, dict) or conn.execute("SELECT 1 FROM runs WHERE log=?", (str(p),)).fetchone(): continue
+        try: start=dt.datetime.fromisoformat(d["start"]).timestamp()
+        except Exception: start=p.stat().st_mtime
+        tag=p.stem[len("run-"):].rsplit("-",2)[0]
+        _history_save_run(conn, None, tag, start, start+float(d.get("elapsed_sec") or 0), d, str(p)); n+=1
+    conn.execute("INSERT OR REPLACE INTO meta VALUES('imported_logs', ?)", (str(n),)); conn.commit()
+
+def history_begin(tag:str, stats:RunStats, log_path:Optional[Path]=None, run_id:Optional[int]=None)->int:
+    """Open (or, for a resumed run, reopen: run_id from its journal, else its log path) the history
+    row that URL results are attached to."""
+    with _HISTORY_LOCK:
+        conn=_history_db()
+        row=conn.execute("SELECT id FROM runs WHERE id=?", (run_id,)).fetchone() if run_id is not None else None
+        if not row and log_path: row=conn.execute("SELECT id FROM runs WHERE log=?", (str(log_path),)).fetchone()
+        _HISTORY["run_id"]=row[0] if row else _history_save_run(conn, None, tag, stats.start, None, {}, None)
+        conn.commit()
+        return _HISTORY["run_id"]
+
+def history_url(site:str, url:Optional[str], rc:int, duration:float, out:Optional["GdlOutput"]=None):
+    """One gallery-dl call, committed right away like its journal line (WAL + synchronous=NORMAL: no fsync)."""
+    with _HISTORY_LOCK:
+        conn=_history_db()
+        conn.execute("INSERT INTO url_runs VALUES(?,?,?,?,?,?,?,?)", (_HISTORY["run_id"], site, url, time.time(), rc, round(duration,3),
+                                                                        out.new_files_known() if out else None,
+                                                                        out.bytes if out and out.known else None))
+        conn.commit()
+
+def history_close_orphans(live:Optional[set]=None)->int:
+    """Close runs rows left open (end IS NULL) by a crashed run whose journal is gone (finished elsewhere
+    or discarded): totals are rebuilt from its url_runs. Rows of `live` run ids (open journals) and of
+    the run in progress are left alone (as are rows a second old, whose journal may not name them yet)."""
+    live=set(live if live is not None else journal_run_ids())
+    with _HISTORY_LOCK:
+        conn=_history_db(); n=0
+        for (rid,) in conn.execute("SELECT id FROM runs WHERE end IS NULL AND start<?", (time.time()-60,)).fetchall():
+            if rid in live or rid==_HISTORY["run_id"]: continue
+            rows=conn.execute("SELECT site, COUNT(DISTINCT url), SUM(rc=0), SUM(rc!=0), SUM(new_files), SUM(bytes), SUM(duration), MAX(ts) "
+                              "FROM url_runs WHERE run_id=? GROUP BY site", (rid,)).fetchall()
+            per={site:{"attempted":att, "ok":ok or 0, "fail":fail or 0, "new_files":new or 0, "bytes":b or 0, "download_sec":dl}
+                 for site,att,ok,fail,new,b,dl,_ in rows}
+            d={"attempted":sum(v["attempted"] for v in per.values()), "succeeded":sum(v["ok"] for v in per.values()),
+               "failed":sum(v["fail"] for v in per.values()), "new_files":sum(v["new_files"] for v in per.values()),
+               "bytes":sum(v["bytes"] for v in per.values()), "per_site":per}
+            tag,start=conn.execute("SELECT tag,start FROM runs WHERE id=?", (rid,)).fetchone()
+            _history_save_run(conn, rid, tag, start, max([r[7] for r in rows] or [start]), d, None); n+=1
+        conn.commit()
+    return n
+
+def history_end(stats:RunStats, tag:str, log_path:Path):
+    with _HISTORY_LOCK:
+        conn=_history_db()
+        row=conn.execute("SELECT id FROM runs WHERE log=?", (str(log_path),)).fetchone()
+        run_id=_HISTORY["run_id"] if _HISTORY["run_id"] is not None else (row[0] if row else None)
+        _history_save_run(conn, run_id, tag, stats.start, time.time(), stats.to_dict(), str(log_path))
+        conn.commit(); _HISTORY["run_id"]=None
+
+def history_rotate(force:bool=False):
+    """At most daily: move run-*.json older than log_keep_days into logs/archive/run-logs-<YYYY-MM>.zip
+    (they are already in the history store), drop url_runs older than history_keep_days, compact."""
+    import zipfile
+    app=load_app_settings(); now=time.time(); history_close_orphans()
+    with _HISTORY_LOCK:
+        conn=_history_db()
+        last=conn.execute("SELECT value FROM meta WHERE key='last_rotate'").fetchone()
+        if not force and last and now-float(last[0])<86400: return
+        conn.execute("INSERT OR REPLACE INTO meta VALUES('last_rotate', ?)", (str(now),)); conn.commit()
+        cutoff=now-float(app.get("log_keep_days", 30) or 30)*86400; moved=0
+        for p in sorted(DIR_LOGS.glob("run-*.json")):
+            try:
+                if p.stat().st_mtime>=cutoff: continue
+                month=dt.datetime.fromtimestamp(p.stat().st_mtime).strftime("%Y-%m")
+                zp=DIR_LOGS/"archive"/f"run-logs-{month}.zip"; zp.parent.mkdir(parents=True, exist_ok=True)
+                with zipfile.ZipFile(zp, "a", compression=zipfile.ZIP_DEFLATED) as z:
+                    if p.name not in z.namelist(): z.write(p, p.name)
+                p.unlink(); moved+=1
+            except OSError: continue
+        keep_days=float(app.get("history_keep_days", 365) or 0)
+        dropped=conn.execute("DELETE FROM url_runs WHERE ts<?", (now-keep_days*86400,)).rowcount if keep_days>0 else 0
+        conn.commit()
+        if dropped>10000: conn.execute("VACUUM")
+        elif dropped: conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    if moved or dropped: print(f"History rotation: archived {moved} old run logs, pruned {dropped} URL records.")
+
+def _percentile(conn, site:str, since:float, n:int, q:float)->Optional[float]:
+    if n<=0: return None
+    import math
+    k=max(0, min(n-1, math.ceil(q*n)-1))  # nearest rank
+    row=conn.execute("SELECT duration FROM url_runs WHERE site=? AND ts>=? AND duration IS NOT NULL ORDER BY duration LIMIT 1 OFFSET ?",
+                     (site, since, k)).fetchone()
+    return row[0] if row else None
+
+def history_stats(days:float=7, site:Optional[str]=None)->List[Dict]:
+    """Per site over the last `days`: runs, success rate, p50/p95 gallery-dl duration, new items per hour."""
+    since=time.time()-days*86400
+    with _HISTORY_LOCK:
+        conn=_history_db()
+        q="""SELECT s.site, COUNT(*), SUM(s.ok), SUM(s.fail), SUM(s.new_files), SUM(s.bytes), SUM(s.download_sec), SUM(s.sleep_sec)
+             FROM site_runs s JOIN runs r ON r.id=s.run_id WHERE r.start>=? AND r.end IS NOT NULL"""+(" AND s.site=?" if site else "")+" GROUP BY s.site ORDER BY s.site"
+        rows=conn.execute(q, (since, site) if site else (since,)).fetchall(); out=[]
+        for name,runs,ok,fail,new,nbytes,dl,sl in rows:
+            n=conn.execute("SELECT COUNT(*) FROM url_runs WHERE site=? AND ts>=? AND duration IS NOT NULL", (name, since)).fetchone()[0]
+            done=(ok or 0)+(fail or 0)
+            out.append({"site":name, "runs":runs, "ok":ok or 0, "fail":fail or 0,
+                        "success_rate":round((ok or 0)/done, 4) if done else None,
+                        "p50_sec":_percentile(conn, name, since, n, 0.50), "p95_sec":_percentile(conn, name, since, n, 0.95),
+                        "new_files":new or 0, "items_per_hour":round((new or 0)/(days*24), 2), "bytes":nbytes or 0,
+                        "download_sec":round(dl or 0, 1), "sleep_sec":round(sl or 0, 1)})
+    return out
+
+def print_history_stats(days:float=7, site:Optional[str]=None):
+    rows=history_stats(days, site)
+    if not rows: print(f"No runs in the last {days:g} days."); return
+    print(f"Last {days:g} days:")
+    print(f"  {'site':<20} {'runs':>5} {'ok':>6} {'fail':>5} {'success':>8} {'p50':>7} {'p95':>7} {'items/h':>8}  busy/pacing")
+    for r in rows:
+        sr=f"{r['success_rate']*100:.1f}%" if r["success_rate"] is not None else "-"
+        p=lambda v: f"{v:.1f}s" if v is not None else "-"
+        print(f"  {r['site']:<20} {r['runs']:>5} {r['ok']:>6} {r['fail']:>5} {sr:>8} {p(r['p50_sec']):>7} {p(r['p95_sec']):>7} "
+              f"{r['items_per_hour']:>8}  {r['download_sec']:.0f}s/{r['sleep_sec']:.0f}s")
+
+def journal_run_ids()->set:
+    """History run ids of the journals in logs/ (runs that can still be resumed, or are running)."""
+    return {h["run_id"] for h in map(RunJournal.head, DIR_LOGS.glob("journal-*.jsonl")) if h.get("run_id") is not None}
+
+def find_interrupted_journal()->Optional[Path]:
+    """Newest journal of a run that crashed or was aborted; runs still going in another process
+    (daemon, CLI, second menu) are skipped."""
+    js=sorted(DIR_LOGS.glob("journal-*.jsonl"), key=lambda p: p.stat().st_mtime, reverse=True)
+    return next((p for p in js if not RunJournal.is_live(p)), None)
+def list_run_logs(): return sorted(DIR_LOGS.glob("run-*.json"))
+def print_recent_runs(limit:int=10):
+    with _HISTORY_LOCK:
+        rows=_history_db().execute("SELECT tag,start,end,attempted,succeeded,failed,retried,log FROM runs "
+                                   "WHERE end IS NOT NULL ORDER BY start DESC LIMIT ?", (limit,)).fetchall()
+    if not rows: print("No run logs yet."); return
+    for tag,start,end,att,ok,fail,retried,log in reversed(rows):
+        print(f"- {Path(log).name if log else tag}: start={dt.datetime.fromtimestamp(start).isoformat(timespec='seconds')} "
+              f"elapsed={round(end-start,2)}s ok={ok} fail={fail} attempted={att}" + (f" retried={retried}" if retried else ""))
+
+# ----------------------------- TELEMETRY -----------------------------------
+FILE_METRICS=DIR_LOGS/"metrics.prom"
+EVENT_LOGS_KEEP=50  # events-*.jsonl files kept in logs/
+
+def _om_label(v)->str: return str(v).replace("\\","\\\\").replace("\n","\\n").replace('"','\\"')
+
+class Telemetry:
+    """Per-URL event stream (logs/events-<tag>-<ts>.jsonl: url_start/url_finish/sleep/retry/...) and
+    process-wide metrics, rendered in OpenMetrics text format to logs/metrics.prom after every URL and
+    served on http://127.0.0.1:<metrics_port>/metrics when that app setting is > 0."""
+    BUCKETS=(1,5,15,30,60,120,300,600,1800,3600)
+    def __init__(self):
+        self.lock=threading.Lock(); self.events_path=None; self.server=None
+        self.counters: Dict[Tuple[str,Tuple],float]={}   # (name, labels) → value
+        self.gauges: Dict[Tuple[str,Tuple],float]={}
+        self.hist: Dict[str,List]={}                      # site → [bucket counts..., +Inf, sum]
+
+    def begin(self, tag:str, app:Dict):
+        with self.lock: self.events_path=DIR_LOGS/f"events-{tag}-{ts_for_filename()}.jsonl"
+        for old in sorted(DIR_LOGS.glob("events-*.jsonl"))[:-EVENT_LOGS_KEEP]:
+            try: old.unlink()
+            except OSError: pass
+        port=int(app.get("metrics_port", 0) or 0)
+        if port and self.server is None: self._serve(port)
+        self.event("run_start", None, tag=tag)
+
+    def end(self, stats:"RunStats"):
+        self.event("run_end", None, attempted=stats.attempted, ok=stats.succeeded, fail=stats.failed,
+                   elapsed=round(time.time()-stats.start,2), aborted=bool(ABORT["stop"]))
+        self.write_textfile()
+        with self.lock: self.events_path=None
+
+    def event(self, kind:str, site:Optional[str], **fields):
+        now=time.time(); rec={"ts":round(now,3),"event":kind,**({"site":site} if site else {}),**fields}
+        with self.lock:
+            if site: self.gauges[("gdlm_last_event_timestamp_seconds",(("site",site),))]=now
+            path=self.events_path
+            if path is None: return
+            try:
+                with open(path, "a", encoding="utf-8") as f: f.write(json.dumps(rec, ensure_ascii=False)+"\n")
+            except OSError: pass
+
+    def inc(self, name:str, n:float=1, **labels):
+        key=(name, tuple(sorted(labels.items())))
+        with self.lock: self.counters[key]=self.counters.get(key,0)+n
+
+    def url_started(self, site:str, url:str, label:str):
+        with self.lock: self.gauges[("gdlm_url_in_progress",(("site",site),))]=1
+        self.event("url_start", site, url=url, label=label)
+
+    def url_finished(self, site:str, url:str, label:str, rc:int, duration:float, out:Optional["GdlOutput"]=None, urls:int=1):
+        result="ok" if rc==0 else ("aborted" if rc==130 else "fail")
+        self.event("url_finish", site, url=url, label=label, rc=rc, result=result, duration=round(duration,3),
+                   **({"new_files":out.new_files,"skipped_files":out.skipped_files,"errors":out.errors,"bytes":out.bytes} if out and out.known
+                      else {"errors":out.errors} if out else {}))
+        self.inc("gdlm_urls", urls, site=site, result=result); self.inc("gdlm_download_seconds", duration, site=site)
+        if out:
+            self.inc("gdlm_files", out.new_files, site=site, kind="new"); self.inc("gdlm_files", out.skipped_files, site=site, kind="skipped")
+            self.inc("gdlm_errors", out.errors, site=site); self.inc("gdlm_bytes", out.bytes, site=site)
+        with self.lock:
+            self.gauges[("gdlm_url_in_progress",(("site",site),))]=0
+            h=self.hist.setdefault(site, [0]*(len(self.BUCKETS)+2))
+            for i,b in enumerate(self.BUCKETS):
+                if duration<=b: h[i]+=1
+            h[-2]+=1; h[-1]+=duration
+        self.write_textfile()
+
+    def slept(self, site:str, reason:str, seconds:float):
+        self.inc("gdlm_sleep_seconds", seconds, site=site, reason=reason)
+
+    def render(self)->str:
+        out=[]
+        def fam(name, typ, help_, rows):
+            out.append(f"# TYPE {name} {typ}"); out.append(f"# HELP {name} {help_}"); out.extend(rows)
+        def lbl(labels): return "{"+",".join(f'{k}="{_om_label(v)}"' for k,v in labels)+"}" if labels else ""
+        with self.lock:
+            counters=dict(self.counters); gauges=dict(self.gauges); hist={k:list(v) for k,v in self.hist.items()}
+        helps={"gdlm_urls":"gallery-dl runs by result (a batch counts each URL)", "gdlm_download_seconds":"time spent in gallery-dl",
+               "gdlm_sleep_seconds":"time spent pacing (pre_url, inter_url, pacing, retry_wait)", "gdlm_files":"files reported by gallery-dl",
+               "gdlm_errors":"gallery-dl error lines", "gdlm_bytes":"bytes of new files", "gdlm_retries":"retries scheduled"}
+        for name in sorted({n for n,_ in counters}):
+            fam(name, "counter", helps.get(name, name), [f"{name}_total{lbl(l)} {v:g}" for (n,l),v in sorted(counters.items()) if n==name])
+        for name,help_ in (("gdlm_url_in_progress","1 while a gallery-dl run is active for the site"),
+                           ("gdlm_last_event_timestamp_seconds","time of the last event per site (stall detection)")):
+            rows=[f"{name}{lbl(l)} {v:.3f}".rstrip("0").rstrip(".") for (n,l),v in sorted(gauges.items()) if n==name]
+            if rows: fam(name, "gauge", help_, rows)
+        if hist:
+            rows=[]
+            for site,h in sorted(hist.items()):
+                for i,b in enumerate(self.BUCKETS): rows.append(f'gdlm_url_duration_seconds_bucket{{site="{_om_label(site)}",le="{b:.1f}"}} {h[i]}')
+                rows.append(f'gdlm_url_duration_seconds_bucket{{site="{_om_label(site)}",le="+Inf"}} {h[-2]}')
+                rows.append(f'gdlm_url_duration_seconds_sum{{site="{_om_label(site)}"}} {h[-1]:.3f}')
+                rows.append(f'gdlm_url_duration_seconds_count{{site="{_om_label(site)}"}} {h[-2]}')
+            fam("gdlm_url_duration_seconds", "histogram", "duration of one gallery-dl run", rows)
+        return "\n".join(out+["# EOF"])+"\n"
+
+    def write_textfile(self):
+        try:
+            tmp=FILE_METRICS.with_suffix(".prom.tmp"); tmp.write_text(self.render(), encoding="utf-8"); os.replace(tmp, FILE_METRICS)
+        except OSError: pass
+
+    def _serve(self, port:int):
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        tel=self
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body=tel.render().encode("utf-8")
+                self.send_response(200 if self.path.split("?")[0] in ("/","/metrics") else 404)
+                self.send_header("Content-Type","application/openmetrics-text; version=1.0.0; charset=utf-8")
+                self.send_header("Content-Length",str(len(body))); self.end_headers(); self.wfile.write(body)
+            def log_message(self, *a): pass
+        try: self.server=ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        except OSError as e: print(c(f"Metrics endpoint on port {port} unavailable: {e}", YELLOW)); return
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        print(f"Metrics: http://127.0.0.1:{port}/metrics")
+
+TELEMETRY=Telemetry()
+
+# ----------------------------- HEALTH/LINKS --------------------------------
+def extract_host(url:str)->Optional[str]:
+    try:
+        from urllib.parse import urlparse; return urlparse(url).hostname
+    except Exception: return None
+def dns_ok(host:str)->bool:
+    import socket
+    try: socket.gethostbyname(host); return True
+    except Exception: return False
+
+DNS_FAIL_TTL_SEC=300  # failures are re-checked sooner than successes
+
+def resolve_hosts(hosts:List[str], timeout:float, ttl:float)->Dict[str,str]:
+    """Resolve hosts concurrently → {host: 'OK'|'DNS FAIL'|'TIMEOUT'}. Answers younger than `ttl`
+    (failures: DNS_FAIL_TTL_SEC) come from config/dns-cache.json; `timeout` bounds the whole batch."""
+    import queue
+    now=time.time(); cache=load_json(FILE_DNS_CACHE, {}); res={}; todo=[]
+    for h in hosts:
+        e=cache.get(h)
+        if e and now-e.get("ts",0) < (ttl if e.get("ok") else min(ttl, DNS_FAIL_TTL_SEC)): res[h]="OK" if e["ok"] else "DNS FAIL"
+        else: todo.append(h)
+    if todo:
+        q=queue.Queue(); out={}
+        for h in todo: q.put(h)
+        def worker():
+            while True:
+                try: h=q.get_nowait()
+                except queue.Empty: return
+                out[h]=dns_ok(h)
+        # daemon threads: a hung resolver call can't be cancelled, but it must not block the run or exit
+        threads=[threading.Thread(target=worker, daemon=True) for _ in range(min(32, len(todo)))]
+        for t in threads: t.start()
+        deadline=time.time()+timeout
+        for t in threads: t.join(max(0.0, deadline-time.time()))
+        for h in todo:
+            ok=out.get(h)
+            if ok is None: res[h]="TIMEOUT"; continue   # not cached: try again next time
+            res[h]="OK" if ok else "DNS FAIL"; cache[h]={"ok": ok, "ts": now}
+        cache={h:e for h,e in cache.items() if now-e.get("ts",0) < max(ttl, DNS_FAIL_TTL_SEC)}
+        save_json(FILE_DNS_CACHE, cache)
+    return res
+
+def preflight_report(app:Optional[Dict]=None)->Tuple[List[Tuple[str,str]], set, List[str]]:
+    """Check every list: (report rows, hosts that failed to resolve, empty sites).
+    Rows are per empty site and per distinct host across all lists."""
+    app=app or load_app_settings()
+    rows=[]; empty=[]; host_sites: Dict[str,List[str]]={}; host_urls: Dict[str,int]={}
+    for site in get_sites():
+        urls=read_site_urls(site)
+        if not urls: rows.append((site,"EMPTY list")); empty.append(site); continue
+        for u in urls:
+            h=extract_host(u)
+            if not h: continue
+            host_urls[h]=host_urls.get(h,0)+1
+            sl=host_sites.setdefault(h,[])
+            if site not in sl: sl.append(site)
+    res=resolve_hosts(sorted(host_sites), float(app.get("preflight_timeout_sec",10) or 10), float(app.get("dns_cache_ttl_sec",3600) or 0))
+    bad=set()
+    for h in sorted(host_sites):
+        where=f"{host_urls[h]} URLs in {', '.join(host_sites[h])}"
+        if res.get(h)=="OK": rows.append((h, f"OK ({where})"))
+        else: rows.append((h, f"{res.get(h,'DNS FAIL')} ({where})")); bad.add(h)
+    return rows, bad, empty
+
+INI_TEMPLATE="[InternetShortcut]\nURL={url}\n"
+SKIP_SEGMENTS={"user","users","profile","channel","channels"}
+def url_to_filename(url:str)->str:
+    from urllib.parse import urlparse
+    path=urlparse(url).path.strip("/")
+    if not path: return "root"
+    parts=[p for p in path.split("/") if p and p.lower() not in SKIP_SEGMENTS]
+    base=parts[-1] if parts else "link"
+    safe="".join(ch for ch in base if ch.isalnum() or ch in ("-","_"))
+    return safe or "link"
+LINKS_MANIFEST=".links-manifest.json"  # per Links/<site>/: shortcut file name → URL, as last written
+LINKS_BATCH=500
+
+def link_names(urls:List[str])->Dict[str,str]:
+    """Shortcut file name (without .url) → URL. The first URL (in list order) with a given
+    url_to_filename() keeps the plain name; later ones get -<sha1 of the URL> appended, so names are
+    stable and never overwrite each other (compared case-insensitively, as on Windows)."""
+    import hashlib
+    out: Dict[str,str]={}; taken=set()
+    for url in urls:
+        base=url_to_filename(url); name=base
+        if name.lower() in taken:
+            h=hashlib.sha1(url.encode("utf-8")).hexdigest(); n=8
+            while f"{base}-{h[:n]}".lower() in taken and n<40: n+=4
+            name=f"{base}-{h[:n]}"
+        taken.add(name.lower()); out[name]=url
+    return out
+
+def _read_shortcut(p:Path)->Optional[str]:
+    try:
+        for line in p.read_text(encoding="utf-8", errors="ignore").splitlines():
+            if line.startswith("URL="): return line[4:].strip()
+    except OSError: pass
+    return None
+
+def sync_site_links(site:str, pool)->Dict[str,int]:
+    """Bring Links/<site>/ in line with the site's list: only new, changed and removed shortcuts are
+    touched (manifest + one directory listing); shortcuts not written by us are left alone."""
+    import hashlib
+    site_dir=DIR_LINKS/site; site_dir.mkdir(parents=True, exist_ok=True); man_path=site_dir/LINKS_MANIFEST
+    urls=read_site_urls(site); want=link_names(urls)
+    existing={e.name[:-4] for e in os.scandir(site_dir) if e.name.endswith(".url")}
+    man=load_json(man_path, None)
+    if man is None:  # first sync: adopt shortcuts from earlier full rebuilds so stale ones can be removed
+        man={"links":{n:u for n in existing if (u:=_read_shortcut(site_dir/f"{n}.url"))}, "list_sha1":None}
+    have: Dict[str,str]=man.get("links",{})
+    writes=[(n,u) for n,u in want.items() if have.get(n)!=u or n not in existing]
+    deletes=[n for n in have if n not in want]
+    created=sum(1 for n,_ in writes if n not in have or n not in existing)  # missing on disk → written again
+    counts={"created":created, "updated":len(writes)-created,
+            "deleted":len(deletes), "unchanged":len(want)-len(writes)}
+    def write(item):
+        n,u=item; (site_dir/f"{n}.url").write_text(INI_TEMPLATE.format(url=u), encoding="utf-8"); return n,u
+    def delete(n):
+        try: (site_dir/f"{n}.url").unlink()
+        except FileNotFoundError: pass
+        return n
+    try:
+        for i in range(0, len(writes), LINKS_BATCH):
+            for n,u in pool.map(write, writes[i:i+LINKS_BATCH]): have[n]=u
+        for i in range(0, len(deletes), LINKS_BATCH):
+            for n in pool.map(delete, deletes[i:i+LINKS_BATCH]): have.pop(n, None)
+    finally:  # a partial sync still records what was done
+        listing="\n".join(urls); digest=hashlib.sha1(listing.encode("utf-8")).hexdigest()
+        txt=DIR_LINKS/f"#{site}_links_from_lists.txt"
+        if man.get("list_sha1")!=digest or not txt.exists(): txt.write_text(listing, encoding="utf-8")
+        if writes or deletes or man.get("list_sha1")!=digest or not man_path.exists():
+            save_json(man_path, {"links":have, "list_sha1":digest})
+    return counts
+
+def build_links_from_lists():
+    from concurrent.futures import ThreadPoolExecutor
+    sites=get_sites()
+    if not sites: print("No URL-Lists/*.txt found."); return
+    with ThreadPoolExecutor(max_workers=16, thread_name_prefix="links") as pool:  # I/O bound (network shares)
+        for site in sites:
+            k=sync_site_links(site, pool)
+            print(f"  {site}: +{k['created']} created, ~{k['updated']} updated, -{k['deleted']} deleted, {k['unchanged']} unchanged")
+    print("Links built under", DIR_LINKS)
+
+# ----------------------------- DEDUP ---------------------------------------
+# Identical files across sites are replaced by hardlinks (or reflinks) to one copy. A persistent
+# index (path, size, mtime, inode, hash) means only new/changed files are hashed, and only files
+# whose size matches another file's are hashed at all.
+DEDUP_MMAP_MIN=8<<20      # hash files this big through mmap instead of read() loops
+DEDUP_SKIP_SUFFIXES=(".part",".tmp",".dedup-tmp")
+
+def _dedup_db():
+    import sqlite3
+    FILE_DEDUP_INDEX.parent.mkdir(parents=True, exist_ok=True)
+    conn=sqlite3.connect(str(FILE_DEDUP_INDEX), timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL"); conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("""CREATE TABLE IF NOT EXISTS files(path TEXT PRIMARY KEY, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL,
+                    dev INTEGER, ino INTEGER, hash TEXT)""")
+    conn.execute("CREATE INDEX IF NOT EXISTS files_size ON files(size)")
+    return conn
+
+def _hash_file(path:str, size:int)->Optional[str]:
+    import hashlib, mmap
+    h=hashlib.blake2b(digest_size=20)
+    try:
+        with open(path, "rb") as f:
+            if size>=DEDUP_MMAP_MIN:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm: h.update(mm)  # releases the GIL
+            else:
+                for buf in iter(lambda: f.read(1<<20), b""): h.update(buf)
+    except (OSError, ValueError): return None
+    return h.hexdigest()
+
+def _walk_downloads(root:Path):
+    """(path, size, mtime_ns, dev, ino) for every regular file under root (symlinks not followed)."""
+    stack=[str(root)]
+    while stack:
+        try: it=os.scandir(stack.pop())
+        except OSError: continue
+        with it:
+            for e in it:
+                try:
+                    if e.is_dir(follow_symlinks=False): stack.append(e.path); continue
+                    if not e.is_file(follow_symlinks=False) or e.name.endswith(DEDUP_SKIP_SUFFIXES): continue
+                    st=e.stat(follow_symlinks=False)
+                    if not st.st_ino: st=os.stat(e.path, follow_symlinks=False)  # Windows scandir leaves st_ino 0
+                    yield e.path, st.st_size, st.st_mtime_ns, st.st_dev, st.st_ino
+                except OSError: continue
+
+def _same_bytes(a:str, b:str)->bool:
+    import filecmp
+    try: return filecmp.cmp(a, b, shallow=False)
+    except OSError: return False
+
+def _reflink(src:str, dst:str):
+    """Copy-on-write clone (Linux FICLONE: btrfs, XFS, ...); raises OSError where unsupported."""
+    import fcntl
+    with open(src, "rb") as fs, open(dst, "wb") as fd: fcntl.ioctl(fd.fileno(), 0x40049409, fs.fileno())
+
+def _link_duplicate(keep:str, dup:str, mode:str):
+    import shutil
+    tmp=dup+".dedup-tmp"
+    try:
+        if mode=="reflink": _reflink(keep, tmp); shutil.copystat(dup, tmp)
+        else: os.link(keep, tmp)
+        os.replace(tmp, dup)
+    except BaseException:
+        try: os.unlink(tmp)
+        except OSError: pass
+        raise
+
+def dedup_downloads(mode:Optional[str]=None, min_size:Optional[int]=None, quiet:bool=False)->Dict:
+    """Hash new files in Downloads/ (in parallel) and replace duplicates according to `mode`:
+    'hardlink' (default), 'reflink', or 'report' (change nothing). → counts + reclaimed bytes."""
+    from concurrent.futures import ThreadPoolExecutor
+    app=load_app_settings(); mode=(mode or app.get("dedup_mode") or "hardlink").lower()
+    min_size=int(app.get("dedup_min_size", 1024) if min_size is None else min_size)
+    t0=time.time(); conn=_dedup_db()
+    index={r[0]:r[1:] for r in conn.execute("SELECT path,size,mtime_ns,dev,ino,hash FROM files")}
+    cur={}; by_size: Dict[int,List[str]]={}
+    for path,size,mtime,dev,ino in (f for root in download_roots() for f in _walk_downloads(root)):
+        if size<min_size: continue
+        old=index.get(path)
+        h=old[4] if old and old[:4]==(size,mtime,dev,ino) else None
+        cur[path]=[size,mtime,dev,ino,h]; by_size.setdefault(size,[]).append(path)
+    gone=[p for p in index if p not in cur]
+    todo=[p for paths in by_size.values() if len(paths)>1 for p in paths if cur[p][4] is None]
+    with ThreadPoolExecutor(max_workers=min(32, (os.cpu_count() or 2)*2), thread_name_prefix="hash") as pool:
+        for p,h in zip(todo, pool.map(lambda p: _hash_file(p, cur[p][0]), todo)): cur[p][4]=h
+    groups: Dict[Tuple[int,str,int],List[str]]={}
+    for p,(size,mtime,dev,ino,h) in cur.items():
+        if h: groups.setdefault((size,h,dev),[]).append(p)  # links only work within one volume
+    res={"mode":mode, "files":len(cur), "hashed":len(todo), "duplicates":0, "linked":0, "failed":0, "reclaimed_bytes":0}
+    for (size,h,_),paths in groups.items():
+        if len(paths)<2: continue
+        paths.sort(key=lambda p: (cur[p][1], p)); keep=paths[0]; kdev,kino=cur[keep][2],cur[keep][3]
+        for dup in paths[1:]:
+            if (cur[dup][2],cur[dup][3])==(kdev,kino): continue  # already the same file
+            res["duplicates"]+=1
+            if mode=="report": res["reclaimed_bytes"]+=size; continue
+            try:
+                nlink=os.stat(dup).st_nlink
+                if not _same_bytes(keep, dup): continue  # hash collision or changed since hashing
+                _link_duplicate(keep, dup, mode)
+            except (OSError, ImportError) as e:
+                res["failed"]+=1
+                if not quiet and res["failed"]<=5: print(c(f"  dedup: {dup}: {e}", YELLOW))
+                continue
+            st=os.stat(dup); cur[dup][1:4]=[st.st_mtime_ns, st.st_dev, st.st_ino]
+            res["linked"]+=1; res["reclaimed_bytes"]+=size if (mode=="reflink" or nlink==1) else 0
+    conn.executemany("DELETE FROM files WHERE path=?", [(p,) for p in gone])
+    conn.executemany("INSERT OR REPLACE INTO files VALUES(?,?,?,?,?,?)", [(p,*v) for p,v in cur.items()])
+    conn.commit(); conn.close()
+    res["elapsed_sec"]=round(time.time()-t0,2)
+    if not quiet:
+        verb="could save" if mode=="report" else "reclaimed"
+        print(f"Dedup ({mode}): {res['files']} files, {res['hashed']} hashed, {res['duplicates']} duplicates, "
+              f"{res['linked']} linked, {verb} {human_bytes(res['reclaimed_bytes'])} in {res['elapsed_sec']}s"
+              + (f", {res['failed']} failed" if res["failed"] else ""))
+    return res
+
+# ----------------------------- ARCHIVES ------------------------------------
+# Maintenance of the gallery-dl download archives (archives/<site>.sqlite, one table
+# `archive(entry TEXT PRIMARY KEY)`). Everything uses short busy timeouts and small transactions so
+# a running gallery-dl never waits long. Runs hold a shared lock on archives/.<site>.lock (any
+# Manager process); maintenance needs it exclusively and skips the archive otherwise. Free pages
+# are given back with incremental_vacuum in bounded steps, never a long VACUUM under a download.
+FILE_ARCHIVE_MAINT=DIR_CONFIG/"archive-maint.json"    # site → last vacuum/analyze timestamps
+ARCHIVE_PRAGMA=["synchronous=NORMAL"]                 # handed to gallery-dl for archives in WAL mode
+ARCHIVE_BUSY_SEC=2.0
+ARCHIVE_BATCH=10000
+ARCHIVE_VACUUM_MIN_FREE=10.0                          # scheduled VACUUM only pays off with this % of free pages
+ARCHIVE_VACUUM_STEP=2000                              # pages freed per incremental_vacuum transaction
+ARCHIVE_LOCK_SLOTS=1024                               # Windows: one locked byte per run, maintenance locks them all
+NETWORK_FS={"nfs","nfs4","cifs","smb3","smbfs","9p","afs","ceph","glusterfs","fuse.glusterfs","fuse.sshfs","davfs","afpfs"}
+_ACTIVE_SITES: Dict[str,int] = {}
+_ACTIVE_LOCK = threading.Lock()
+
+def site_active(site:str, on:Optional[bool]=None)->bool:
+    """Mark/unmark a site as downloading (nested calls are counted); with on=None just ask."""
+    with _ACTIVE_LOCK:
+        if on is True: _ACTIVE_SITES[site]=_ACTIVE_SITES.get(site,0)+1
+        elif on is False:
+            if _ACTIVE_SITES.get(site,0)<=1: _ACTIVE_SITES.pop(site, None)
+            else: _ACTIVE_SITES[site]-=1
+        return site in _ACTIVE_SITES
+
+def active_site_count()->int:
+    with _ACTIVE_LOCK: return len(_ACTIVE_SITES)
+
+def archive_path(site:str)->Path:
+    return DIR_ARCHIVES/f"{site}.sqlite"
+
+def archive_lock(site:str, exclusive:bool=False)->Optional[Tuple[int,int]]:
+    """Non-blocking cross-process lock on archives/.<site>.lock → handle for archive_unlock, or None
+    if taken: runs share it, maintenance needs it alone. flock on POSIX; on Windows (no shared
+    locks) a run locks one byte of ARCHIVE_LOCK_SLOTS and maintenance all of them."""
+    p=DIR_ARCHIVES/f".{site}.lock"; p.parent.mkdir(parents=True, exist_ok=True)
+    fd=os.open(str(p), os.O_RDWR|os.O_CREAT, 0o644)
+    try:
+        if os.name=="nt":
+            import msvcrt
+            for slot in ([0] if exclusive else range(1, ARCHIVE_LOCK_SLOTS)):
+                try:
+                    os.lseek(fd, slot, 0); msvcrt.locking(fd, msvcrt.LK_NBLCK, ARCHIVE_LOCK_SLOTS if exclusive else 1)
+                    return fd, slot
+                except OSError: continue
+        else:
+            import fcntl
+            try: fcntl.flock(fd, (fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)|fcntl.LOCK_NB); return fd, 0
+            except OSError: pass
+    except Exception: pass
+    os.close(fd); return None
+
+def archive_unlock(handle:Optional[Tuple[int,int]]):
+    if not handle: return
+    fd,slot=handle
+    try:
+        if os.name=="nt":
+            import msvcrt
+            os.lseek(fd, slot, 0); msvcrt.locking(fd, msvcrt.LK_UNLCK, ARCHIVE_LOCK_SLOTS if slot==0 else 1)
+    except OSError: pass
+    finally: os.close(fd)
+
+def archive_lock_for_run(site:str)->Optional[Tuple[int,int]]:
+    """Shared lock for a download; waits (Abort-aware) while another process maintains the archive."""
+    told=False
+    while not ABORT["stop"]:
+        h=archive_lock(site)
+        if h: return h
+        if not told: print(c(f"  \u2192 {site}: archive maintenance in progress, waiting...", YELLOW)); told=True
+        time.sleep(1)
+    return None
+
+_NETWORK: Dict = {"paths": {}, "warned": False}
+def is_network_path(p:Path)->bool:
+    """Best effort: UNC paths / remote drives on Windows, NFS/SMB/sshfs/... mounts on Linux (/proc/mounts)."""
+    key=str(p)
+    if key in _NETWORK["paths"]: return _NETWORK["paths"][key]
+    res=False
+    try:
+        path=os.path.abspath(key)
+        if os.name=="nt":
+            import ctypes
+            res=path.startswith("\\\\") or ctypes.windll.kernel32.GetDriveTypeW(os.path.splitdrive(path)[0]+"\\")==4  # DRIVE_REMOTE
+        elif os.path.exists("/proc/mounts"):
+            best=""; fs=""
+            with open("/proc/mounts", encoding="utf-8", errors="ignore") as f:
+                for ln in f:
+                    parts=ln.split()
+                    if len(parts)<3: continue
+                    mnt=parts[1].replace("\\040"," ")
+                    if (path==mnt or path.startswith(mnt.rstrip("/")+"/")) and len(mnt)>=len(best): best,fs=mnt,parts[2]
+            res=fs in NETWORK_FS
+    except Exception: res=False
+    _NETWORK["paths"][key]=res; return res
+
+def archive_wal_wanted(app:Dict)->bool:
+    """archive_wal: true/false, or "auto" = on unless archives/ is on a network share (WAL needs
+    shared memory between processes, which network file systems don't provide)."""
+    v=app.get("archive_wal", "auto")
+    if str(v).lower()!="auto": return bool(v)
+    if not is_network_path(DIR_ARCHIVES): return True
+    if not _NETWORK["warned"]:
+        _NETWORK["warned"]=True
+        print(c("archives/ is on a network share: WAL stays off (set archive_wal to true to force it).", YELLOW))
+    return False
+
+def archive_is_wal(p:Path)->bool:
+    """WAL mode is recorded in the database header (bytes 18/19 == 2), no connection needed."""
+    try:
+        with open(p, "rb") as f: head=f.read(20)
+        return len(head)==20 and head[18]==2 and head[19]==2
+    except OSError: return False
+
+def _archive_open(p:Path, timeout:float=ARCHIVE_BUSY_SEC):
+    import sqlite3
+    p.parent.mkdir(parents=True, exist_ok=True)
+    conn=sqlite3.connect(str(p), timeout=timeout, isolation_level=None, check_same_thread=False)
+    conn.execute("CREATE TABLE IF NOT EXISTS archive (entry TEXT PRIMARY KEY) WITHOUT ROWID")  # gallery-dl's schema
+    return conn
+
+def archive_enable_wal(p:Path)->bool:
+    """Switch an archive to WAL (readers no longer block on a writer and commits skip most fsyncs).
+    Gives up quietly if the archive is busy; it is tried again next time."""
+    if not p.exists() or archive_is_wal(p): return archive_is_wal(p)
+    import sqlite3
+    try:
+        conn=_archive_open(p)
+        try: return str(conn.execute("PRAGMA journal_mode=WAL").fetchone()[0]).lower()=="wal"
+        finally: conn.close()
+    except sqlite3.Error: return False
+
+def _archive_keys(p:Path)->Iterator[str]:
+    import sqlite3
+    conn=sqlite3.connect(f"file:{p.as_posix()}?mode=ro", uri=True, timeout=30)
+    try: yield from (row[0] for row in conn.execute("SELECT entry FROM archive"))
+    finally: conn.close()
+
+def _insert_keys(conn, keys, batch:int=ARCHIVE_BATCH)->int:
+    """INSERT OR IGNORE in transactions of `batch` keys; returns how many were new."""
+    added=0; buf=[]
+    def flush():
+        nonlocal added
+        conn.execute("BEGIN IMMEDIATE"); before=conn.total_changes
+        conn.executemany("INSERT OR IGNORE INTO archive(entry) VALUES(?)", [(k,) for k in buf])
+        conn.execute("COMMIT"); added+=conn.total_changes-before; buf.clear()
+    for k in keys:
+        buf.append(k)
+        if len(buf)>=batch: flush()
+    if buf: flush()
+    return added
+
+def _archive_lock_all(*sites:str)->List[Tuple[int,int]]:
+    """Exclusive locks on every archive a merge/split/import touches → handles for archive_unlock.
+    RuntimeError if one is downloading or being maintained, in this or another Manager process."""
+    handles=[]
+    for site in sorted(set(sites)):
+        h=None if site_active(site) else archive_lock(site, exclusive=True)
+        if not h:
+            for x in handles: archive_unlock(x)
+            raise RuntimeError(f"{site} is downloading or being maintained; try again after the run")
+        handles.append(h)
+    return handles
+
+def archive_free_pct(p:Path)->Optional[float]:
+    """Share of free (reclaimable) pages, read-only."""
+    import sqlite3
+    try:
+        conn=sqlite3.connect(f"file:{p.as_posix()}?mode=ro", uri=True, timeout=ARCHIVE_BUSY_SEC)
+        try:
+            pages=conn.execute("PRAGMA page_count").fetchone()[0]; free=conn.execute("PRAGMA freelist_count").fetchone()[0]
+            return round(100*free/pages, 1) if pages else 0.0
+        finally: conn.close()
+    except sqlite3.Error: return None
+
+def archive_report(sites:Optional[List[str]]=None)->List[Dict]:
+    """Rows, size on disk (incl. -wal), journal mode, free-page share and last maintenance per archive."""
+    state=load_json(FILE_ARCHIVE_MAINT, {}); rows=[]
+    names=sites if sites is not None else sorted(p.stem for p in DIR_ARCHIVES.glob("*.sqlite"))
+    for site in names:
+        p=archive_path(site)
+        if not p.exists(): continue
+        wal=p.with_name(p.name+"-wal")
+        rows.append({"site":site, "rows":archive_item_count(p), "bytes":p.stat().st_size+(wal.stat().st_size if wal.exists() else 0),
+                     "wal":archive_is_wal(p), "free_pct":archive_free_pct(p), "active":site_active(site), **state.get(site, {})})
+    return rows
+
+def print_archive_report(rows:List[Dict]):
+    if not rows: print("No download archives yet."); return
+    def ago(ts): return f"{(time.time()-ts)/86400:.0f}d ago" if ts else "never"
+    print(f"  {'site':<20} {'rows':>12} {'size':>10}  journal  free   vacuum      analyze")
+    for r in rows:
+        rows_s="?" if r["rows"] is None else f"{r['rows']:,}"
+        free="?" if r["free_pct"] is None else f"{r['free_pct']:g}%"
+        print(f"  {r['site']:<20} {rows_s:>12} {human_bytes(r['bytes']):>10}  {'wal' if r['wal'] else 'rollback':<7}  {free:<5}  "
+              f"{ago(r.get('last_vacuum')):<10}  {ago(r.get('last_analyze'))}" + (c("  (downloading)", YELLOW) if r["active"] else ""))
+    print(f"  total: {sum(r['rows'] or 0 for r in rows):,} rows, {human_bytes(sum(r['bytes'] for r in rows))}")
+
+def _archive_vacuum(conn):
+    """Give free pages back to the file system. Archives are switched to auto_vacuum=INCREMENTAL once
+    (that needs one full VACUUM, only done when no other connection has the file open); after that
+    incremental_vacuum frees ARCHIVE_VACUUM_STEP pages per short transaction."""
+    import sqlite3
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0]!=2:
+        if conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()[0]: raise sqlite3.OperationalError("database is busy")
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL"); conn.execute("VACUUM"); return
+    while conn.execute("PRAGMA freelist_count").fetchone()[0] and not ABORT["stop"]:
+        conn.execute("BEGIN IMMEDIATE")
+        try: conn.execute(f"PRAGMA incremental_vacuum({ARCHIVE_VACUUM_STEP})").fetchall()  # one page per step
+        finally: conn.execute("COMMIT")
+
+def archive_maintain(site:str, vacuum:bool=True, analyze:bool=True, quiet:bool=False)->Dict:
+    """WAL + ANALYZE/vacuum + WAL checkpoint for one archive. Skipped ("busy") while the site is
+    downloading in any Manager process or another connection holds a lock for longer than ARCHIVE_BUSY_SEC."""
+    import sqlite3
+    p=archive_path(site); res={"site":site, "status":"ok", "before":0, "after":0, "sec":0.0}
+    if not p.exists(): res["status"]="missing"; return res
+    if site_active(site): res["status"]="busy"; return res
+    lock=archive_lock(site, exclusive=True)
+    if not lock: res["status"]="busy"; return res
+    t0=time.time(); res["before"]=p.stat().st_size
+    try:
+        conn=_archive_open(p)
+        try:
+            if archive_wal_wanted(load_app_settings()): conn.execute("PRAGMA journal_mode=WAL")
+            if analyze: conn.execute("PRAGMA analysis_limit=1000"); conn.execute("ANALYZE")  # sampled: bounded time
+            if vacuum: _archive_vacuum(conn)
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        finally: conn.close()
+    except sqlite3.OperationalError as e:
+        res["status"]="busy" if "locked" in str(e) or "busy" in str(e) else f"error: {e}"
+    except sqlite3.Error as e:
+        res["status"]=f"error: {e}"
+    finally: archive_unlock(lock)
+    res["after"]=p.stat().st_size; res["sec"]=round(time.time()-t0, 2)
+    if res["status"]=="ok":
+        state=load_json(FILE_ARCHIVE_MAINT, {}); cur=state.setdefault(site, {})
+        if vacuum: cur["last_vacuum"]=time.time()
+        if analyze: cur["last_analyze"]=time.time()
+        save_json(FILE_ARCHIVE_MAINT, state)
+    if not quiet:
+        what="+".join(x for x,on in (("analyze",analyze),("vacuum",vacuum)) if on) or "checkpoint"
+        col=GREEN if res["status"]=="ok" else YELLOW
+        print(c(f"  {site}: {what} {res['status']} ({human_bytes(res['before'])} → {human_bytes(res['after'])}, {res['sec']}s)", col))
+    return res
+
+def run_archive_maintenance(app:Dict, sites:Optional[List[str]]=None, force:bool=False, quiet:bool=False)->List[Dict]:
+    """Maintain the archives that are due: ANALYZE every archive_analyze_days, VACUUM every
+    archive_vacuum_days if enough pages are free to be worth rewriting the file (0 = never);
+    force runs both now."""
+    vac_days=float(app.get("archive_vacuum_days", 30) or 0); ana_days=float(app.get("archive_analyze_days", 7) or 0)
+    state=load_json(FILE_ARCHIVE_MAINT, {}); now=time.time(); out=[]
+    names=sites if sites is not None else sorted(p.stem for p in DIR_ARCHIVES.glob("*.sqlite"))
+    for site in names:
+        if ABORT["stop"]: break
+        if not archive_path(site).exists(): continue
+        st=state.get(site, {})
+        vac=force or (vac_days>0 and now-st.get("last_vacuum",0)>=vac_days*86400
+                      and (archive_free_pct(archive_path(site)) or 0)>=ARCHIVE_VACUUM_MIN_FREE)
+        ana=force or (ana_days>0 and now-st.get("last_analyze",0)>=ana_days*86400)
+        if vac or ana: out.append(archive_maintain(site, vacuum=vac, analyze=ana, quiet=quiet))
+    return out
+
+def archive_merge(sources:List[str], target:str, retire:bool=False)->Dict[str,int]:
+    """Copy every key of the source archives into the target's (sites combined or renamed).
+    retire=True moves the sources to archives/retired/ afterwards (a consistent copy is kept there)."""
+    locks=_archive_lock_all(target, *sources); added: Dict[str,int]={}
+    try:
+        conn=_archive_open(archive_path(target))
+        try:
+            for src in sources:
+                p=archive_path(src)
+                if src==target or not p.exists(): continue
+                added[src]=_insert_keys(conn, _archive_keys(p))
+        finally: conn.close()
+        if retire:
+            dst_dir=DIR_ARCHIVES/"retired"; dst_dir.mkdir(parents=True, exist_ok=True)
+            for src in added:
+                p=archive_path(src)
+                if sqlite_snapshot(p, dst_dir/f"{src}-{ts_for_filename()}.sqlite"):
+                    for q in (p, p.with_name(p.name+"-wal"), p.with_name(p.name+"-shm")): q.unlink(missing_ok=True)
+    finally:
+        for h in locks: archive_unlock(h)
+    return added
+
+def archive_prefixes(site:str, top:int=10)->List[Tuple[str,int]]:
+    """Most common key prefixes (gallery-dl keys start with the extractor category, e.g. "twitter")."""
+    from collections import Counter
+    pat=re.compile(r"[^\d]*"); cnt: Counter=Counter()
+    for k in _archive_keys(archive_path(site)): cnt[pat.match(k).group(0)[:40]]+=1
+    return cnt.most_common(top)
+
+def archive_split(source:str, target:str, prefix:str, keep:bool=False)->int:
+    """Move keys starting with `prefix` from one archive into another (a site split in two);
+    keep=True copies them instead. Returns how many keys matched."""
+    src=archive_path(source)
+    if not src.exists(): raise FileNotFoundError(f"No archive for {source}")
+    if not prefix or source==target: raise ValueError("Need a key prefix and two different sites")
+    locks=_archive_lock_all(source, target)
+    try: return _archive_split(src, target, prefix, keep)
+    finally:
+        for h in locks: archive_unlock(h)
+
+def _archive_split(src:Path, target:str, prefix:str, keep:bool)->int:
+    import sqlite3
+    rng=(prefix, prefix[:-1]+chr(ord(prefix[-1])+1)); matched=0  # key range → primary-key index, no table scan
+    def keys():
+        nonlocal matched
+        ro=sqlite3.connect(f"file:{src.as_posix()}?mode=ro", uri=True, timeout=30)
+        try:
+            for (k,) in ro.execute("SELECT entry FROM archive WHERE entry>=? AND entry<?", rng): matched+=1; yield k
+        finally: ro.close()
+    conn=_archive_open(archive_path(target))
+    try: _insert_keys(conn, keys())
+    finally: conn.close()
+    if not keep and matched:
+        conn=_archive_open(src)
+        try:
+            while True:
+                conn.execute("BEGIN IMMEDIATE")
+                cur=conn.execute("DELETE FROM archive WHERE entry IN (SELECT entry FROM archive WHERE entry>=? AND entry<? LIMIT ?)", (*rng, ARCHIVE_BATCH))
+                conn.execute("COMMIT")
+                if cur.rowcount<=0: break
+        finally: conn.close()
+    return matched
+
+def archive_export(site:str, out:Path)->int:
+    """Write every key of a site's archive to a text file, one per line."""
+    p=archive_path(site)
+    if not p.exists(): raise FileNotFoundError(f"No archive for {site}")
+    n=0; tmp=out.with_name(out.name+".tmp")
+    with open(tmp, "w", encoding="utf-8", newline="\n") as f:
+        for k in _archive_keys(p): f.write(k+"\n"); n+=1
+    os.replace(tmp, out)
+    return n
+
+def archive_import(site:str, src:Path)->Tuple[int,int]:
+    """Add keys from a text file (one per line) to a site's archive: (lines read, keys added)."""
+    read=0
+    def keys():
+        nonlocal read
+        with open(src, encoding="utf-8-sig", errors="ignore") as f:
+            for ln in f:
+                ln=ln.rstrip("\r\n")
+                if ln: read+=1; yield ln
+    locks=_archive_lock_all(site)
+    try:
+        conn=_archive_open(archive_path(site))
+        try: added=_insert_keys(conn, keys())
+        finally: conn.close()
+    finally:
+        for h in locks: archive_unlock(h)
+    return read, added
+
+def archives_menu():
+    while True:
+        clear_screen(); banner("Download archives", ROOT); app=load_app_settings()
+        print_archive_report(archive_report())
+        print(f"\nScheduled: VACUUM every {app.get('archive_vacuum_days',30)}d, ANALYZE every {app.get('archive_analyze_days',7)}d"
+              + (" (after each run)" if app.get("archive_maint_after_run", True) else " (manual only)"))
+        print(c("  1 – Run due maintenance now", BLUE))
+        print(c("  2 – Maintain one archive now (WAL + ANALYZE + VACUUM)", BLUE))
+        print(c("  3 – Merge archives (sites combined or renamed)", BLUE))
+        print(c("  4 – Split an archive by key prefix", BLUE))
+        print(c("  5 – Export keys to a text file", BLUE))
+        print(c("  6 – Import keys from a text file", BLUE))
+        print(c("  0 – Back", BLUE))
+        ch=prompt("Choose: ").strip()
+        try:
+            if ch=="1":
+                if not run_archive_maintenance(app): print("Nothing due.")
+            elif ch=="2":
+                site=prompt("Site: ").strip()
+                if site: archive_maintain(site)
+            elif ch=="3":
+                srcs=[x for x in re.split(r"[,\s]+", prompt("Merge FROM (site names, comma separated): ").strip()) if x]
+                dst=prompt("INTO site: ").strip()
+                if not srcs or not dst: continue
+                retire=prompt("Move the source archives to archives/retired/ afterwards? [y/N]: ").strip().lower().startswith("y")
+                for s_,n in archive_merge(srcs, dst, retire).items(): print(c(f"  {s_} → {dst}: {n:,} new keys", GREEN))
+            elif ch=="4":
+                src=prompt("Split FROM site: ").strip()
+                if not src: continue
+                for pre,n in archive_prefixes(src): print(f"  {pre or '(no prefix)'}: {n:,}")
+                pre=prompt("Key prefix to move: ").strip(); dst=prompt("INTO site: ").strip()
+                if not pre or not dst: continue
+                keep=prompt("Keep them in the source too? [y/N]: ").strip().lower().startswith("y")
+                print(c(f"  {archive_split(src, dst, pre, keep):,} keys {'copied' if keep else 'moved'} to {dst}", GREEN))
+            elif ch=="5":
+                site=prompt("Site: ").strip()
+                if not site: continue
+                out=Path(input_default("Export to", str(DIR_BACKUPS/f"{site}-archive-keys-{ts_for_filename()}.txt")))
+                print(c(f"  {archive_export(site, out):,} keys written to {out}", GREEN))
+            elif ch=="6":
+                site=prompt("Site: ").strip(); src=Path(prompt("Import from file: ").strip().strip('"'))
+                if not site or not src.is_file(): print(c("Need a site and an existing file.", RED))
+                else: n,added=archive_import(site, src); print(c(f"  {n:,} keys read, {added:,} new", GREEN))
+            elif ch=="0": return
+            else: continue
+        except Exception as e:  # busy archive, bad file name...
+            print(c(str(e), RED))
+        input("Enter to continue...")
+
+# ----------------------------- PACING --------------------------------------
+# Adaptive (AIMD) delay per host, used instead of the fixed delay_between_urls_sec when a site
+# sets adaptive_delay. Throttled → delay doubles; success → request rate grows by 1/max_delay.
+# The status must sit in an HTTP context ("HttpError: '429 Too Many…'", "HTTP/1.1 403", "status 429",
+# "(403 Forbidden)") so IDs, sizes and URLs that merely contain 429/403 don't count.
+THROTTLE_RE=re.compile(r"(?:HttpError|HTTP(?:/[\d.]+)?|status(?: code)?)\W{0,3}(?:429|403)\b|['(](?:429|403) [A-Z]"
+                       r"|too many requests|rate.?limit(?:ed| exceeded)", re.I)
+
+def is_throttled(rc:int, output:Optional[List[str]]=None)->bool:
+    """gallery-dl sets bit 4 for every failed HTTP request (extractor HttpError or file download); the
+    captured log lines tell a 429/403 apart from other HTTP failures."""
+    if rc in (0,130) or not rc & 4: return False
+    if not output: return True  # nothing captured: the HttpError bit is the best signal
+    return any(THROTTLE_RE.search(ln) for ln in output)
+
+class HostPacer:
+    def __init__(self):
+        self.lock=threading.Lock(); self.hosts: Dict[str,Dict]=None  # host → {"delay", "next_at"}
+
+    def _state(self, host:str, start:float, lo:float, hi:float)->Dict:
+        if self.hosts is None:
+            self.hosts={h:{"delay":float(d),"next_at":0.0} for h,d in load_json(FILE_HOST_PACING, {}).items()}
+        st=self.hosts.setdefault(host, {"delay":float(start),"next_at":0.0})
+        st["delay"]=min(hi, max(lo, st["delay"]))
+        return st
+
+    def acquire(self, host:str, start:float, lo:float, hi:float)->Tuple[float,float]:
+        """Reserve the next slot for host → (seconds to wait, current delay). Parallel workers on
+        the same host are spaced at least one delay apart."""
+        with self.lock:
+            st=self._state(host, start, lo, hi); now=time.time()
+            at=max(now, st["next_at"]); st["next_at"]=at+st["delay"]
+            return at-now, st["delay"]
+
+    def feedback(self, host:str, throttled:bool, ok:bool, start:float, lo:float, hi:float)->float:
+        with self.lock:
+            st=self._state(host, start, lo, hi)
+            if throttled: st["delay"]=min(hi, st["delay"]*2)
+            elif ok: st["delay"]=max(lo, 1.0/(1.0/st["delay"] + 1.0/hi)) if st["delay"]>0 else lo
+            st["next_at"]=max(st["next_at"], time.time()+st["delay"])
+            return st["delay"]
+
+    def save(self):
+        with self.lock:
+            if self.hosts is not None: save_json(FILE_HOST_PACING, {h:round(st["delay"],2) for h,st in self.hosts.items()})
+
+HOST_PACER=HostPacer()
+
+# ----------------------------- BUDGET --------------------------------------
+# One bandwidth/concurrency budget for every gallery-dl run of this process (app-settings.json:
+# bandwidth_limit, max_concurrent_processes, max_processes_per_host). A run starts only when a
+# process slot, a slot on each of its hosts and enough bandwidth are free; it gets --limit-rate =
+# the fair share per downloading site (or per process slot, if fewer), capped by what the running
+# children leave. Children keep their rate until they exit; every start after a finish is sized
+# again (rebalancing).
+BUDGET_MIN_SHARE=0.5   # don't start a child below half its fair share unless nothing else runs
+
+def parse_rate(v)->int:
+    """Bytes/s from 2500000, "2.5M" or "500k" (k/M/G = 1024 as in gallery-dl); 0/empty = unlimited."""
+    if not v: return 0
+    m=re.fullmatch(r"\s*([\d.]+)\s*([kmg]?)(?:i?b)?(?:/s)?\s*", str(v), re.I)
+    if not m: return 0
+    return int(float(m.group(1))*{"":1,"k":1024,"m":1024**2,"g":1024**3}[m.group(2).lower()])
+
+class Budget:
+    def __init__(self):
+        self.cond=threading.Condition(); self.running=0; self.hosts: Dict[str,int]={}; self.allocated=0
+
+    def _admit(self, hosts:set, limit:int, max_p:int, max_h:int)->Optional[int]:
+        """Rate for a run that may start now (0 = no rate limit), or None to keep waiting."""
+        if self.running and max_p and self.running>=max_p: return None
+        if max_h and any(self.hosts.get(h,0)>=max_h for h in hosts): return None
+        if not limit: return 0
+        active=active_site_count(); sharing=min(active, max_p) if max_p else active  # runs that can be in flight
+        fair=limit//max(1, sharing); share=min(fair, limit-self.allocated)
+        if self.running and share<fair*BUDGET_MIN_SHARE: return None
+        return max(1, share)
+
+    def run(self, ctx:Dict, hosts:set, fn)->int:
+        """fn(extra_args) → rc, started once the budget admits it; extra_args carry --limit-rate."""
+        app=load_app_settings(); limit=parse_rate(app.get("bandwidth_limit"))
+        max_p=int(app.get("max_concurrent_processes", 0) or 0); max_h=int(app.get("max_processes_per_host", 0) or 0)
+        if not (limit or max_p or max_h): return fn([])
+        t0=time.time(); noted=False
+        with self.cond:
+            while True:
+                rate=self._admit(hosts, limit, max_p, max_h)
+                if rate is not None or ABORT["want"] or ABORT["stop"]: break  # on abort the child is stopped right away
+                if not noted and time.time()-t0>=1:
+                    print(f"  → Budget: waiting for a free slot ({self.running} running, {human_bytes(self.allocated)}/s of {human_bytes(limit)}/s in use)" if limit
+                          else f"  → Budget: waiting for a free slot ({self.running} running)"); noted=True
+                self.cond.wait(0.5)
+            rate=rate or 0; self.running+=1; self.allocated+=rate
+            for h in hosts: self.hosts[h]=self.hosts.get(h,0)+1
+        waited=time.time()-t0; ctx["budget_wait"]=ctx.get("budget_wait",0.0)+waited  # not download time
+        if waited>=0.05:
+            ctx["sleep_sec"]=ctx.get("sleep_sec",0.0)+waited; TELEMETRY.slept(ctx["site"], "budget", waited)
+        if rate and rate!=ctx.get("rate"): print(f"  → Rate limit {human_bytes(rate)}/s (share of {human_bytes(limit)}/s)")
+        ctx["rate"]=rate
+        try: return fn(["--limit-rate", str(rate)] if rate else [])
+        finally:
+            with self.cond:
+                self.running-=1; self.allocated-=rate
+                for h in hosts:
+                    if self.hosts.get(h,0)<=1: self.hosts.pop(h, None)
+                    else: self.hosts[h]-=1
+                self.cond.notify_all()
+
+BUDGET=Budget()
+
+# ----------------------------- DESTINATIONS --------------------------------
+# A site may spread its downloads over several roots (site setting dest_pool: [{"path", "weight",
+# "min_free_gb"}]; default: Downloads/ only). Before each gallery-dl run the root is picked among
+# volumes that still have min_free_gb plus the site's typical run size free: highest weight × recent
+# download rate into the volume (bytes written / gallery-dl time, so the network counts as much as
+# the disk), shared among runs already writing there, most free space on ties. With no room
+# anywhere the site waits for space (re-checked every DEST_RECHECK_SEC) instead of failing URLs.
+DEST_RATE_ALPHA=0.3    # weight of the newest run in a volume's download-rate average
+DEST_RECHECK_SEC=60    # how often a site without room asks again (another run, dedup or the user may free space)
+DEST_WAIT_SEC=1800     # longest a site waits for space per run before its remaining URLs are held back
+
+def dest_entries(cfg:Dict)->List[Dict]:
+    default_free=float(cfg.get("min_free_gb", 0) or 0); out=[]
+    for e in cfg.get("dest_pool") or []:
+        e={"path":e} if isinstance(e, str) else e
+        if not e.get("path"): continue
+        out.append({"path":Path(os.path.expanduser(str(e["path"]))), "weight":max(0.0, float(e.get("weight", 1) or 0)),
+                    "min_free_gb":float(e.get("min_free_gb", default_free) or 0)})
+    return [e for e in out if e["weight"]>0] or [{"path":DIR_DOWNLOADS, "weight":1.0, "min_free_gb":default_free}]
+
+def download_roots()->List[Path]:
+    """Downloads/ plus every root in any site's dest_pool (for dedup and friends)."""
+    roots=[DIR_DOWNLOADS]
+    for cfg in load_site_settings().values():
+        for e in dest_entries(cfg):
+            if e["path"] not in roots: roots.append(e["path"])
+    return roots
+
+class DestPool:
+    def __init__(self):
+        self.lock=threading.Lock(); self.vols: Dict[int,Dict]={}  # st_dev → {"rate" bytes/s, "writers"}
+
+    def acquire(self, entries:List[Dict], need:int=0)->Optional[Dict]:
+        """Pick a root for one run → {"path", "dev", "free"}, or None if no volume has room."""
+        import shutil
+        best=None; best_key=None
+        with self.lock:
+            for e in entries:
+                try:
+                    e["path"].mkdir(parents=True, exist_ok=True)
+                    dev=os.stat(e["path"]).st_dev; free=shutil.disk_usage(e["path"]).free
+                except OSError: continue  # unplugged drive / offline share
+                if free-e["min_free_gb"]*1024**3<=need: continue
+                vol=self.vols.setdefault(dev, {"rate":None, "writers":0})
+                known=[v["rate"] for v in self.vols.values() if v["rate"]]
+                rate=vol["rate"] or (max(known)*1.5 if known else 1.0)  # unmeasured volumes get tried (and measured) first
+                key=(e["weight"]*rate/(1+vol["writers"]), free)
+                if best_key is None or key>best_key: best, best_key={"path":e["path"], "dev":dev, "free":free}, key
+            if best: self.vols[best["dev"]]["writers"]+=1
+        return best
+
+    def release(self, pick:Optional[Dict], nbytes:int, sec:float):
+        if not pick: return
+        with self.lock:
+            vol=self.vols[pick["dev"]]; vol["writers"]=max(0, vol["writers"]-1)
+            if nbytes>0 and sec>0:
+                rate=nbytes/sec; vol["rate"]=rate if not vol["rate"] else (1-DEST_RATE_ALPHA)*vol["rate"]+DEST_RATE_ALPHA*rate
+
+DEST_POOL=DestPool()
+
+# ----------------------------- CORE FLOW -----------------------------------
+def compute_sleep(base:int, jitter:float)->float:
+    import random
+    if base<=0: return 0.0
+    low=max(0.0, base-jitter); high=base+jitter
+    return random.uniform(low, high)
+
+def interrupted_since(gen:int)->bool:
+    """Ctrl+C pending, Abort chosen, or a Ctrl+C after `gen` (already answered by another worker)."""
+    return ABORT["want"] or ABORT["stop"] or ABORT["gen"]!=gen
+
+def reset_abort():
+    ABORT["want"] = False; ABORT["stop"] = False; ABORT["act"] = None; ABORT["act_gen"] = ABORT["gen"]
+
+def _maybe_handle_sigint(gen:Optional[int]=None):
+    """Serialized: with parallel sites only one worker prompts; an Abort stops every worker. `gen` is the
+    first Ctrl+C that could have killed the caller's download: once that one is answered, the same
+    answer applies to every worker it interrupted."""
+    with _SIGINT_LOCK:
+        if ABORT["stop"]: return "abort"
+        if ABORT["want"] and HEADLESS["on"]:  # nobody to ask: Ctrl+C/SIGTERM stops the run
+            ABORT["want"] = False; ABORT["stop"] = True; wake_waiters()
+            print("Interrupted — stopping after cleanup..."); return "abort"
+        if ABORT["want"]:
+            ABORT["want"] = False; ABORT["act_gen"] = ABORT["gen"]
+            choice = input("\nCtrl+C detected — [A]bort to menu, [S]kip this URL, [C]ontinue? ").strip().lower() or "a"
+            if choice.startswith("a"):
+                ABORT["stop"] = True; ABORT["act"] = "abort"; wake_waiters()
+                print("Aborting to menu..."); return "abort"
+            ABORT["act"] = "skip" if choice.startswith("s") else "continue"
+            print("Skipping this URL..." if ABORT["act"]=="skip" else "Continuing..."); return ABORT["act"]
+        if gen is not None and ABORT["act_gen"] >= gen:
+            if ABORT["act"]=="skip": print(c("Ctrl+C → skipping this URL too...", YELLOW))
+            return ABORT["act"]
+    return None
+
+def sleep_interruptible(sec:float):
+    """time.sleep() that wakes early on Ctrl+C / Abort so workers don't sit out long delays."""
+    wait_until(lambda: ABORT["want"] or ABORT["stop"], sec)
+
+def _pause(ctx:Dict, sec:float, reason:str, note:str):
+    """Pacing sleep that is logged, counted per site and exported (idle vs. download time)."""
+    print(note); TELEMETRY.event("sleep", ctx["site"], reason=reason, seconds=round(sec,2))
+    t0=time.time(); sleep_interruptible(sec); slept=time.time()-t0
+    ctx["sleep_sec"]=ctx.get("sleep_sec",0.0)+slept; TELEMETRY.slept(ctx["site"], reason, slept)
+
+def download_for_site(site:str, app:Dict, site_cfg:Dict[str,Dict], stats:RunStats, skip_hosts:Optional[set]=None,
+                      journal:Optional[RunJournal]=None):
+    listed: Dict={}; urls=read_site_urls(site, listed)
+    if not urls: print(f"No URLs for {site}."); return
+    cfg=site_cfg.get(site, {"delay_between_urls_sec":DEFAULT_DELAY,"base_sleep_sec":DEFAULT_BASE_SLEEP,"jitter_sec":DEFAULT_JITTER,"sleep_mode":"url","extra_args":""})
+    per_url_delay=int(cfg.get("delay_between_urls_sec", DEFAULT_DELAY))
+    base_sleep=int(cfg.get("base_sleep_sec", DEFAULT_BASE_SLEEP))
+    jitter=float(cfg.get("jitter_sec", DEFAULT_JITTER))
+    sleep_mode=str(cfg.get("sleep_mode","url")).lower().strip()
+    site_args=_normalize_args_to_string(cfg.get("extra_args",""))
+
+    # If user chooses per-item sleep, inject gallery-dl --sleep range and disable manager's pre-URL sleep
+    if sleep_mode == "item":
+        low = max(0.0, base_sleep - jitter)
+        high = base_sleep + jitter
+        # Validate (negative handled via clamp; additionally warn if base<jitter)
+        if base_sleep < jitter:
+            print(c(f"Warning: base_sleep({base_sleep}) < jitter({jitter}) → using 0.00-{high:.2f}s", YELLOW))
+        # Remove any existing --sleep from extra args to avoid duplicates
+        if site_args:
+            toks = shlex.split(site_args); kept=[]; i=0
+            while i < len(toks):
+                if toks[i] == "--sleep" and i+1 < len(toks):
+                    i += 2
+                    continue
+                kept.append(toks[i]); i += 1
+            site_args = " ".join(kept).strip()
+        # Inject our per-item sleep
+        if abs(high - low) < 1e-6:
+            site_args = (site_args + f" --sleep {low:.2f}").strip()
+            print(f"  \u2192 Per-item sleep via gallery-dl: {low:.2f}s")
+        else:
+            site_args = (site_args + f" --sleep {low:.2f}-{high:.2f}").strip()
+            print(f"  \u2192 Per-item sleep via gallery-dl: {low:.2f}-{high:.2f}s")
+        # Disable manager's pre-URL sleep
+        base_sleep = 0
+
+    # Batched mode: nothing to pace between URLs except what gallery-dl can do itself
+    # (--sleep-extractor runs before each input URL), so hand it N URLs per call.
+    batch_size = int(cfg.get("batch_size", 0) or 0)
+    batch_args: List[str] = []
+    if batch_size>1 and (sleep_mode=="item" or per_url_delay==0):
+        if sleep_mode=="item" and per_url_delay>0:
+            batch_args = ["--sleep-extractor", str(per_url_delay)]
+        elif base_sleep>0:
+            low=max(0.0, base_sleep-jitter); high=base_sleep+jitter
+            batch_args = ["--sleep-extractor", f"{low:.2f}-{high:.2f}" if high-low>1e-6 else f"{low:.2f}"]
+    else:
+        batch_size = 0
+
+    invocation, resolved=find_gallery_dl(app)
+    if not invocation: print(c("gallery-dl not found. Use menu option to install/check.", RED)); return
+
+    set_console_title(f"{APP_NAME} {APP_VERSION} · {site}")
+    dest=dest_entries(cfg)[0]["path"]; archive=DIR_ARCHIVES/f"{site}.sqlite"; archive.parent.mkdir(parents=True, exist_ok=True)
+
+    print(f"\n[{now_ts()}] {site}: {len(urls)} URLs. Using base_sleep={base_sleep}±{jitter}s and delay_between_urls={per_url_delay}s")
+    if listed.get("dupes"): print(f"  \u2192 {listed['dupes']} duplicate URLs in the list ignored (same URL up to http/https, trailing slash, #fragment)")
+
+    site_stats=stats.per_site.setdefault(site, {"attempted":0,"ok":0,"fail":0})
+    if journal and journal.done.get(site):
+        left=[u for u in urls if not journal.is_done(site, u)]
+        print(f"  \u2192 Resuming: {len(urls)-len(left)} URLs already finished in this run, {len(left)} left")
+        urls=left
+    if skip_hosts:
+        kept=[u for u in urls if extract_host(u) not in skip_hosts]
+        if len(kept)<len(urls):
+            stats.bump(site_stats,"skipped",len(urls)-len(kept))
+            print(c(f"  \u2192 Skipping {len(urls)-len(kept)} URLs whose host failed preflight", YELLOW))
+            urls=kept
+    track_new = float(cfg.get("min_recheck_hours", 0) or 0) > 0
+    by_yield = str(cfg.get("url_order","file")).lower()=="yield"
+    state=url_state_for_site(site) if (track_new or by_yield) else {}; now=time.time()
+    if track_new:
+        due=[u for u in urls if url_is_due(state.get(u), cfg, now)]
+        if len(due)<len(urls):
+            stats.bump(site_stats,"skipped",len(urls)-len(due))
+            print(f"  \u2192 Refresh policy: {len(urls)-len(due)} URLs not due yet (min_recheck_hours={cfg.get('min_recheck_hours')}), {len(due)} to check")
+        urls=due
+    if by_yield and urls:
+        urls=order_urls_by_yield(urls, state, cfg, now); fresh=sum(1 for u in urls if u not in state)
+        top=state.get(urls[0])
+        print(f"  \u2192 Yield order: {fresh} never-checked URLs first" if fresh else
+              f"  \u2192 Yield order: starting with {urls[0]} (avg {(top.get('total_new_items') or 0)/max(1, top.get('successes') or 0):.1f} new/check)")
+    budget=float(cfg.get("max_run_minutes", 0) or 0)*60
+
+    site_active(site, True); lock=archive_lock_for_run(site)
+    if archive_wal_wanted(app): archive_enable_wal(archive)
+    worker=GdlWorker(worker_interpreter(invocation, resolved)) if app.get("execution_mode")=="worker" else None
+    try:
+        retry_mask=0
+        for code in cfg.get("retry_on_rc", [1,4]) or []: retry_mask|=int(code)
+        ctx={"site":site, "invocation":invocation, "worker":worker, "dest":dest, "archive":archive,
+             "per_url_delay":per_url_delay, "base_sleep":base_sleep, "jitter":jitter, "site_args":site_args,
+             "batch_size":batch_size, "batch_args":batch_args, "journal":journal,
+             "retry_max":max(0, int(cfg.get("retry_max_attempts", 0) or 0)),
+             "retry_backoff":max(0.0, float(cfg.get("retry_backoff_sec", 60) or 0)), "retry_mask":retry_mask,
+             "deadline":time.time()+budget if budget>0 else None, "dest_pool":dest_entries(cfg)}
+        if budget>0: print(f"  \u2192 Time budget: {budget/60:g} min (no new URLs are started after that)")
+        if cfg.get("adaptive_delay") and not batch_size:
+            lo=float(cfg.get("min_delay_sec", 5)); hi=max(lo, float(cfg.get("max_delay_sec", 300)))
+            ctx["pacing"]=(min(hi, max(lo, float(per_url_delay))), lo, hi)
+            print(f"  \u2192 Adaptive per-host delay between {lo:g}s and {hi:g}s (replaces delay_between_urls)")
+        TELEMETRY.event("site_start", site, urls=len(urls))
+        if batch_size: _download_batched(urls, ctx, stats, site_stats)
+        else: _download_urls(urls, ctx, stats, site_stats)
+    finally:
+        site_active(site, False); archive_unlock(lock)
+        if worker: worker.close()
+        if cfg.get("adaptive_delay"): HOST_PACER.save()
+    for key in ("download_sec","sleep_sec"):
+        if ctx.get(key): stats.bump(site_stats, key, round(ctx[key],2))
+    TELEMETRY.event("site_end", site, ok=site_stats["ok"], fail=site_stats["fail"],
+                    download_sec=round(ctx.get("download_sec",0),2), sleep_sec=round(ctx.get("sleep_sec",0),2))
+    print(f"\n{site} done. ok={site_stats['ok']} fail={site_stats['fail']} attempted={site_stats['attempted']}"
+          + f" files: {site_stats.get('new_files',0)} new, {site_stats.get('skipped_files',0)} skipped"
+          + (f", {human_bytes(site_stats['bytes'])}" if site_stats.get("bytes") else "")
+          + (f" skipped={site_stats['skipped']}" if site_stats.get("skipped") else "")
+          + (f" retried={site_stats['retried']} recovered={site_stats.get('recovered',0)}" if site_stats.get("retried") else "")
+          + (f"; time: {site_stats.get('download_sec',0):.0f}s downloading, {site_stats.get('sleep_sec',0):.0f}s pacing" if ctx.get("download_sec") else ""))
+    set_console_title(f"{APP_NAME} {APP_VERSION}")
+
+def _over_budget(ctx:Dict, stats:RunStats, site_stats:Dict, left:int)->bool:
+    """True once the site's max_run_minutes is used up; the `left` URLs not started count as skipped."""
+    if not ctx.get("deadline") or time.time()<ctx["deadline"]: return False
+    if left>0:
+        stats.bump(site_stats,"skipped",left)
+        print(c(f"[{now_ts()}] {ctx['site']}: time budget used up → {left} URLs left for the next run", YELLOW))
+    return True
+
+def _pick_dest(ctx:Dict, stats:RunStats, site_stats:Dict, left:int)->bool:
+    """Choose the download root for the next run (ctx["dest"]). While no volume has room the site
+    waits, asking again every DEST_RECHECK_SEC, for up to DEST_WAIT_SEC per run (or until its time
+    budget ends). False if that runs out: the `left` URLs not started count as skipped."""
+    need=ctx.get("run_bytes",0)//max(1, ctx.get("runs",0))  # this site's average run
+    told=False
+    while True:
+        now=time.time()
+        if now>=ctx.get("dest_retry_at",0):
+            pick=DEST_POOL.acquire(ctx["dest_pool"], need)
+            if pick:
+                if len(ctx["dest_pool"])>1 and pick["path"]!=ctx.get("dest"):
+                    print(f"  \u2192 Destination: {pick['path']} ({human_bytes(pick['free'])} free)")
+                ctx["dest"]=pick["path"]; ctx["dest_pick"]=pick; ctx.pop("dest_wait_until", None)
+                return True
+            ctx["dest_retry_at"]=now+DEST_RECHECK_SEC
+        until=ctx.setdefault("dest_wait_until", min(now+DEST_WAIT_SEC, ctx.get("deadline") or float("inf")))
+        if now>=until or ABORT["stop"] or _maybe_handle_sigint()=="abort": break
+        wait=min(ctx["dest_retry_at"], until)-now
+        _pause(ctx, wait, "no_space", c(f"[{now_ts()}] {ctx['site']}: no destination has room (min_free_gb) → waiting, "
+                                         f"checking again in {wait:.0f}s" if not told else f"  \u2192 Still no room, checking again in {wait:.0f}s", YELLOW))
+        told=True
+    if left>0:
+        stats.bump(site_stats,"skipped",left)
+        print(c(f"[{now_ts()}] {ctx['site']}: still no destination with room → {left} URLs held back for the next run", YELLOW))
+    return False
+
+def _release_dest(ctx:Dict, out:GdlOutput, elapsed:float):
+    DEST_POOL.release(ctx.pop("dest_pick", None), out.bytes, elapsed)
+    ctx["run_bytes"]=ctx.get("run_bytes",0)+out.bytes; ctx["runs"]=ctx.get("runs",0)+1
+
+def _run_with_ctrl_c(run)->Tuple[int, Optional[str]]:
+    """run() → gallery-dl rc. On Ctrl+C (rc 130) ask the user, or take the answer another worker got for
+    the same Ctrl+C: returns (rc, 'abort'|'skip'), or retries once on Continue and returns (rc, None)."""
+    gen=ABORT["gen"]+1; rc=run()  # any Ctrl+C from here on interrupted this run
+    if rc!=130: return rc, None
+    act=_maybe_handle_sigint(gen)
+    if act in ("abort","skip"): return rc, act
+    print(c("Retrying after Ctrl+C...", YELLOW))
+    return run(), None
+
+def _attempt_url(ctx:Dict, url:str, label:str)->Tuple[int, Optional[str], float, GdlOutput]:
+    """One gallery-dl run for url (host pacing, Ctrl+C handling, URL-state record) → (rc, action, seconds, output counts)."""
+    site=ctx["site"]; pacing=ctx.get("pacing"); host=extract_host(url) or site
+    if pacing:
+        wait,cur=HOST_PACER.acquire(host, *pacing)
+        if wait>0: _pause(ctx, wait, "pacing", f"  \u2192 Pacing {host}: waiting {wait:.1f}s (adaptive delay {cur:.1f}s)")
+    t0=time.time(); set_console_title(f"{APP_NAME} {APP_VERSION} · {site} · {label}")
+    print(f"[{now_ts()}] {site} [{label}] START: {url}"); TELEMETRY.url_started(site, url, label)
+    out=GdlOutput()
+    rc,act=_run_with_ctrl_c(lambda: BUDGET.run(ctx, {host}, lambda lim: run_gallery_dl(ctx["invocation"],url,ctx["dest"],ctx["archive"],
+                                                   load_app_settings().get("global_extra_args",""),ctx["site_args"],ctx["worker"],lim,out)))
+    elapsed=time.time()-t0-ctx.pop("budget_wait",0.0); ctx["last_end"]=time.time(); ctx["download_sec"]=ctx.get("download_sec",0.0)+elapsed
+    _release_dest(ctx, out, elapsed)
+    if ctx["journal"]: ctx["journal"].add_output(site, out, elapsed)
+    TELEMETRY.url_finished(site, url, label, rc, elapsed, out); history_url(site, url, rc, elapsed, out)
+    if act!="abort":
+        url_state_record(site, url, rc, elapsed, out.new_files_known())  # None: unknown, streak untouched
+        if pacing:
+            throttled=is_throttled(rc, out.error_lines+out.warn_lines)
+            d=HOST_PACER.feedback(host, throttled, rc==0, *pacing)
+            if throttled: print(c(f"  \u2192 {host} looks throttled (rc={rc}) → delay now {d:.1f}s", YELLOW))
+    return rc, act, elapsed, out
+
+def _count_output(stats:RunStats, site_stats:Dict, out:GdlOutput):
+    for key in ("new_files","skipped_files","errors","bytes"):
+        n=getattr(out, key)
+        if n: stats.bump(site_stats, key, n)
+
+def _finish_url(ctx:Dict, stats:RunStats, site_stats:Dict, url:str, label:str, rc:int, elapsed:float, skipped:bool=False,
+                out:Optional[GdlOutput]=None):
+    """Final outcome of a URL (after any retries): counters, journal, console line."""
+    site=ctx["site"]; info=f" ({out.summary()})" if out else ""
+    if ctx["journal"]: ctx["journal"].record(site, url, rc, rc==0 and not skipped, elapsed)
+    if skipped:
+        stats.bump(site_stats,"fail"); print(c(f"[{now_ts()}] {site} [{label}] SKIPPED after Ctrl+C", YELLOW))
+    elif rc==0:
+        stats.bump(site_stats,"ok"); print(c(f"[{now_ts()}] {site} [{label}] OK in {elapsed:.1f}s{info}", GREEN))
+    else:
+        stats.bump(site_stats,"fail"); print(c(f"[{now_ts()}] {site} [{label}] FAIL rc={rc} in {elapsed:.1f}s{info}", RED))
+
+def _is_retryable(ctx:Dict, rc:int)->bool:
+    # gallery-dl return codes are bit flags (1 general, 4 HTTP, 8 not found, 16 auth, 64 unsupported URL)
+    return ctx["retry_max"]>0 and rc not in (0,130) and (rc<0 or bool(rc & ctx["retry_mask"]))
+
+def _defer_retry(ctx:Dict, queue:List, url:str, attempt:int, rc:int, label:str):
+    wait=ctx["retry_backoff"]*(2**(attempt-1))
+    queue.append((time.time()+wait, url, attempt, rc))
+    TELEMETRY.event("retry", ctx["site"], url=url, attempt=attempt, rc=rc, backoff=wait); TELEMETRY.inc("gdlm_retries", site=ctx["site"])
+    print(c(f"[{now_ts()}] {ctx['site']} [{label}] FAIL rc={rc} → retry {attempt}/{ctx['retry_max']} in ≥{wait:g}s (after the main pass): {url}", YELLOW))
+
+def _drop_retries(ctx:Dict, queue:List, stats:RunStats, site_stats:Dict, why:str):
+    """The site stops with retries still queued: those URLs did run and fail, so they end as failed
+    with their last rc (not as skipped, which would count them twice)."""
+    print(c(f"[{now_ts()}] {ctx['site']}: {why} → {len(queue)} queued retries given up", YELLOW))
+    for _,url,attempt,rc in sorted(queue): _finish_url(ctx, stats, site_stats, url, f"retry {attempt}/{ctx['retry_max']}", rc, 0.0)
+    queue.clear()
+
+def _process_retries(ctx:Dict, queue:List, stats:RunStats, site_stats:Dict):
+    """Deferred retries run after the main pass so failing URLs never hold up healthy ones."""
+    if not queue or ABORT["stop"]: return
+    print(f"  \u2192 Retry queue for {ctx['site']}: {len(queue)} URLs")
+    gap=0 if ctx.get("pacing") else ctx["per_url_delay"]  # the pacer spaces requests itself
+    while queue:
+        if _over_budget(ctx, stats, site_stats, 0): _drop_retries(ctx, queue, stats, site_stats, "time budget used up"); return
+        queue.sort(key=lambda e: e[0]); due,url,attempt,last_rc=queue.pop(0)
+        wait=max(due, ctx.get("last_end",0)+gap)-time.time()
+        if wait>0: _pause(ctx, wait, "retry_wait", f"  \u2192 Waiting {wait:.1f}s before retry {attempt}/{ctx['retry_max']}: {url}")
+        label=f"retry {attempt}/{ctx['retry_max']}"
+        act=_maybe_handle_sigint()
+        if act == "abort": return
+        if act == "skip": _finish_url(ctx, stats, site_stats, url, label, 130, 0.0, skipped=True); continue
+        if not _pick_dest(ctx, stats, site_stats, 0):
+            queue.append((due, url, attempt, last_rc)); _drop_retries(ctx, queue, stats, site_stats, "no destination with room"); return
+        rc,act,elapsed,out=_attempt_url(ctx, url, label)
+        stats.bump(site_stats,"retried"); _count_output(stats, site_stats, out)
+        if act == "abort": return
+        if act == "skip": _finish_url(ctx, stats, site_stats, url, label, rc, elapsed, skipped=True); continue
+        if rc!=0 and attempt<ctx["retry_max"] and _is_retryable(ctx, rc):
+            _defer_retry(ctx, queue, url, attempt+1, rc, label)
+        else:
+            if rc==0: stats.bump(site_stats,"recovered")
+            _finish_url(ctx, stats, site_stats, url, label, rc, elapsed, out=out)
+
+def _download_urls(urls:Sequence[str], ctx:Dict, stats:RunStats, site_stats:Dict):
+    per_url_delay=ctx["per_url_delay"]; base_sleep=ctx["base_sleep"]; jitter=ctx["jitter"]
+    retry_q: List[Tuple[float,str,int,int]] = []
+    for idx,url in enumerate(urls,1):
+        act = _maybe_handle_sigint()
+        if act == "abort": break
+        if act == "skip": continue
+        if _over_budget(ctx, stats, site_stats, len(urls)-idx+1): break
+        if not _pick_dest(ctx, stats, site_stats, len(urls)-idx+1): break  # before the sleep: a full disk costs no delay
+
+        s=compute_sleep(base_sleep, jitter)
+        if s>0: _pause(ctx, s, "pre_url", f"  \u2192 Sleeping {s:.2f}s before URL {idx}/{len(urls)}")
+
+        label=f"{idx}/{len(urls)}"
+        rc,act,elapsed,out=_attempt_url(ctx, url, label)
+        stats.bump(site_stats,"attempted"); _count_output(stats, site_stats, out)
+        if act == "abort":
+            break
+        if act == "skip":
+            _finish_url(ctx, stats, site_stats, url, label, rc, elapsed, skipped=True)
+            continue
+        if rc!=0 and _is_retryable(ctx, rc): _defer_retry(ctx, retry_q, url, 1, rc, label)
+        else: _finish_url(ctx, stats, site_stats, url, label, rc, elapsed, out=out)
+
+        if not ctx.get("pacing") and per_url_delay>0 and idx<len(urls):
+            _pause(ctx, per_url_delay, "inter_url", f"  \u2192 Inter-URL delay {per_url_delay}s")
+    _process_retries(ctx, retry_q, stats, site_stats)
+
+def _download_batched(urls:Sequence[str], ctx:Dict, stats:RunStats, site_stats:Dict):
+    """Hand gallery-dl `batch_size` URLs per call via --input-file. Per-URL results come from
+    --error-file: listed URLs failed, the rest of the chunk succeeded."""
+    import tempfile
+    site=ctx["site"]; n=ctx["batch_size"]; retry_q: List[Tuple[float,str,int,int]] = []
+    print(f"  \u2192 Batched mode: {n} URLs per gallery-dl call {' '.join(ctx['batch_args'])}".rstrip())
+    for start in range(0, len(urls), n):
+        act = _maybe_handle_sigint()
+        if act == "abort": break
+        if act == "skip": continue
+        if _over_budget(ctx, stats, site_stats, len(urls)-start): break
+        if not _pick_dest(ctx, stats, site_stats, len(urls)-start): break
+        chunk=urls[start:start+n]; label=f"{start+1}-{start+len(chunk)}/{len(urls)}"
+        with tempfile.TemporaryDirectory(prefix="mgdl-") as td:
+            inp=Path(td)/"input.txt"; errf=Path(td)/"errors.txt"
+            inp.write_text("\n".join(chunk)+"\n", encoding="utf-8")
+            t0=time.time(); set_console_title(f"{APP_NAME} {APP_VERSION} · {site} · {label}")
+            print(f"[{now_ts()}] {site} [{label}] START batch of {len(chunk)}"); TELEMETRY.url_started(site, None, label)
+            extra=ctx["batch_args"]+["--input-file", str(inp), "--error-file", str(errf)]
+            out=GdlOutput()
+            def run(lim):
+                errf.unlink(missing_ok=True)
+                return run_gallery_dl(ctx["invocation"],None,ctx["dest"],ctx["archive"],load_app_settings().get("global_extra_args",""),
+                                      ctx["site_args"],ctx["worker"],extra+lim,out)
+            rc,act=_run_with_ctrl_c(lambda: BUDGET.run(ctx, {extract_host(u) or site for u in chunk}, run))
+            elapsed=time.time()-t0-ctx.pop("budget_wait",0.0); ctx["last_end"]=time.time(); ctx["download_sec"]=ctx.get("download_sec",0.0)+elapsed
+            _release_dest(ctx, out, elapsed)
+            if ctx["journal"]: ctx["journal"].add_output(site, out, elapsed)
+            TELEMETRY.url_finished(site, None, label, rc, elapsed, out, urls=len(chunk))
+            failed=set()
+            if errf.exists():
+                failed={ln.strip() for ln in errf.read_text(encoding="utf-8", errors="ignore").splitlines() if ln.strip()}
+        stats.bump(site_stats,"attempted",len(chunk)); _count_output(stats, site_stats, out)
+        if act == "abort":
+            break
+        each=elapsed/len(chunk)
+        if act == "skip":
+            for url in chunk: _finish_url(ctx, stats, site_stats, url, label, rc, each, skipped=True)
+            continue
+        if rc!=0 and not failed: failed=set(chunk)  # run-level error (bad args/config): nothing is known to be done
+        for url in chunk:
+            url_state_record(site, url, rc if url in failed else 0, each); history_url(site, url, rc if url in failed else 0, each)
+            if url not in failed:
+                stats.bump(site_stats,"ok")
+                if ctx["journal"]: ctx["journal"].record(site, url, 0, True, each)
+            elif _is_retryable(ctx, rc): _defer_retry(ctx, retry_q, url, 1, rc, label)
+            else: _finish_url(ctx, stats, site_stats, url, label, rc, each)
+        bad=sum(1 for u in chunk if u in failed)
+        print(c(f"[{now_ts()}] {site} [{label}] batch done in {elapsed:.1f}s: ok={len(chunk)-bad} fail={bad} ({out.summary()})", GREEN if not bad else YELLOW))
+    _process_retries(ctx, retry_q, stats, site_stats)  # retried one URL per call
+
+def download_all(app:Dict, stats:RunStats, skip_sites:Optional[List[str]]=None, skip_hosts:Optional[set]=None,
+                 journal:Optional[RunJournal]=None):
+    """Run every site, up to app['max_parallel_sites'] at once. Each site keeps its own
+    delay/sleep/jitter pacing; all workers report into the same RunStats."""
+    sites=[s for s in get_sites() if s not in set(skip_sites or [])]
+    jobs=max(1, int(app.get("max_parallel_sites", 1) or 1))
+    if jobs<=1 or len(sites)<=1:
+        for site in sites:
+            if ABORT["stop"]: break
+            download_for_site(site, app, load_site_settings(), stats, skip_hosts, journal)
+        return
+    from concurrent.futures import ThreadPoolExecutor, wait
+    jobs=min(jobs, len(sites))
+    print(c(f"\nRunning {len(sites)} sites with {jobs} parallel workers.", WHITE))
+    site_cfg=load_site_settings()
+    with ThreadPoolExecutor(max_workers=jobs, thread_name_prefix="site") as ex:
+        pending={ex.submit(download_for_site, site, app, site_cfg, stats, skip_hosts, journal): site for site in sites}
+        # Short timeouts keep the main thread responsive to Ctrl+C (signals only run there).
+        while pending:
+            done,_=wait(list(pending), timeout=0.5)
+            for f in done:
+                site=pending.pop(f)
+                if f.exception(): print(c(f"[{now_ts()}] {site}: worker error: {f.exception()}", RED))
+            if ABORT["stop"]:
+                for f in pending: f.cancel()
+
+# ----------------------------- PLANNER -------------------------------------
+# Dry-run estimate of a run from the URL lists, site settings and history: per URL the last
+# gallery-dl duration (url-state), else the site's mean over the last PLAN_HISTORY_DAYS, else the
+# mean over all sites, else PLAN_DEFAULT_URL_SEC; plus the sleeps the current settings would add.
+# Sites are laid out on the parallel slots longest first, as run_all would take them.
+PLAN_HISTORY_DAYS=30
+PLAN_DEFAULT_URL_SEC=15.0
+
+def expected_sleep(base:float, jitter:float)->float:
+    """Mean of compute_sleep(base, jitter): uniform over [max(0, base-jitter), base+jitter]."""
+    if base<=0: return 0.0
+    return (max(0.0, base-jitter)+base+jitter)/2
+
+def history_url_profile(site:Optional[str]=None, days:float=PLAN_HISTORY_DAYS)->Dict:
+    """Mean gallery-dl seconds and new files per URL run of a site (all sites if None)."""
+    since=time.time()-days*86400
+    with _HISTORY_LOCK:
+        conn=_history_db()
+        q="SELECT COUNT(*), AVG(duration), AVG(new_files) FROM url_runs WHERE ts>=? AND duration IS NOT NULL"+(" AND site=?" if site else "")
+        n,dur,files=conn.execute(q, (since, site) if site else (since,)).fetchone()
+    return {"n":n or 0, "mean_sec":dur, "files_per_url":files or 0.0}
+
+def plan_site(site:str, cfg:Dict, fallback_sec:float, delay:Optional[float]=None, base_sleep:Optional[float]=None,
+              delay_scale:float=1.0)->Dict:
+    """Estimated seconds for one site: gallery-dl work, sleeping, and URLs a time budget would hold back."""
+    urls=read_site_urls(site); state=url_state_for_site(site) if urls else {}; now=time.time()
+    due=[u for u in urls if url_is_due(state.get(u), cfg, now)] if float(cfg.get("min_recheck_hours",0) or 0)>0 else urls
+    prof=history_url_profile(site); site_mean=prof["mean_sec"] or fallback_sec
+    per_url_delay=float(cfg.get("delay_between_urls_sec", DEFAULT_DELAY) if delay is None else delay)*delay_scale
+    base=float(cfg.get("base_sleep_sec", DEFAULT_BASE_SLEEP) if base_sleep is None else base_sleep)*delay_scale
+    jitter=float(cfg.get("jitter_sec", DEFAULT_JITTER))*delay_scale
+    mode=str(cfg.get("sleep_mode","url")).lower(); n=len(due)
+    known=0; gdl=0.0
+    for u in due:
+        d=(state.get(u) or {}).get("last_duration")
+        if d is not None: known+=1; gdl+=float(d)
+        else: gdl+=site_mean
+    sleep=0.0
+    if mode=="item":  # gallery-dl sleeps before every file: swap the recorded per-file sleeps for the planned ones
+        files=prof["files_per_url"]*n
+        gdl=max(0.0, gdl-files*expected_sleep(float(cfg.get("base_sleep_sec", DEFAULT_BASE_SLEEP)), float(cfg.get("jitter_sec", DEFAULT_JITTER))))
+        sleep+=files*expected_sleep(base, jitter)
+    batch=int(cfg.get("batch_size",0) or 0); pace=None
+    if batch>1 and (mode=="item" or per_url_delay==0):  # --sleep-extractor before each input URL, no manager sleeps
+        sleep+=n*(per_url_delay if mode=="item" else expected_sleep(base, jitter))
+    else:
+        if cfg.get("adaptive_delay"):  # the learned per-host delays replace delay_between_urls
+            if delay is None:  # --delay-scale scales the learned delays and their bounds alike
+                lo=float(cfg.get("min_delay_sec",5))*delay_scale; hi=max(lo, float(cfg.get("max_delay_sec",300))*delay_scale)
+                hosts=load_json(FILE_HOST_PACING, {}); learned=[float(hosts[h]) for h in {extract_host(u) for u in due} if h in hosts]
+                per_url_delay=min(hi, max(lo, sum(learned)/len(learned)*delay_scale if learned else per_url_delay))
+            pace=per_url_delay  # --delay is taken as the pace itself, in place of what was learned
+        sleep+=n*(0.0 if mode=="item" else expected_sleep(base, jitter))+max(0, n-1)*per_url_delay
+    total=gdl+sleep; held=0; cap=float(cfg.get("max_run_minutes",0) or 0)*60
+    if cap and total>cap:
+        held=n-int(n*cap/total); gdl*=cap/total; sleep*=cap/total; total=cap
+    return {"site":site, "urls":len(urls), "due":n, "known":known, "work_sec":round(gdl,1), "sleep_sec":round(sleep,1),
+            "total_sec":round(total,1), "held_back":held, "per_url_sec":round(site_mean,1),
+            "adaptive_sec":None if pace is None else round(pace,1)}
+
+def plan_run(sites:Optional[List[str]]=None, jobs:Optional[int]=None, delay:Optional[float]=None,
+             base_sleep:Optional[float]=None, delay_scale:float=1.0)->Dict:
+    """Estimate a run without downloading anything; the keyword arguments are what-if overrides."""
+    app=load_app_settings(); site_cfg=load_site_settings()
+    jobs=max(1, int(jobs or app.get("max_parallel_sites",1) or 1))
+    if int(app.get("max_concurrent_processes",0) or 0): jobs=min(jobs, int(app["max_concurrent_processes"]))
+    fallback=history_url_profile()["mean_sec"] or PLAN_DEFAULT_URL_SEC
+    rows=[plan_site(s, site_cfg.get(s, {}), fallback, delay, base_sleep, delay_scale) for s in (sites or get_sites())]
+    rows=[r for r in rows if r["urls"]]
+    slots=[0.0]*jobs
+    for r in sorted(rows, key=lambda r: -r["total_sec"]):  # longest site first onto the slot that frees up first
+        i=slots.index(min(slots)); r["start_sec"]=round(slots[i],1); slots[i]+=r["total_sec"]
+    wall=max(slots) if rows else 0.0
+    return {"jobs":jobs, "sites":rows, "wall_sec":round(wall,1), "sequential_sec":round(sum(r["total_sec"] for r in rows),1),
+            "sleep_sec":round(sum(r["sleep_sec"] for r in rows),1), "work_sec":round(sum(r["work_sec"] for r in rows),1),
+            "finish_at":(dt.datetime.now()+dt.timedelta(seconds=wall)).strftime("%Y-%m-%d %H:%M"),
+            "what_if":{k:v for k,v in (("delay",delay),("base_sleep",base_sleep),("delay_scale",delay_scale if delay_scale!=1 else None)) if v is not None}}
+
+def human_duration(sec:float)->str:
+    sec=int(round(sec)); h,rem=divmod(sec,3600); m,s=divmod(rem,60)
+    return f"{h}h{m:02d}m" if h else (f"{m}m{s:02d}s" if m else f"{s}s")
+
+def print_plan(plan:Dict, base:Optional[Dict]=None):
+    print(f"  {'site':<20} {'URLs':>8} {'due':>8} {'history':>8} {'gallery-dl':>11} {'sleeping':>10} {'total':>9}  sleep%")
+    for r in sorted(plan["sites"], key=lambda r: r["site"]):
+        pct=100*r["sleep_sec"]/r["total_sec"] if r["total_sec"] else 0
+        print(f"  {r['site']:<20} {r['urls']:>8} {r['due']:>8} {r['known']:>8} {human_duration(r['work_sec']):>11} "
+              f"{human_duration(r['sleep_sec']):>10} {human_duration(r['total_sec']):>9}  {pct:4.0f}%"
+              + (c(f"  ({r['held_back']} held back by max_run_minutes)", YELLOW) if r["held_back"] else "")
+              + (f"  (adaptive, ~{r['adaptive_sec']}s between URLs)" if r.get("adaptive_sec") is not None else ""))
+    seq=plan["sequential_sec"]; pct=100*plan["sleep_sec"]/seq if seq else 0
+    print(f"\n  One after another: {human_duration(seq)} ({pct:.0f}% sleeping). With {plan['jobs']} in parallel: "
+          + c(f"{human_duration(plan['wall_sec'])}, done around {plan['finish_at']}", GREEN))
+    if base and base["wall_sec"]:
+        diff=plan["wall_sec"]-base["wall_sec"]
+        print(f"  vs. current settings ({human_duration(base['wall_sec'])}): {'+' if diff>=0 else '-'}{human_duration(abs(diff))} ({100*diff/base['wall_sec']:+.0f}%)")
+    print("  Estimates use past gallery-dl durations; retries and brand-new content are not included.")
+
+def plan_menu():
+    clear_screen(); banner("Plan a run (nothing is downloaded)", ROOT)
+    base=plan_run(); print_plan(base)
+    while True:
+        print(c("\nWhat if... (empty = keep current)", BLUE))
+        jobs=prompt(f"  Sites in parallel [{base['jobs']}]: ").strip()
+        if not jobs and not prompt("  Change delays? [y/N]: ").strip().lower().startswith("y"): return
+        delay=prompt("  Delay between URLs for every site, seconds: ").strip()
+        sleep=prompt("  Base sleep for every site, seconds: ").strip()
+        scale=prompt("  Scale all delays/sleeps by (e.g. 0.5): ").strip()
+        try:
+            plan=plan_run(jobs=int(jobs) if jobs else None, delay=float(delay) if delay else None,
+                          base_sleep=float(sleep) if sleep else None, delay_scale=float(scale) if scale else 1.0)
+        except ValueError: print(c("Invalid number.", RED)); continue
+        print(); print_plan(plan, base)
+
+# ----------------------------- MENU & ACTIONS ------------------------------
+def site_settings_menu():
+    sites=get_sites()
+    if not sites: print("No sites yet. Add *.txt to URL-Lists/"); return
+    cfg=load_site_settings()
+    while True:
+        clear_screen(); banner("Site settings (delay, base sleep ± jitter, sleep mode, extra args)", ROOT)
+        for i,s in enumerate(sites,1):
+            csite=cfg.get(s, {"delay_between_urls_sec":DEFAULT_DELAY,"base_sleep_sec":DEFAULT_BASE_SLEEP,"sleep_mode":"url"})
+            print(c(f"  {i} – {s} [delay_between_urls={csite.get('delay_between_urls_sec',DEFAULT_DELAY)}s, base_sleep={csite.get('base_sleep_sec',DEFAULT_BASE_SLEEP)}s, mode={csite.get('sleep_mode','url')}]", BLUE))
+        print(c("  0 – Back", BLUE))
+        try: ch=int(prompt("Choose: ").strip() or "0")
+        except Exception: return
+        if ch==0: return
+        idx=ch-1
+        if not (0<=idx<len(sites)): continue
+        s=sites[idx]
+        cur=cfg.get(s, {"delay_between_urls_sec":DEFAULT_DELAY,"base_sleep_sec":DEFAULT_BASE_SLEEP,"jitter_sec":DEFAULT_JITTER,"sleep_mode":"url","extra_args":""})
+        delay=int(input_default(f"Delay between URLs for {s} in seconds", str(cur.get("delay_between_urls_sec", DEFAULT_DELAY))))
+        base_sleep=int(input_default(f"Base sleep seconds for {s} (randomized ±1s)", str(cur.get("base_sleep_sec", DEFAULT_BASE_SLEEP))))
+        # sleep mode
+        cur_mode = cur.get("sleep_mode","url")
+        mode = input_default(f"Sleep mode for {s} ('url' or 'item')", cur_mode).strip().lower()
+        if mode not in ("url","item"): mode = "url"
+        # jitter with validation when mode=item
+        while True:
+            jitter_str = input_default(f"Jitter seconds (±) for {s}", str(cur.get("jitter_sec", DEFAULT_JITTER)))
+            try:
+                jitter = float(jitter_str)
+            except Exception:
+                print(c("Invalid number. Try again.", RED)); continue
+            if mode == "item" and jitter > base_sleep:
+                print(c("Jitter cannot exceed Base sleep in item mode (no negative ranges). Try again.", RED))
+                continue
+            break
+        try: recheck=float(input_default(f"Re-check each URL of {s} at most every N hours (0=every run; doubles while a URL finds nothing new)", str(cur.get("min_recheck_hours",0))))
+        except Exception: recheck=0
+        try: retries=int(input_default(f"Retries for failed URLs of {s} (0=off; run after the main pass, backoff {cur.get('retry_backoff_sec',60)}s doubling)", str(cur.get("retry_max_attempts",0))))
+        except Exception: retries=0
+        try: batch=int(input_default(f"URLs per gallery-dl call for {s} (batch; 0=off, used only when mode=item or delay=0)", str(cur.get("batch_size",0))))
+        except Exception: batch=0
+        order=input_default(f"URL order for {s} ('file' or 'yield' = productive/overdue URLs first)", str(cur.get("url_order","file"))).strip().lower()
+        if order not in ("file","yield"): order="file"
+        try: budget=float(input_default(f"Time budget per run for {s} in minutes (0=unlimited; remaining URLs wait for the next run)", str(cur.get("max_run_minutes",0))))
+        except Exception: budget=0
+        pool_str="; ".join(f"{e['path']}*{e.get('weight',1):g}" if isinstance(e, dict) else str(e) for e in cur.get("dest_pool") or [])
+        pool_str=input_default(f"Download roots for {s}, ';'-separated, optional *weight (empty = Downloads/)", pool_str)
+        pool=[]
+        for part in [x.strip() for x in pool_str.split(";") if x.strip()]:
+            path,_,w=part.rpartition("*") if re.search(r"\*\s*[\d.]+$", part) else (part,"","1")
+            old=next((e for e in cur.get("dest_pool") or [] if isinstance(e, dict) and str(e.get("path"))==path.strip()), {})
+            pool.append({**old, "path":path.strip(), "weight":float(w)})
+        try: min_free=float(input_default(f"Minimum free space per download root for {s} in GB (0=off; URLs are held back below it)", str(cur.get("min_free_gb",0))))
+        except Exception: min_free=0
+        print(f"\nAdvanced: per-site extra gallery-dl args (see {GDL_OPTIONS_URL})")
+        warn=" (note: --sleep here is ignored when base_sleep>0 in url mode or when mode=item, since manager injects it)"
+        extra=input_default(f"Args for {s}{warn}", str(cur.get("extra_args","")))
+        extra=_normalize_args_to_string(extra)
+        # strip --sleep if we will handle sleeping ourselves (either base>0 in url mode, or item mode)
+        will_inject = (mode=="item") or (base_sleep>0 and mode=="url")
+        if will_inject and extra:
+            toks=shlex.split(extra); kept=[]; i=0
+            while i<len(toks):
+                if toks[i]=="--sleep" and i+1<len(toks): i+=2; continue
+                kept.append(toks[i]); i+=1
+            extra=" ".join(kept)
+        cfg[s]={**cur, "delay_between_urls_sec":delay,"base_sleep_sec":base_sleep,"jitter_sec":jitter,"sleep_mode":mode,
+                "batch_size":max(0,batch),"min_recheck_hours":max(0.0,recheck),"retry_max_attempts":max(0,retries),
+                "url_order":order,"max_run_minutes":max(0.0,budget),"dest_pool":pool,"min_free_gb":max(0.0,min_free),"extra_args":extra}
+        save_json(FILE_SITE_SETTINGS, cfg)
+        print(c("Saved.", GREEN)); input("Enter to continue...")
+
+def check_install_gallery_dl():
+    refresh=False
+    while True:
+        clear_screen(); banner("Check/Install gallery-dl", ROOT)
+        app=load_app_settings()
+        invocation, resolved = find_gallery_dl(app, refresh)
+        latest = latest_gallery_dl_version(refresh)
+        if invocation:
+            cur = gallery_dl_version(invocation, resolved, refresh)
+            print(c(f"Using: {invocation}", WHITE))
+            if resolved: print(c(f"Resolved path: {resolved}", WHITE))
+            if latest and latest not in cur:
+                print(c(f"You are running {cur}, but latest is {latest}", YELLOW))
+            else:
+                print(c(f"Current version: {cur}", GREEN))
+            if not latest: print("Latest version on PyPI: " + ("checking in the background (Re-check to see it)" if latest_check_running() else "unknown (pip not found?)"))
+        else:
+            print(c("Not found on PATH.", RED))
+        refresh=False
+        print("\nOptions:\n  1) pip install --upgrade gallery-dl (matches the interpreter above)\n  2) Re-check\n  3) Set explicit gallery-dl command/path\n  0) Back")
+        ch=prompt("Choose: ")
+        if ch=="1":
+            invocation, resolved = find_gallery_dl(app)
+            pip_cmd = matching_pip_for(invocation or "", resolved or "")
+            if not pip_cmd:
+                print(c("No suitable pip found. Install Python/pip.", RED)); input("Enter to continue..."); continue
+            cmdline = pip_cmd + ["install","--upgrade","gallery-dl"]
+            print(c("Running: ", MAGENTA) + " ".join(cmdline))
+            import subprocess; subprocess.call(cmdline)
+            continue
+        elif ch=="2":
+            refresh=True
+            continue
+        elif ch=="3":
+            new = input_default("Enter full command to run gallery-dl (e.g., 'python -m gallery_dl' or full path to gallery-dl)", (app.get("gallery_dl_path") or ""))
+            app["gallery_dl_path"] = new.strip() or None
+            save_json(FILE_APP_SETTINGS, app)
+            continue
+        elif ch=="0":
+            break
+
+def show_recent_runs():
+    days=7.0
+    while True:
+        clear_screen(); banner("Recent runs", ROOT); print_recent_runs(); print(); print_history_stats(days)
+        ans=prompt("\nWindow in days (Enter = back): ").strip()
+        try: days=float(ans)
+        except ValueError: return
+
+def _backup_sources()->List[Path]:
+    files=[p for p in DIR_CONFIG.rglob("*") if p.is_file() and DIR_URL_CACHE not in p.parents] + sorted(DIR_URL_LISTS.rglob("*.txt"))
+    if DIR_ARCHIVES.exists(): files+=[p for p in DIR_ARCHIVES.rglob("*") if p.is_file()]
+    # -wal/-shm are folded into the snapshot of their database; temp files are mid-write
+    return [p for p in files if not p.name.endswith(("-wal","-shm","-journal",".tmp",".lock"))]
+
+def _is_sqlite(p:Path)->bool: return p.suffix.lower() in (".sqlite",".sqlite3",".db")
+
+def sqlite_snapshot(src:Path, dst:Path)->bool:
+    """Consistent copy of a possibly live database via SQLite's online backup API (includes
+    committed WAL content). False if src isn't a readable database."""
+    import sqlite3
+    try:
+        s=sqlite3.connect(str(src), timeout=30); d=sqlite3.connect(str(dst))
+        try: s.backup(d)
+        finally: d.close(); s.close()
+        return True
+    except sqlite3.Error:
+        return False
+
+def make_backup_zip()->Path:
+    import zipfile, tempfile
+    ts=ts_for_filename(); out=DIR_BACKUPS/f"gallery-dl-manager-backup-{ts}.zip"
+    with zipfile.ZipFile(out,"w",compression=zipfile.ZIP_DEFLATED) as z, tempfile.TemporaryDirectory(prefix="mgdl-bak-") as td:
+        for p in _backup_sources():
+            snap=Path(td)/"db"
+            if _is_sqlite(p) and sqlite_snapshot(p, snap): z.write(snap, p.relative_to(ROOT)); snap.unlink()
+            else: z.write(p, p.relative_to(ROOT))
+    return out
+
+# Incremental backups: files are split into fixed 1 MiB chunks stored once under
+# backups/store/chunks/<sha256> (zlib); each snapshot is a JSON manifest listing the chunks of every
+# file. SQLite rewrites pages in place, so a grown or updated archive only adds its changed chunks.
+BACKUP_CHUNK=1<<20
+def _store_dir()->Path: return DIR_BACKUPS/"store"
+def _chunk_path(h:str)->Path: return _store_dir()/"chunks"/h[:2]/h
+
+def _snapshot_files()->List[Path]:
+    """Manifests oldest first; ids are <timestamp> or <timestamp>-<n> for same-second snapshots."""
+    def key(p:Path):
+        d,_,rest=p.stem.partition("-"); t,_,n=rest.partition("-"); return (d, t, int(n) if n.isdigit() else 1)
+    return sorted((_store_dir()/"snapshots").glob("*.json"), key=key)
+
+def list_snapshots()->List[Dict]:
+    out=[]
+    for p in _snapshot_files():
+        d=load_json(p, None)
+        if d: out.append(d)
+    return out
+
+def _write_chunk(h:str, buf:bytes)->int:
+    import zlib
+    p=_chunk_path(h); p.parent.mkdir(parents=True, exist_ok=True)
+    data=zlib.compress(buf, 6); tmp=p.with_name(p.name+f".{threading.get_ident()}.tmp")
+    with open(tmp,"wb") as f: f.write(data); f.flush(); os.fsync(f.fileno())
+    os.replace(tmp, p); return len(data)
+
+def _store_file(src:Path, pool, known:set, totals:Dict, limit:int)->List[str]:
+    """Chunk hashes of src; unseen chunks are compressed/written on the pool (at most `limit` in flight)."""
+    import hashlib
+    hashes: List[str]=[]; pending=[]
+    with open(src,"rb") as f:
+        while True:
+            buf=f.read(BACKUP_CHUNK)
+            if not buf: break
+            h=hashlib.sha256(buf).hexdigest(); hashes.append(h)
+            if h in known: continue
+            known.add(h); totals["new_bytes"]+=len(buf); pending.append(pool.submit(_write_chunk, h, buf))
+            if len(pending)>=limit: totals["stored_bytes"]+=pending.pop(0).result()
+    for fu in pending: totals["stored_bytes"]+=fu.result()
+    return hashes
+
+def make_incremental_backup(keep:Optional[int]=None)->Dict:
+    """New snapshot of config/, URL-Lists/ and archives/. Files whose size/mtime (and WAL) are
+    unchanged since the last snapshot are not read again; new chunks are compressed in parallel."""
+    import tempfile
+    from concurrent.futures import ThreadPoolExecutor
+    t0=time.time(); store=_store_dir(); (store/"snapshots").mkdir(parents=True, exist_ok=True)
+    snaps=list_snapshots(); prev={f["path"]:f for f in (snaps[-1]["files"] if snaps else [])}
+    known={p.name for p in (store/"chunks").glob("*/*") if not p.name.endswith(".tmp")}
+    sid=ts_for_filename(); n=1
+    while (store/"snapshots"/f"{sid}.json").exists(): n+=1; sid=f"{ts_for_filename()}-{n}"
+    totals={"file_count":0,"reused_files":0,"total_bytes":0,"new_bytes":0,"stored_bytes":0}; files=[]
+    workers=os.cpu_count() or 2
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="backup") as pool, \
+         tempfile.TemporaryDirectory(prefix="mgdl-bak-") as td:
+        for p in _backup_sources():
+            rel=p.relative_to(ROOT).as_posix(); sig=[file_sig(p), file_sig(p.with_name(p.name+"-wal"))] if _is_sqlite(p) else [file_sig(p)]
+            sig=json.loads(json.dumps(sig))  # tuples → lists, as read back from the manifest
+            old=prev.get(rel); totals["file_count"]+=1
+            if old and old.get("sig")==sig and all(_chunk_path(h).exists() for h in old["chunks"]):
+                files.append(old); totals["reused_files"]+=1; totals["total_bytes"]+=old["size"]; continue
+            src=p
+            if _is_sqlite(p):
+                snap=Path(td)/"db"; snap.unlink(missing_ok=True)
+                if sqlite_snapshot(p, snap): src=snap
+                else: print(c(f"  {rel}: not a readable SQLite database, copied as-is", YELLOW))
+            size=src.stat().st_size
+            files.append({"path":rel, "size":size, "sig":sig, "chunks":_store_file(src, pool, known, totals, workers*2)})
+            totals["total_bytes"]+=size
+    manifest={"id":sid, "created":now_ts(), "elapsed_sec":round(time.time()-t0,2), **totals, "files":files}
+    save_json(store/"snapshots"/f"{sid}.json", manifest)
+    keep=keep if keep is not None else int(load_app_settings().get("backup_keep", 10) or 0)
+    if keep>0: manifest["pruned"]=prune_snapshots(keep)
+    return manifest
+
+def prune_snapshots(keep:int)->int:
+    """Drop all but the newest `keep` snapshots, then delete chunks no snapshot references."""
+    store=_store_dir(); snaps=_snapshot_files(); drop=snaps[:-keep] if keep>0 else []
+    for p in drop: p.unlink()
+    used={h for snap in list_snapshots() for f in snap["files"] for h in f["chunks"]}
+    for p in (store/"chunks").glob("*/*"):
+        if p.name not in used:
+            try: p.unlink()
+            except OSError: pass
+    return len(drop)
+
+def restore_snapshot(sid:Optional[str]=None, target:Optional[Path]=None)->Tuple[Dict, Path]:
+    """Write a snapshot's files under `target` (default backups/restore-<id>; ROOT restores in place).
+    Chunks are verified against their hashes; each file is replaced atomically."""
+    import hashlib, zlib
+    snaps=list_snapshots()
+    snap=next((s for s in reversed(snaps) if sid in (None, "latest", s["id"])), None)
+    if not snap: raise FileNotFoundError(f"No snapshot {sid or ''}".strip())
+    target=target or DIR_BACKUPS/f"restore-{snap['id']}"
+    for f in snap["files"]:
+        dst=target/f["path"]; dst.parent.mkdir(parents=True, exist_ok=True); tmp=dst.with_name(dst.name+".restore.tmp")
+        with open(tmp,"wb") as out:
+            for h in f["chunks"]:
+                buf=zlib.decompress(_chunk_path(h).read_bytes())
+                if hashlib.sha256(buf).hexdigest()!=h: raise ValueError(f"Chunk {h} of {f['path']} is corrupt")
+                out.write(buf)
+        os.replace(tmp, dst)
+        if _is_sqlite(dst):  # a stale WAL from the replaced database must not be replayed over it
+            for ext in ("-wal","-shm"): dst.with_name(dst.name+ext).unlink(missing_ok=True)
+    return snap, target
+
+def print_backup_summary(m:Dict):
+    print(c(f"Snapshot {m['id']}:", GREEN), f"{m['file_count']} files ({human_bytes(m['total_bytes'])}), "
+          f"{m['reused_files']} unchanged, new data {human_bytes(m['new_bytes'])} → {human_bytes(m['stored_bytes'])} stored, "
+          f"{m['elapsed_sec']}s" + (f"; pruned {m['pruned']} old snapshots" if m.get("pruned") else ""))
+
+def backup_menu():
+    while True:
+        clear_screen(); banner("Backups", ROOT); snaps=list_snapshots()
+        print(f"Snapshots: {len(snaps)}" + (f" (latest {snaps[-1]['id']})" if snaps else "") + f" · keep {load_app_settings().get('backup_keep',10)}")
+        print(c("  1 – Incremental snapshot (config + URL-Lists + archives)", BLUE))
+        print(c("  2 – Full zip backup", BLUE))
+        print(c("  3 – List snapshots", BLUE))
+        print(c("  4 – Restore a snapshot", BLUE))
+        print(c("  0 – Back", BLUE))
+        ch=prompt("Choose: ").strip()
+        if ch=="1": print_backup_summary(make_incremental_backup())
+        elif ch=="2": print(c("Backup written:", GREEN), make_backup_zip())
+        elif ch=="3":
+            for s_ in snaps: print(f"- {s_['id']}: {s_['file_count']} files, {human_bytes(s_['total_bytes'])}, +{human_bytes(s_['stored_bytes'])} stored")
+            if not snaps: print("No snapshots yet.")
+        elif ch=="4":
+            if not snaps: print("No snapshots yet."); input("Enter to continue..."); continue
+            sid=input_default("Snapshot id", snaps[-1]["id"]).strip()
+            where=input_default("Restore into folder ('root' = overwrite current config/lists/archives)", str(DIR_BACKUPS/f"restore-{sid}")).strip()
+            if where.lower()=="root":
+                if prompt(c("Overwrite current files? Don't do this while a download is running. Type YES: ", YELLOW)).strip()!="YES": continue
+                target=ROOT
+            else: target=Path(where)
+            try: snap,target=restore_snapshot(sid, target); print(c(f"Restored {len(snap['files'])} files from {snap['id']} into", GREEN), target)
+            except Exception as e: print(c(f"Restore failed: {e}", RED))
+        elif ch=="0": return
+        else: continue
+        input("Enter to continue...")
+
+def settings_menu():
+    app = load_app_settings()
+    theme_order = ["default","bright","high_contrast","mono"]
+    while True:
+        clear_screen(); banner("Settings", ROOT)
+        print(c(f"  1 – Site settings (per-site delay, base sleep ± jitter, sleep mode, extra args)", BLUE))
+        print(c(f"  2 – Toggle menu colors (currently {'ON' if app.get('use_color', True) else 'OFF'})", BLUE))
+        print(c(f"  3 – Theme (current: {app.get('theme','default')})", BLUE))
+        print(c(f"  4 – Parallel sites for 'Download for ALL' (current: {app.get('max_parallel_sites',1)})", BLUE))
+        print(c(f"  5 – Execution mode: process per URL / resident worker per site (current: {app.get('execution_mode','process')})", BLUE))
+        bw=parse_rate(app.get("bandwidth_limit"))
+        print(c(f"  6 – Bandwidth / process budget (current: {human_bytes(bw)+'/s' if bw else 'unlimited'}, "
+                f"{app.get('max_concurrent_processes',0) or 'no'} process cap, {app.get('max_processes_per_host',0) or 'no'} per-host cap)", BLUE))
+        print(c("  0 – Back", BLUE))
+        ch = prompt("Choose: ").strip()
+        if ch == "1":
+            site_settings_menu()
+        elif ch == "2":
+            app["use_color"] = not app.get("use_color", True)
+            save_json(FILE_APP_SETTINGS, app)
+            global USE_COLOR; USE_COLOR = app["use_color"]
+            print(f"Colors are now {'ON' if USE_COLOR else 'OFF'}."); input("Enter to continue...")
+        elif ch == "3":
+            cur = app.get("theme","default")
+            idx = (theme_order.index(cur) + 1) % len(theme_order) if cur in theme_order else 0
+            new = theme_order[idx]
+            app["theme"] = new
+            save_json(FILE_APP_SETTINGS, app)
+            apply_theme(new)
+            print(f"Theme set to: {new}"); input("Enter to continue...")
+        elif ch == "4":
+            try: n = int(input_default("Sites to download in parallel (1 = one after another)", str(app.get("max_parallel_sites",1))))
+            except Exception: print(c("Invalid number.", RED)); input("Enter to continue..."); continue
+            app["max_parallel_sites"] = max(1, n)
+            save_json(FILE_APP_SETTINGS, app)
+            print(f"Parallel sites set to: {app['max_parallel_sites']}"); input("Enter to continue...")
+        elif ch == "5":
+            app["execution_mode"] = "worker" if app.get("execution_mode")=="process" else "process"
+            save_json(FILE_APP_SETTINGS, app)
+            print(f"Execution mode set to: {app['execution_mode']}"); input("Enter to continue...")
+        elif ch == "6":
+            bw = input_default("Total bandwidth for all downloads, bytes/s (e.g. 5M, 500k; 0 = unlimited)", str(app.get("bandwidth_limit",0) or 0)).strip()
+            if bw not in ("","0") and not parse_rate(bw): print(c("Invalid rate.", RED)); input("Enter to continue..."); continue
+            try:
+                procs = int(input_default("Max gallery-dl processes at once (0 = one per running site)", str(app.get("max_concurrent_processes",0))))
+                per_host = int(input_default("Max processes per host (0 = no limit)", str(app.get("max_processes_per_host",0))))
+            except Exception: print(c("Invalid number.", RED)); input("Enter to continue..."); continue
+            app["bandwidth_limit"] = bw if bw not in ("","0") else 0
+            app["max_concurrent_processes"] = max(0, procs); app["max_processes_per_host"] = max(0, per_host)
+            save_json(FILE_APP_SETTINGS, app)
+            print("Budget saved."); input("Enter to continue...")
+        elif ch == "0":
+            return
+
+# ----------------------------- MAIN ----------------------------------------
+def _post_run_dedup(app:Dict, stats:RunStats):
+    if app.get("dedup_after_run") and stats.new_files and not ABORT["stop"]:
+        print(); stats.dedup=dedup_downloads()
+
+def _post_run_archives(app:Dict, stats:RunStats):
+    if app.get("archive_maint_after_run", True) and stats.per_site and not ABORT["stop"]:
+        due=run_archive_maintenance(app, sites=sorted(stats.per_site), quiet=True)
+        for r in due: print(f"Archive maintenance {r['site']}: {r['status']} ({human_bytes(r['before'])} → {human_bytes(r['after'])}, {r['sec']}s)")
+
+def run_site(site:str, app:Dict, journal:Optional[RunJournal]=None, stats:Optional[RunStats]=None)->Tuple[RunStats, Path]:
+    stats=stats or RunStats(); journal=journal or RunJournal.create("site", site); reset_abort()
+    TELEMETRY.begin(site, app); journal.set_run_id(history_begin(site, stats, journal.log_path, journal.header.get("run_id")))
+    try: download_for_site(site, app, load_site_settings(), stats, journal=journal)
+    finally: TELEMETRY.end(stats)
+    _post_run_dedup(app, stats); _post_run_archives(app, stats)
+    log_path=write_run_log(stats, tag=site, path=journal.log_path); journal.finish(log_path, complete=not ABORT["stop"])
+    return stats, log_path
+
+def run_all(journal:Optional[RunJournal]=None, stats:Optional[RunStats]=None, jobs:Optional[int]=None)->Tuple[RunStats, Path]:
+    app=load_app_settings()
+    if jobs: app["max_parallel_sites"]=jobs  # this run only
+    clear_screen(); banner("Preflight checks", ROOT)
+    rep,bad_hosts,empty=preflight_report(app)
+    for name,status in rep:
+        good=status.startswith("OK"); mark=c("OK", GREEN) if good else c("!!", RED)
+        print(f"  {mark} {name}: {status}")
+    if empty: print(c("\nEmpty lists will be skipped: "+", ".join(empty), YELLOW))
+    if bad_hosts: print(c("URLs on these hosts will be skipped: "+", ".join(sorted(bad_hosts)), YELLOW))
+    stats=stats or RunStats(); journal=journal or RunJournal.create("all"); reset_abort()
+    TELEMETRY.begin("all", app); journal.set_run_id(history_begin("all", stats, journal.log_path, journal.header.get("run_id")))
+    try: download_all(app, stats, skip_sites=empty, skip_hosts=bad_hosts, journal=journal)
+    finally: TELEMETRY.end(stats)
+    _post_run_dedup(app, stats); _post_run_archives(app, stats)
+    log_path=write_run_log(stats, tag="all", path=journal.log_path); journal.finish(log_path, complete=not ABORT["stop"])
+    return stats, log_path
+
+def resume_interrupted(ask:bool=True)->Optional[RunStats]:
+    path=find_interrupted_journal()
+    if not path: print("No interrupted run to resume."); return None
+    journal,stats=RunJournal.load(path); h=journal.header
+    started=dt.datetime.fromtimestamp(stats.start).strftime("%Y-%m-%d %H:%M:%S")
+    print(f"Interrupted run: {h.get('tag')} started {started}; {stats.attempted} URLs already done (ok={stats.succeeded} fail={stats.failed}).")
+    ans=prompt("Resume it? [Y]es / [N]o / [D]iscard: ").strip().lower() if ask else "y"
+    if ans.startswith("d"): path.unlink(); history_close_orphans(); print("Discarded."); return None
+    if ans.startswith("n"): return None
+    journal.claim()
+    if h.get("mode")=="site":
+        if h.get("site") not in get_sites(): print(c(f"Site {h.get('site')} no longer exists.", RED)); return None
+        stats,log_path=run_site(h["site"], load_app_settings(), journal, stats)
+    else:
+        stats,log_path=run_all(journal, stats)
+    print(f"\nRESUMED RUN DONE. attempted={stats.attempted} ok={stats.succeeded} fail={stats.failed}")
+    print("Run log:", log_path)
+    return stats
+
+def main_menu():
+    ensure_dirs(); app=load_app_settings(); site_cfg=load_site_settings()
+    while True:
+        clear_screen(); banner(f"{APP_NAME} {APP_VERSION}", ROOT)
+        print(c("  1 – Download for one site (gallery-dl)", BLUE))
+        print(c("  2 – Download for ALL (with preflight checks)", BLUE))
+        print(c("  3 – Settings", BLUE))
+        print(c("  4 – Build links FROM URL-Lists (exact URLs)", BLUE))
+        print(c("  5 – Check/Install gallery-dl", BLUE))
+        print(c("  6 – Show recent run stats", BLUE))
+        print(c("  7 – Backup / restore (incremental snapshots or zip)", BLUE))
+        print(c("  8 – Resume interrupted run", BLUE))
+        print(c("  9 – Deduplicate Downloads (identical files → hardlinks)", BLUE))
+        print(c(" 10 – Download archives (size, maintenance, merge/split, export/import)", BLUE))
+        print(c(" 11 – Plan a run (estimated duration, what-if delays/parallelism)", BLUE))
+        print(c("  0 – Exit", BLUE))
+        ch=prompt("Choose: ").strip()
+        if ch=="1":
+            s = prompt_site_choice()
+            if not s: continue
+            stats,log_path=run_site(s, app); print("Run log:", log_path); input("Enter to continue...")
+        elif ch=="2":
+            stats,log_path=run_all()
+            print(f"\nALL DONE. attempted={stats.attempted} ok={stats.succeeded} fail={stats.failed}")
+            print("Run log:", log_path); input("Enter to continue...")
+        elif ch=="3":
+            settings_menu()
+        elif ch=="4":
+            build_links_from_lists(); input("Enter to continue...")
+        elif ch=="5":
+            check_install_gallery_dl()
+        elif ch=="6":
+            show_recent_runs()
+        elif ch=="7":
+            backup_menu()
+        elif ch=="8":
+            resume_interrupted(); input("Enter to continue...")
+        elif ch=="9":
+            mode=input_default("Mode: hardlink / reflink / report (change nothing)", app.get("dedup_mode","hardlink")).strip().lower()
+            if mode in ("hardlink","reflink","report"): dedup_downloads(mode)
+            else: print(c("Unknown mode.", RED))
+            input("Enter to continue...")
+        elif ch=="10":
+            archives_menu()
+        elif ch=="11":
+            plan_menu()
+        elif ch=="0":
+            break
+
+def prompt_site_choice()->Optional[str]:
+    sites=get_sites()
+    if not sites: print("No sites. Add *.txt files to URL-Lists/ first."); return None
+    section("Download for one site (with per-site breaks)")
+    cfg=load_site_settings()
+    for i,s in enumerate(sites,1):
+        d=cfg.get(s,{}).get("delay_between_urls_sec", DEFAULT_DELAY)
+        print(c(f"  {i} – {s} [break={d}s]", BLUE))
+    print(c("  0 – Back", BLUE))
+    try: ch=int(prompt("Choose: ").strip() or "0")
+    except Exception: return None
+    if ch==0 or ch>len(sites): return None
+    return sites[ch-1]
+
+# ----------------------------- CLI / DAEMON --------------------------------
+def _exit_code(stats:Optional[RunStats])->int:
+    """0 = all good, 1 = some URLs failed, 130 = interrupted."""
+    if ABORT["stop"]: return 130
+    return 1 if stats and stats.failed else 0
+
+def _next_scheduled(times:List[str], every_min:float, last_run:float, now:float)->Optional[float]:
+    cands=[]
+    for t in times:
+        try: hh,mm=(int(x) for x in t.split(":",1))
+        except Exception: print(c(f"Ignoring bad schedule time {t!r} (use HH:MM).", YELLOW)); continue
+        d=dt.datetime.fromtimestamp(now).replace(hour=hh, minute=mm, second=0, microsecond=0)
+        if d.timestamp()<=now: d+=dt.timedelta(days=1)
+        cands.append(d.timestamp())
+    if every_min and every_min>0: cands.append(max(now, last_run+every_min*60) if last_run else now)
+    return min(cands) if cands else None
+
+def daemon_loop(times:List[str], every_min:float, poll:float, jobs:Optional[int], watch:bool)->int:
+    """Stay resident: run ALL on the schedule, and run a single site when its URL list changes
+    (after it has been stable for one poll interval)."""
+    print(f"[{now_ts()}] {APP_NAME} daemon started (times={times or '-'}, every={every_min or '-'} min, watch={'on' if watch else 'off'}, poll={poll:g}s)")
+    seen={s: site_list_sig(s) for s in get_sites()}; changed: Dict[str,object]={}
+    last_run=0.0; next_run=_next_scheduled(times, every_min, last_run, time.time())
+    while not (ABORT["want"] or ABORT["stop"]):
+        now=time.time()
+        if next_run is not None and now>=next_run:
+            print(f"[{now_ts()}] Scheduled run: ALL")
+            stats,log_path=run_all(jobs=jobs); print(f"[{now_ts()}] ALL done: ok={stats.succeeded} fail={stats.failed} → {log_path}")
+            last_run=time.time(); next_run=_next_scheduled(times, every_min, last_run, last_run)
+            seen={s: site_list_sig(s) for s in get_sites()}; changed.clear()
+            continue
+        if watch:
+            for site in get_sites():
+                sig=site_list_sig(site)
+                if sig==seen.get(site): changed.pop(site, None); continue
+                if changed.get(site)!=sig: changed[site]=sig; continue   # still being edited?
+                print(f"[{now_ts()}] {site} URL list changed → running {site}")
+                stats,log_path=run_site(site, load_app_settings()); seen[site]=sig; changed.pop(site, None)
+                if ABORT["stop"]: break
+        if next_run: set_console_title(f"{APP_NAME} daemon · next ALL {dt.datetime.fromtimestamp(next_run):%Y-%m-%d %H:%M}")
+        sleep_interruptible(poll)
+    print(f"[{now_ts()}] Daemon stopped.")
+    return 0
+
+def cli_main(argv:List[str])->int:
+    import argparse
+    ap=argparse.ArgumentParser(prog="gallery_dl_manager.py",
+        description=f"{APP_NAME} {APP_VERSION} (headless). Run without arguments for the interactive menu.",
+        epilog="Exit codes: 0 ok, 1 some URLs failed / checks failed, 2 usage or setup error, 130 interrupted.")
+    ap.add_argument("--no-color", action="store_true", help="plain output (automatic when stdout is not a terminal)")
+    sub=ap.add_subparsers(dest="cmd", metavar="COMMAND", required=True)
+    r=sub.add_parser("run", help="download one or more sites, or all of them")
+    g=r.add_mutually_exclusive_group(required=True)
+    g.add_argument("--site", action="append", metavar="SITE", help="site name (URL-Lists/SITE.txt); repeatable")
+    g.add_argument("--all", action="store_true", help="all sites, with preflight checks")
+    r.add_argument("--jobs", type=int, metavar="N", help="sites in parallel for --all (default: max_parallel_sites)")
+    sub.add_parser("resume", help="resume the newest interrupted run")
+    sub.add_parser("preflight", help="check lists and DNS for every host")
+    dd=sub.add_parser("dedup", help="replace identical files in Downloads/ with hardlinks/reflinks")
+    dd.add_argument("--mode", choices=["hardlink","reflink","report"], help="default: dedup_mode (hardlink)")
+    dd.add_argument("--min-size", type=int, metavar="BYTES", help="ignore smaller files (default: dedup_min_size)")
+    sub.add_parser("links", help="sync Links/ .url shortcuts with URL-Lists (only changed ones are written)")
+    ar=sub.add_parser("archives", help="download archive report and maintenance (default: report)")
+    asub=ar.add_subparsers(dest="action", metavar="ACTION")
+    am=asub.add_parser("maintain", help="VACUUM/ANALYZE archives that are due (WAL on)")
+    am.add_argument("--site", action="append", metavar="SITE", help="only these sites; repeatable")
+    am.add_argument("--force", action="store_true", help="maintain now even if not due")
+    amg=asub.add_parser("merge", help="copy keys of SOURCE archives into --into (sites combined or renamed)")
+    amg.add_argument("source", nargs="+"); amg.add_argument("--into", required=True, metavar="SITE")
+    amg.add_argument("--retire", action="store_true", help="move the sources to archives/retired/ afterwards")
+    asp=asub.add_parser("split", help="move keys starting with --prefix from SOURCE into --into")
+    asp.add_argument("source"); asp.add_argument("--prefix", required=True); asp.add_argument("--into", required=True, metavar="SITE")
+    asp.add_argument("--keep", action="store_true", help="copy instead of move")
+    aex=asub.add_parser("export", help="write every key of a site's archive to FILE")
+    aex.add_argument("site"); aex.add_argument("file", type=Path)
+    aim=asub.add_parser("import", help="add keys from FILE (one per line) to a site's archive")
+    aim.add_argument("site"); aim.add_argument("file", type=Path)
+    pl=sub.add_parser("plan", help="estimate a run's duration and sleep share without downloading (what-if options)")
+    pl.add_argument("--site", action="append", metavar="SITE", help="only these sites; repeatable")
+    pl.add_argument("--jobs", type=int, metavar="N", help="what if N sites ran in parallel")
+    pl.add_argument("--delay", type=float, metavar="SEC", help="what if every site used this delay_between_urls_sec")
+    pl.add_argument("--base-sleep", type=float, metavar="SEC", help="what if every site used this base_sleep_sec")
+    pl.add_argument("--delay-scale", type=float, default=1.0, metavar="F", help="what if all delays/sleeps were scaled by F")
+    pl.add_argument("--json", action="store_true", help="print the plan as JSON")
+    b=sub.add_parser("backup", help="incremental snapshot of config, URL-Lists and archives (or --zip)")
+    b.add_argument("--zip", action="store_true", help="full zip backup instead")
+    b.add_argument("--list", action="store_true", help="list snapshots")
+    rs=sub.add_parser("restore", help="restore a snapshot (default: latest) into backups/restore-<id>")
+    rs.add_argument("snapshot", nargs="?", default="latest")
+    g2=rs.add_mutually_exclusive_group()
+    g2.add_argument("--into", type=Path, metavar="DIR", help="target folder")
+    g2.add_argument("--in-place", action="store_true", help="overwrite config/, URL-Lists/ and archives/")
+    st=sub.add_parser("stats", help="show recent run logs")
+    st.add_argument("--limit", type=int, default=10, help="recent runs to list")
+    st.add_argument("--days", type=float, default=7, help="trend window (default 7)")
+    st.add_argument("--site", help="only this site")
+    st.add_argument("--json", action="store_true", help="trend rows as JSON")
+    d=sub.add_parser("daemon", help="stay resident: scheduled ALL runs + run sites whose list changes")
+    d.add_argument("--at", action="append", metavar="HH:MM", help="daily run time for ALL; repeatable (default: daemon_times)")
+    d.add_argument("--every", type=float, metavar="MINUTES", help="run ALL every N minutes (default: daemon_every_minutes)")
+    d.add_argument("--poll", type=float, default=30, metavar="SEC", help="how often to check lists/schedule (default 30)")
+    d.add_argument("--jobs", type=int, metavar="N", help="sites in parallel for scheduled runs")
+    d.add_argument("--no-watch", action="store_true", help="don't react to URL-Lists changes")
+    args=ap.parse_args(argv)
+
+    HEADLESS["on"]=True; HEADLESS["no_color"]=args.no_color or not sys.stdout.isatty()
+    try: sys.stdout.reconfigure(line_buffering=True)  # timely logs under cron/systemd
+    except Exception: pass
+    if hasattr(signal, "SIGTERM"): signal.signal(signal.SIGTERM, _sigint_handler)
+    if args.cmd=="stats":
+        if args.json: print(json.dumps(history_stats(args.days, args.site), indent=2)); return 0
+        print_recent_runs(args.limit); print(); print_history_stats(args.days, args.site); return 0
+    ensure_dirs(); app=load_app_settings()
+    if args.cmd=="backup":
+        if args.zip: print("Backup written:", make_backup_zip())
+        elif args.list:
+            for s_ in list_snapshots(): print(f"{s_['id']}\t{s_['file_count']} files\t{s_['total_bytes']} bytes\t+{s_['stored_bytes']} stored")
+        else: print_backup_summary(make_incremental_backup())
+        return 0
+    if args.cmd=="restore":
+        try: snap,target=restore_snapshot(args.snapshot, ROOT if args.in_place else args.into)
+        except (FileNotFoundError, ValueError) as e: print(c(str(e), RED)); return 1
+        print(f"Restored {len(snap['files'])} files from {snap['id']} into {target}"); return 0
+    if args.cmd=="dedup":
+        r=dedup_downloads(args.mode, args.min_size); return 1 if r["failed"] else 0
+    if args.cmd=="links":
+        build_links_from_lists(); return 0
+    if args.cmd=="archives":
+        try:
+            if args.action=="maintain":
+                res=run_archive_maintenance(app, sites=args.site, force=args.force)
+                if not res: print("Nothing due.")
+                return 1 if any(r["status"] not in ("ok","busy") for r in res) else 0
+            if args.action=="merge":
+                for src,n in archive_merge(args.source, args.into, args.retire).items(): print(f"{src} -> {args.into}: {n} new keys")
+            elif args.action=="split":
+                print(f"{archive_split(args.source, args.into, args.prefix, args.keep)} keys {'copied' if args.keep else 'moved'} to {args.into}")
+            elif args.action=="export": print(f"{archive_export(args.site, args.file)} keys written to {args.file}")
+            elif args.action=="import": n,added=archive_import(args.site, args.file); print(f"{n} keys read, {added} new")
+            else: print_archive_report(archive_report())
+        except Exception as e:
+            print(c(str(e), RED)); return 1
+        return 0
+    if args.cmd=="plan":
+        plan=plan_run(args.site, args.jobs, args.delay, args.base_sleep, args.delay_scale)
+        what_if=args.jobs is not None or plan["what_if"]
+        base=plan_run(args.site) if what_if else None
+        if args.json: print(json.dumps({"plan":plan, "current":base} if base else plan, indent=2))
+        else: print_plan(plan, base)
+        return 0
+    if args.cmd=="preflight":
+        rep,bad_hosts,empty=preflight_report(app)
+        for name,status in rep: print(f"  {'OK' if status.startswith('OK') else '!!'} {name}: {status}")
+        return 1 if (bad_hosts or empty) else 0
+    if not find_gallery_dl(app)[0]:
+        print(c("gallery-dl not found. Set gallery_dl_path in config/app-settings.json or install it.", RED)); return 2
+    if args.cmd=="resume":
+        return _exit_code(resume_interrupted(ask=False))
+    if args.cmd=="run":
+        if args.all:
+            stats,log_path=run_all(jobs=args.jobs)
+            print(f"\nALL DONE. attempted={stats.attempted} ok={stats.succeeded} fail={stats.failed}\nRun log: {log_path}")
+            return _exit_code(stats)
+        unknown=[x for x in args.site if x not in get_sites()]
+        if unknown: print(c(f"Unknown site(s): {', '.join(unknown)}. Available: {', '.join(get_sites())}", RED)); return 2
+        code=0
+        for site in args.site:
+            stats,log_path=run_site(site, app); print("Run log:", log_path)
+            code=max(code, _exit_code(stats))
+            if ABORT["stop"]: break
+        return code
+    if args.cmd=="daemon":
+        times=args.at if args.at is not None else list(app.get("daemon_times") or [])
+        every=args.every if args.every is not None else float(app.get("daemon_every_minutes") or 0)
+        return daemon_loop(times, every, max(1.0, args.poll), args.jobs, not args.no_watch)
+    return 2
+
+def main(argv:Optional[List[str]]=None)->int:
+    """Entry point (see gallery_dl_manager.py): headless CLI with arguments, the menu without."""
+    argv=sys.argv[1:] if argv is None else argv
+    if argv: return cli_main(argv)
+    try:
+        set_console_title(f"{APP_NAME} {APP_VERSION}")
+        main_menu()
+    except KeyboardInterrupt:
+        print("\nBye!")
+    return 0
+
+if __name__=="__main__":
+    sys.exit(main())
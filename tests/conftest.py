@@ -0,0 +1,77 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+import gdlm_app  # noqa: E402
+
+
+@pytest.fixture
+def m(tmp_path, monkeypatch):
+    """gdlm_app with every folder/file under tmp_path and the module caches emptied."""
+    for k, v in gdlm_app.relocated_paths(tmp_path).items(): monkeypatch.setattr(gdlm_app, k, v)
+    monkeypatch.setattr(gdlm_app, "_URL_LISTS", {})
+    monkeypatch.setattr(gdlm_app, "_SITES_CACHE", {"sig": None, "sites": []})
+    monkeypatch.setattr(gdlm_app, "_HISTORY", {"conn": None, "run_id": None})
+    monkeypatch.setattr(gdlm_app, "_URL_STATE", {"conn": None})
+    monkeypatch.setattr(gdlm_app, "DEST_POOL", gdlm_app.DestPool())
+    monkeypatch.setitem(gdlm_app.HEADLESS, "on", True)
+    gdlm_app.reset_abort(); gdlm_app.ensure_dirs()
+    yield gdlm_app
+    for cache in (gdlm_app._HISTORY, gdlm_app._URL_STATE):
+        if cache["conn"] is not None: cache["conn"].close()
+
+
+def write_list(m, site, lines, name=None):
+    """URL-Lists/<site>.txt, or the shard URL-Lists/<site>/<name> when name is given."""
+    p = m.DIR_URL_LISTS / site / name if name else m.DIR_URL_LISTS / f"{site}.txt"
+    p.parent.mkdir(parents=True, exist_ok=True); p.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    return p
+
+
+FAKE_GDL = r'''
+import os, sys
+args = sys.argv[1:]; dest = args[args.index("--dest") + 1]
+urls = [a for a in args if a.startswith("http")]
+if "--input-file" in args:
+    with open(args[args.index("--input-file") + 1], encoding="utf-8") as f: urls = [ln.strip() for ln in f if ln.strip()]
+errf = args[args.index("--error-file") + 1] if "--error-file" in args else None
+rc = 0
+for u in urls:
+    if "crash" in u: sys.exit(1)  # gallery-dl itself gives up: no per-URL result
+    name = u.rsplit("/", 1)[-1]; flaky = os.path.join(os.path.dirname(os.path.abspath(__file__)), name + ".flaky")
+    if "fail" in u or ("flaky" in u and not os.path.exists(flaky)):
+        if "flaky" in u: open(flaky, "w").close()
+        print(f"[fake][error] HttpError: '404 Not Found' for '{u}'", file=sys.stderr); rc |= 4
+        if errf:
+            with open(errf, "a", encoding="utf-8") as f: f.write(u + "\n")
+        continue
+    p = os.path.join(dest, name + ".bin"); os.makedirs(dest, exist_ok=True)
+    if "nolist" in u:  # downloads, but prints nothing the Manager can parse
+        with open(p, "wb") as f: f.write(b"x" * 100)
+        print("\u2714 " + p)
+    elif os.path.exists(p): print("# " + p)
+    else:
+        with open(p, "wb") as f: f.write(b"x" * 100)
+        print(p)
+sys.exit(rc)
+'''
+
+
+@pytest.fixture
+def gdl(m, tmp_path):
+    """A fake gallery-dl (one 100-byte file per URL; URLs containing "fail" exit 4, "flaky" fail once,
+    "crash" end the whole call with rc 1, "nolist" print no parseable path; --input-file/--error-file
+    as in gallery-dl) and no pacing."""
+    script = tmp_path / "fake_gdl.py"; script.write_text(FAKE_GDL, encoding="utf-8")
+    app = m.load_app_settings()
+    app.update({"gallery_dl_path": f"{sys.executable} {script}", "dedup_after_run": False, "archive_maint_after_run": False})
+    m.save_json(m.FILE_APP_SETTINGS, app)
+
+    def add_site(site, urls, **cfg):
+        write_list(m, site, urls)
+        sites = m.load_site_settings()
+        sites[site].update({"delay_between_urls_sec": 0, "base_sleep_sec": 0, "jitter_sec": 0, **cfg})
+        m.save_json(m.FILE_SITE_SETTINGS, sites)
+    return add_site
@@ -0,0 +1,57 @@
+import pytest
+
+
+def _archive(m, site, keys):
+    conn = m._archive_open(m.archive_path(site))
+    m._insert_keys(conn, keys); conn.close()
+
+def _keys(m, site):
+    return sorted(m._archive_keys(m.archive_path(site)))
+
+def test_merge_counts_and_retires(m):
+    _archive(m, "a", ["x1", "x2", "shared"]); _archive(m, "b", ["y1"]); _archive(m, "t", ["shared"])
+    assert m.archive_merge(["a", "b", "missing"], "t", retire=True) == {"a": 2, "b": 1}
+    assert _keys(m, "t") == ["shared", "x1", "x2", "y1"]
+    assert not m.archive_path("a").exists() and not m.archive_path("b").exists()
+    retired = sorted(p.name.split("-")[0] for p in (m.DIR_ARCHIVES / "retired").glob("*.sqlite"))
+    assert retired == ["a", "b"]
+    snap = next((m.DIR_ARCHIVES / "retired").glob("a-*.sqlite"))
+    assert sorted(m._archive_keys(snap)) == ["shared", "x1", "x2"]
+
+def test_merge_keeps_sources_by_default(m):
+    _archive(m, "a", ["x1"])
+    assert m.archive_merge(["a"], "t") == {"a": 1}
+    assert _keys(m, "a") == ["x1"] and not (m.DIR_ARCHIVES / "retired").exists()
+
+@pytest.mark.parametrize("keep", [False, True])
+def test_split_moves_only_the_prefix(m, keep):
+    _archive(m, "s", ["kemono100", "kemono101", "kemonoparty1", "kemonp", "kemonn", "other5"])
+    assert m.archive_split("s", "t", "kemono", keep=keep) == 3
+    assert _keys(m, "t") == ["kemono100", "kemono101", "kemonoparty1"]
+    left = ["kemonn", "kemonp", "other5"]
+    assert _keys(m, "s") == sorted(left + (_keys(m, "t") if keep else []))
+
+def test_export_import_round_trip(m, tmp_path):
+    _archive(m, "s", ["k1", "k2", "k3"])
+    out = tmp_path / "keys.txt"
+    assert m.archive_export("s", out) == 3
+    _archive(m, "t", ["k2"])
+    assert m.archive_import("t", out) == (3, 2)
+    assert _keys(m, "t") == ["k1", "k2", "k3"]
+
+def test_busy_archives_are_refused(m):
+    _archive(m, "a", ["x1"]); _archive(m, "b", ["y1"])
+    run = m.archive_lock("b")  # a run in another Manager process holds the shared lock
+    try:
+        with pytest.raises(RuntimeError, match="b is downloading"): m.archive_merge(["a", "b"], "t", retire=True)
+        with pytest.raises(RuntimeError): m.archive_split("b", "t", "y")
+        with pytest.raises(RuntimeError): m.archive_import("b", m.DIR_ARCHIVES / "none.txt")
+    finally: m.archive_unlock(run)
+    assert _keys(m, "a") == ["x1"] and _keys(m, "b") == ["y1"]  # nothing merged, nothing retired
+    lock = m.archive_lock("a", exclusive=True)  # the refusal released what it had taken
+    assert lock; m.archive_unlock(lock)
+    m.site_active("a", True)
+    try:
+        with pytest.raises(RuntimeError, match="a is downloading"): m.archive_merge(["a"], "t")
+    finally: m.site_active("a", False)
+    assert m.archive_merge(["a", "b"], "t") == {"a": 1, "b": 1}
@@ -0,0 +1,77 @@
+import os
+import sqlite3
+import zlib
+
+import pytest
+
+from conftest import write_list
+
+
+@pytest.fixture
+def data(m):
+    """A settings file, a URL list, a live WAL archive and a file spanning several chunks."""
+    m.save_json(m.FILE_APP_SETTINGS, {"theme": "mono"})
+    write_list(m, "s", ["https://a.example/1"])
+    big = m.DIR_CONFIG / "big.bin"; big.write_bytes(os.urandom(m.BACKUP_CHUNK * 2 + 1234))
+    db = sqlite3.connect(str(m.DIR_ARCHIVES / "s.sqlite"))
+    db.execute("PRAGMA journal_mode=WAL"); db.execute("PRAGMA wal_autocheckpoint=0")
+    db.execute("CREATE TABLE archive(entry TEXT PRIMARY KEY)")
+    db.executemany("INSERT INTO archive VALUES(?)", [(f"site{i}",) for i in range(500)]); db.commit()
+    m.read_site_urls("s")  # writes config/url-cache/, which is not backed up
+    yield big, db
+    db.close()
+
+def _files(root):
+    return sorted(p.relative_to(root).as_posix() for p in root.rglob("*") if p.is_file())
+
+def test_round_trip(m, tmp_path, data):
+    big, db = data
+    snap = m.make_incremental_backup(keep=5)
+    assert snap["file_count"] == 4 and snap["reused_files"] == 0
+    _, target = m.restore_snapshot("latest", tmp_path / "restored")
+    assert _files(target) == ["URL-Lists/s.txt", "archives/s.sqlite", "config/app-settings.json", "config/big.bin"]
+    assert (target / "config/big.bin").read_bytes() == big.read_bytes()
+    assert (target / "URL-Lists/s.txt").read_text(encoding="utf-8") == "https://a.example/1\n"
+    restored = sqlite3.connect(str(target / "archives/s.sqlite"))  # WAL content is in the snapshot
+    assert restored.execute("SELECT COUNT(*) FROM archive").fetchone()[0] == 500
+    restored.close()
+
+def test_unchanged_files_and_chunks_are_reused(m, data):
+    big, db = data
+    m.make_incremental_backup(keep=5)
+    again = m.make_incremental_backup(keep=5)
+    assert again["reused_files"] == again["file_count"] and again["new_bytes"] == 0
+    with open(big, "r+b") as f: f.seek(m.BACKUP_CHUNK + 10); f.write(b"changed")  # one chunk differs
+    third = m.make_incremental_backup(keep=5)
+    assert third["new_bytes"] == m.BACKUP_CHUNK and third["reused_files"] == third["file_count"] - 1
+    assert len(m.list_snapshots()) == 3
+    _, target = m.restore_snapshot(third["id"], m.ROOT / "restore-check")
+    assert (target / "config/big.bin").read_bytes() == big.read_bytes()
+
+def test_prune_drops_unreferenced_chunks(m, data):
+    big, _ = data
+    first = m.make_incremental_backup(keep=0)
+    big.write_bytes(os.urandom(100))
+    m.make_incremental_backup(keep=0)
+    before = len(list((m._store_dir() / "chunks").glob("*/*")))
+    assert m.prune_snapshots(1) == 1
+    assert len(list((m._store_dir() / "chunks").glob("*/*"))) == before - 3  # the old big.bin's chunks
+    with pytest.raises(FileNotFoundError): m.restore_snapshot(first["id"])
+
+def test_corrupt_chunk_is_detected(m, tmp_path, data):
+    snap = m.make_incremental_backup(keep=5)
+    h = next(f for f in snap["files"] if f["path"] == "config/big.bin")["chunks"][0]
+    m._chunk_path(h).write_bytes(zlib.compress(b"not the original"))
+    with pytest.raises(ValueError): m.restore_snapshot("latest", tmp_path / "restored")
+
+def test_in_place_restore_drops_stale_wal(m, data):
+    _, db = data
+    m.make_incremental_backup(keep=5)
+    db.execute("DELETE FROM archive"); db.commit()  # the deletion lives in the -wal file
+    wal = m.DIR_ARCHIVES / "s.sqlite-wal"; stale = wal.read_bytes()
+    db.close(); wal.write_bytes(stale)  # as left behind by a crashed writer
+    m.restore_snapshot("latest", m.ROOT)
+    assert not wal.exists()
+    check = sqlite3.connect(str(m.DIR_ARCHIVES / "s.sqlite"))
+    assert check.execute("SELECT COUNT(*) FROM archive").fetchone()[0] == 500
+    check.close()
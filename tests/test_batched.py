@@ -0,0 +1,27 @@
+def _run(m, site):
+    stats = m.RunStats()
+    m.download_for_site(site, m.load_app_settings(), m.load_site_settings(), stats)
+    return stats
+
+def _rcs(m):
+    return [tuple(r) for r in m._history_db().execute("SELECT url, rc FROM url_runs ORDER BY ts, rowid")]
+
+def test_error_file_maps_failures_to_urls(m, gdl):
+    urls = ["https://a.example/1", "https://a.example/fail2", "https://a.example/flaky3",
+            "https://a.example/4", "https://a.example/5"]
+    gdl("s", urls, batch_size=3, retry_max_attempts=2, retry_backoff_sec=0)
+    stats = _run(m, "s")
+    assert (stats.attempted, stats.succeeded, stats.failed) == (5, 4, 1)
+    assert (stats.retried, stats.recovered) == (3, 1)  # fail2 twice, flaky3 once
+    assert sorted(p.name for p in m.DIR_DOWNLOADS.iterdir()) == ["1.bin", "4.bin", "5.bin", "flaky3.bin"]
+    rcs = _rcs(m)
+    assert rcs[:5] == [(u, 4 if u in urls[1:3] else 0) for u in urls]  # batch results, one row per URL
+    assert rcs[5:] == [(urls[1], 4), (urls[2], 0), (urls[1], 4)]  # retries run one URL per call
+    assert stats.per_site["s"]["fail"] == 1 and stats.new_files == 4
+
+def test_run_level_error_fails_the_whole_chunk(m, gdl):
+    urls = ["https://a.example/1", "https://a.example/crash2", "https://a.example/3", "https://a.example/4"]
+    gdl("s", urls, batch_size=2)
+    stats = _run(m, "s")
+    assert (stats.attempted, stats.succeeded, stats.failed) == (4, 2, 2)
+    assert _rcs(m) == [(urls[0], 1), (urls[1], 1), (urls[2], 0), (urls[3], 0)]  # nothing in chunk 1 is known to be done
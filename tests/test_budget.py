@@ -0,0 +1,65 @@
+import threading
+
+import pytest
+
+K, M = 1024, 1024 ** 2
+
+
+@pytest.fixture
+def active(m, monkeypatch):
+    """Mark sites as downloading, as run_site does."""
+    monkeypatch.setattr(m, "_ACTIVE_SITES", {})
+    return lambda *sites: [m.site_active(s, True) for s in sites]
+
+@pytest.mark.parametrize("v, rate", [
+    (2500000, 2500000), ("2.5M", int(2.5 * M)), ("500k", 500 * K), ("1G", 1024 ** 3), ("800 KiB/s", 800 * K),
+    ("1mb", M), (0, 0), ("", 0), (None, 0), ("fast", 0), ("5T", 0),
+])
+def test_parse_rate(m, v, rate):
+    assert m.parse_rate(v) == rate
+
+def _take(b, rate, *hosts):
+    b.running += 1; b.allocated += rate
+    for h in hosts: b.hosts[h] = b.hosts.get(h, 0) + 1
+
+def test_fair_share_per_site_or_slot(m, active):
+    active("a", "b", "c", "d"); b = m.Budget()
+    assert b._admit({"h1"}, 4 * M, 0, 0) == M  # one quarter per downloading site
+    assert b._admit({"h1"}, 4 * M, 2, 0) == 2 * M  # only two can be in flight
+    assert b._admit({"h1"}, 0, 0, 0) == 0  # no bandwidth limit
+
+def test_min_share_waits_for_bandwidth(m, active):
+    active("a", "b"); b = m.Budget()
+    _take(b, 3 * M + 512 * K, "h1")  # started alone, before b was downloading
+    assert b._admit({"h2"}, 4 * M, 0, 0) is None  # 512k left < half of the 2M fair share
+    b.allocated = 3 * M
+    assert b._admit({"h2"}, 4 * M, 0, 0) == M  # exactly half is enough
+    b.allocated = 2 * M
+    assert b._admit({"h2"}, 4 * M, 0, 0) == 2 * M
+    b.allocated = 3 * M + 512 * K; b.running = 0  # nothing runs: start with whatever is left
+    assert b._admit({"h2"}, 4 * M, 0, 0) == 512 * K
+
+def test_process_and_host_caps(m, active):
+    active("a", "b", "c"); b = m.Budget()
+    _take(b, 0, "h1")
+    assert b._admit({"h1"}, 0, 0, 1) is None and b._admit({"h2"}, 0, 0, 1) == 0
+    assert b._admit({"h2", "h1"}, 0, 0, 2) == 0
+    _take(b, 0, "h2")
+    assert b._admit({"h3"}, 0, 2, 0) is None and b._admit({"h3"}, 0, 3, 0) == 0
+
+def test_rates_rebalance_after_release(m, active, monkeypatch):
+    app = m.load_app_settings(); app.update({"bandwidth_limit": "4M", "max_concurrent_processes": 0, "max_processes_per_host": 0})
+    m.save_json(m.FILE_APP_SETTINGS, app)
+    active("a", "b"); b = m.Budget(); started, release, got = threading.Event(), threading.Event(), {}
+
+    def hold(args):
+        got["a"] = args; started.set(); release.wait(5); return 0
+    t = threading.Thread(target=b.run, args=({"site": "a"}, {"h1"}, hold)); t.start()
+    assert started.wait(5) and got["a"] == ["--limit-rate", str(2 * M)]
+    assert b.run({"site": "b"}, {"h2"}, lambda args: got.setdefault("b", args) and 0) == 0
+    assert got["b"] == ["--limit-rate", str(2 * M)]
+    release.set(); t.join(5); m.site_active("a", False)
+    assert (b.running, b.allocated, b.hosts) == (0, 0, {})
+    ctx = {"site": "b"}
+    b.run(ctx, {"h2"}, lambda args: got.update(b2=args) or 0)
+    assert got["b2"] == ["--limit-rate", str(4 * M)] and ctx["rate"] == 4 * M  # b alone gets it all
@@ -0,0 +1,71 @@
+import json
+
+import pytest
+
+from conftest import write_list
+
+
+@pytest.fixture
+def cli(m, monkeypatch, capsys):
+    """cli_main(argv) → (exit code, stdout); HEADLESS is restored afterwards."""
+    monkeypatch.setitem(m.HEADLESS, "no_color", False)
+
+    def run(*argv):
+        capsys.readouterr()
+        rc = m.cli_main(list(argv))
+        return rc, capsys.readouterr().out
+    return run
+
+def test_usage_errors_exit_2(m, cli):
+    for argv in ([], ["nosuch"], ["run"], ["run", "--site", "s", "--all"]):
+        with pytest.raises(SystemExit) as e: cli(*argv)
+        assert e.value.code == 2
+
+def test_run_sites(m, gdl, cli):
+    gdl("a", ["https://a.example/1", "https://a.example/2"]); gdl("b", ["https://b.example/fail1"])
+    rc, out = cli("run", "--site", "a")
+    assert rc == 0 and "Run log:" in out and (m.DIR_DOWNLOADS / "2.bin").exists()
+    assert cli("run", "--site", "a", "--site", "b")[0] == 1  # some URLs failed
+    rc, out = cli("run", "--site", "nosuch")
+    assert rc == 2 and "Unknown site(s): nosuch" in out
+
+def test_preflight(m, cli, monkeypatch):
+    monkeypatch.setattr(m, "resolve_hosts", lambda hosts, timeout, ttl: {h: "DNS FAIL" if "bad" in h else "OK" for h in hosts})
+    write_list(m, "a", ["https://a.example/1", "https://a.example/2"])
+    rc, out = cli("preflight")
+    assert rc == 0 and "OK a.example: OK (2 URLs in a)" in out
+    write_list(m, "b", ["https://bad.example/1"])
+    rc, out = cli("preflight")
+    assert rc == 1 and "!! bad.example: DNS FAIL (1 URLs in b)" in out
+
+def test_archives(m, cli, tmp_path):
+    conn = m._archive_open(m.archive_path("a")); m._insert_keys(conn, ["k1", "k2"]); conn.close()
+    rc, out = cli("archives")
+    assert rc == 0 and "total: 2 rows" in out
+    rc, out = cli("archives", "export", "a", str(tmp_path / "keys.txt"))
+    assert rc == 0 and "2 keys written" in out
+    rc, out = cli("archives", "merge", "a", "--into", "b")
+    assert rc == 0 and "a -> b: 2 new keys" in out
+    rc, out = cli("archives", "export", "nosuch", str(tmp_path / "x.txt"))
+    assert rc == 1 and "No archive for nosuch" in out
+    lock = m.archive_lock("a")  # a run in another process
+    try: assert cli("archives", "merge", "a", "--into", "b")[0] == 1
+    finally: m.archive_unlock(lock)
+
+def test_plan_json(m, cli):
+    write_list(m, "a", ["https://a.example/1", "https://a.example/2"]); write_list(m, "b", ["https://b.example/1"])
+    rc, out = cli("plan", "--json")
+    plan = json.loads(out)
+    assert rc == 0 and sorted(r["site"] for r in plan["sites"]) == ["a", "b"] and plan["what_if"] == {}
+    rc, out = cli("plan", "--json", "--site", "a", "--jobs", "2", "--delay", "0")
+    both = json.loads(out)
+    assert rc == 0 and both["plan"]["jobs"] == 2 and both["plan"]["what_if"] == {"delay": 0.0}
+    assert [r["site"] for r in both["current"]["sites"]] == ["a"]
+
+def test_stats_json(m, gdl, cli):
+    assert json.loads(cli("stats", "--json")[1]) == []
+    gdl("a", ["https://a.example/1", "https://a.example/fail2"])
+    cli("run", "--site", "a")
+    rc, out = cli("stats", "--json", "--site", "a")
+    rows = json.loads(out)
+    assert rc == 0 and [(r["site"], r["runs"], r["ok"], r["fail"]) for r in rows] == [("a", 1, 1, 1)]
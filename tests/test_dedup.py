@@ -0,0 +1,59 @@
+import os
+
+
+def _tree(m, **files):
+    """Downloads/<site>/<name> files; values are the contents."""
+    paths = {}
+    for key, data in files.items():
+        site, name = key.split("__")
+        p = m.DIR_DOWNLOADS / site / name; p.parent.mkdir(parents=True, exist_ok=True); p.write_bytes(data)
+        paths[key] = p
+    return paths
+
+def _snapshot(paths):
+    return {k: (p.stat().st_ino, p.read_bytes()) for k, p in paths.items()}
+
+def test_duplicates_share_one_inode(m):
+    same = os.urandom(4096)
+    f = _tree(m, a__1=same, b__1=same, b__2=os.urandom(4096))
+    res = m.dedup_downloads("hardlink", min_size=0, quiet=True)
+    assert (res["duplicates"], res["linked"], res["reclaimed_bytes"]) == (1, 1, 4096)
+    assert f["a__1"].stat().st_ino == f["b__1"].stat().st_ino and f["a__1"].stat().st_nlink == 2
+    assert f["b__2"].stat().st_nlink == 1 and f["b__1"].read_bytes() == same
+
+def test_report_changes_nothing(m):
+    same = os.urandom(4096)
+    f = _tree(m, a__1=same, b__1=same)
+    before = _snapshot(f)
+    res = m.dedup_downloads("report", min_size=0, quiet=True)
+    assert (res["duplicates"], res["linked"], res["reclaimed_bytes"]) == (1, 0, 4096)
+    assert _snapshot(f) == before
+
+def test_second_run_reuses_the_index(m):
+    same = os.urandom(4096)
+    _tree(m, a__1=same, b__1=same, c__1=same)
+    assert m.dedup_downloads("hardlink", min_size=0, quiet=True)["hashed"] == 3
+    again = m.dedup_downloads("hardlink", min_size=0, quiet=True)
+    assert (again["files"], again["hashed"], again["duplicates"]) == (3, 0, 0)
+
+def test_file_changed_after_hashing_is_not_linked(m, monkeypatch):
+    same = os.urandom(4096)
+    f = _tree(m, a__1=same, b__1=same)
+    real = m._hash_file
+
+    def hash_then_change(path, size):
+        h = real(path, size)
+        if path == str(f["b__1"]): f["b__1"].write_bytes(os.urandom(size))  # gallery-dl rewrote it meanwhile
+        return h
+    monkeypatch.setattr(m, "_hash_file", hash_then_change)
+    res = m.dedup_downloads("hardlink", min_size=0, quiet=True)
+    assert (res["duplicates"], res["linked"], res["failed"]) == (1, 0, 0)
+    assert f["a__1"].stat().st_ino != f["b__1"].stat().st_ino and f["a__1"].read_bytes() == same
+
+def test_small_files_are_ignored(m):
+    f = _tree(m, a__1=b"x" * 100, b__1=b"x" * 100, a__2=b"y" * 2048, b__2=b"y" * 2048)
+    app = m.load_app_settings(); app["dedup_min_size"] = 1024; m.save_json(m.FILE_APP_SETTINGS, app)
+    res = m.dedup_downloads("hardlink", quiet=True)
+    assert (res["files"], res["linked"]) == (2, 1)
+    assert f["a__1"].stat().st_nlink == 1 and f["b__1"].stat().st_nlink == 1
+    assert f["a__2"].stat().st_ino == f["b__2"].stat().st_ino
@@ -0,0 +1,59 @@
+import shutil
+import time
+from collections import namedtuple
+
+import pytest
+
+GB = 1024 ** 3
+Usage = namedtuple("Usage", "total used free")
+
+
+@pytest.fixture
+def disks(monkeypatch):
+    """Free bytes per root path, editable by the test; unknown paths have plenty."""
+    free = {}
+    monkeypatch.setattr(shutil, "disk_usage", lambda p: Usage(0, 0, free.get(str(p), 100 * GB)))
+    return free
+
+def _ctx(m, tmp_path, *roots, **cfg):
+    pool = m.dest_entries({"dest_pool": [{"path": str(tmp_path / r), **cfg.get(r, {})} for r in roots], "min_free_gb": 1})
+    return {"site": "s", "dest_pool": pool, "journal": None, "retry_max": 2}
+
+def test_picks_root_with_room(m, tmp_path, disks):
+    ctx = _ctx(m, tmp_path, "a", "b", a={"weight": 3})
+    stats = m.RunStats(); ss = stats.per_site.setdefault("s", {})
+    assert m._pick_dest(ctx, stats, ss, 5) and ctx["dest"] == tmp_path / "a"  # heavier weight
+    m._release_dest(ctx, m.GdlOutput(echo=False), 1.0)
+    disks[str(tmp_path / "a")] = GB // 2  # below a's min_free_gb
+    assert m._pick_dest(ctx, stats, ss, 5) and ctx["dest"] == tmp_path / "b"
+    assert stats.skipped == 0
+
+def test_waits_for_space_and_recovers(m, tmp_path, disks, monkeypatch):
+    monkeypatch.setattr(m, "DEST_RECHECK_SEC", 0.1); monkeypatch.setattr(m, "DEST_WAIT_SEC", 5)
+    ctx = _ctx(m, tmp_path, "a"); disks[str(tmp_path / "a")] = 0
+    m.threading.Timer(0.3, lambda: disks.update({str(tmp_path / "a"): 10 * GB})).start()
+    stats = m.RunStats(); ss = stats.per_site.setdefault("s", {}); t0 = time.time()
+    assert m._pick_dest(ctx, stats, ss, 5)
+    assert 0.25 <= time.time() - t0 < 3 and "dest_wait_until" not in ctx and stats.skipped == 0
+    assert ctx["sleep_sec"] > 0  # counted as pacing, not download time
+
+def test_gives_up_once_per_run(m, tmp_path, disks, monkeypatch):
+    monkeypatch.setattr(m, "DEST_RECHECK_SEC", 0.05); monkeypatch.setattr(m, "DEST_WAIT_SEC", 0.2)
+    ctx = _ctx(m, tmp_path, "a"); disks[str(tmp_path / "a")] = 0
+    stats = m.RunStats(); ss = stats.per_site.setdefault("s", {})
+    assert not m._pick_dest(ctx, stats, ss, 7) and stats.skipped == 7
+    t0 = time.time()
+    assert not m._pick_dest(ctx, stats, ss, 0) and time.time() - t0 < 0.15  # the wait is not repeated
+    assert stats.skipped == 7
+
+def test_wait_ends_with_time_budget(m, tmp_path, disks, monkeypatch):
+    monkeypatch.setattr(m, "DEST_RECHECK_SEC", 0.05)
+    ctx = _ctx(m, tmp_path, "a"); ctx["deadline"] = time.time() + 0.2; disks[str(tmp_path / "a")] = 0
+    stats = m.RunStats(); ss = stats.per_site.setdefault("s", {}); t0 = time.time()
+    assert not m._pick_dest(ctx, stats, ss, 3) and time.time() - t0 < 1 and stats.skipped == 3
+
+def test_dropped_retries_count_as_failed_once(m, tmp_path):
+    ctx = _ctx(m, tmp_path, "a"); stats = m.RunStats(); ss = stats.per_site.setdefault("s", {})
+    queue = [(0.0, "https://a.example/1", 2, 4), (0.0, "https://a.example/2", 1, 1)]
+    m._drop_retries(ctx, queue, stats, ss, "no destination with room")
+    assert queue == [] and (stats.failed, stats.skipped) == (2, 0)
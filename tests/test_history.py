@@ -0,0 +1,65 @@
+import os
+import sqlite3
+import time
+import zipfile
+
+
+def _age(p, days):
+    t = time.time() - days * 86400; os.utime(p, (t, t))
+
+def _settings(m, **kw):
+    app = m.load_app_settings(); app.update(kw); m.save_json(m.FILE_APP_SETTINGS, app)
+
+def test_rotate_archives_old_logs_and_prunes(m):
+    _settings(m, log_keep_days=30, history_keep_days=90)
+    old, new = m.DIR_LOGS / "run-s-20200101-000000.json", m.DIR_LOGS / "run-s-20990101-000000.json"
+    for p in (old, new): m.save_json(p, {"attempted": 1})
+    _age(old, 40)
+    m.history_begin("s", m.RunStats())
+    m.history_url("s", "https://a.example/new", 0, 1.0)
+    m.history_url("s", "https://a.example/old", 0, 1.0)
+    m._history_db().execute("UPDATE url_runs SET ts=? WHERE url LIKE '%old'", (time.time() - 100 * 86400,)); m._history_db().commit()
+    m.history_rotate(force=True)
+    assert not old.exists() and new.exists()
+    month = time.strftime("%Y-%m", time.localtime(time.time() - 40 * 86400))
+    with zipfile.ZipFile(m.DIR_LOGS / "archive" / f"run-logs-{month}.zip") as z: assert z.namelist() == [old.name]
+    assert [r[0] for r in m._history_db().execute("SELECT url FROM url_runs")] == ["https://a.example/new"]
+
+def test_rotate_at_most_daily(m):
+    m.history_rotate()
+    p = m.DIR_LOGS / "run-s-20200101-000000.json"; m.save_json(p, {}); _age(p, 400)
+    m.history_rotate()
+    assert p.exists()
+    m.history_rotate(force=True)
+    assert not p.exists()
+
+def test_url_rows_are_written_through(m):
+    m.history_begin("s", m.RunStats()); m.history_url("s", "https://a.example/1", 0, 2.0)
+    other = sqlite3.connect(str(m.FILE_HISTORY))  # e.g. `stats` in another process, or after a crash
+    assert other.execute("SELECT url, duration FROM url_runs").fetchall() == [("https://a.example/1", 2.0)]
+    other.close()
+
+def _open_run(m, started_ago, urls):
+    rid = m.history_begin("s", m.RunStats())
+    for url, rc in urls: m.history_url("s", url, rc, 1.0)
+    conn = m._history_db(); conn.execute("UPDATE runs SET start=? WHERE id=?", (time.time() - started_ago, rid)); conn.commit()
+    m._HISTORY["run_id"] = None  # the process that owned it is gone
+    return rid
+
+def test_orphan_rows_are_closed_from_url_runs(m):
+    rid = _open_run(m, 3600, [("https://a.example/1", 0), ("https://a.example/2", 4)])
+    assert m.history_stats(days=1) == []  # open rows are not counted
+    assert m.history_close_orphans() == 1
+    row = m._history_db().execute("SELECT end, attempted, succeeded, failed FROM runs WHERE id=?", (rid,)).fetchone()
+    assert row[0] is not None and row[1:] == (2, 1, 1)
+    stats = m.history_stats(days=1)
+    assert [(r["site"], r["runs"], r["ok"], r["fail"]) for r in stats] == [("s", 1, 1, 1)]
+
+def test_resumable_and_recent_rows_stay_open(m):
+    resumable = _open_run(m, 3600, [("https://a.example/1", 0)])
+    j = m.RunJournal.create("site", "s"); j.set_run_id(resumable)
+    j.finish(m.DIR_LOGS / "run.json", complete=False)
+    recent = _open_run(m, 5, [])
+    assert m.history_close_orphans() == 0
+    ends = dict(m._history_db().execute("SELECT id, end FROM runs").fetchall())
+    assert ends == {resumable: None, recent: None}
@@ -0,0 +1,70 @@
+import json
+import os
+import subprocess
+import sys
+
+
+def _aborted_journal(m, site="s", done=()):
+    """A journal as left by a run that was aborted after finishing `done` (url, ok) pairs."""
+    j = m.RunJournal.create("site", site); j.set_run_id(m.history_begin(site, m.RunStats()))
+    for url, ok in done:
+        out = m.GdlOutput(echo=False); out.new_files = 2 if ok else 0; out.bytes = 200 if ok else 0; out.errors = 0 if ok else 1
+        j.add_output(site, out, 1.5); j.record(site, url, 0 if ok else 4, ok, 1.5)
+    j.finish(m.DIR_LOGS / "run-s-x.json", complete=False)
+    return j
+
+def test_load_restores_progress(m):
+    j = _aborted_journal(m, done=[("https://a.example/1", True), ("https://a.example/2", False)])
+    with open(j.path, "a", encoding="utf-8") as f: f.write('{"type": "url", "site": "s", "ur')  # torn line from a crash
+    loaded, stats = m.RunJournal.load(j.path)
+    assert loaded.is_done("s", "https://a.example/1") and loaded.is_done("s", "https://a.example/2")
+    assert not loaded.is_done("s", "https://a.example/3")
+    assert (stats.attempted, stats.succeeded, stats.failed, stats.new_files, stats.bytes, stats.errors) == (2, 1, 1, 2, 200, 1)
+    assert stats.per_site["s"]["download_sec"] == 3.0 and stats.resumed == 1
+    assert loaded.header["run_id"] == j.header["run_id"] and loaded.log_path == m.DIR_LOGS / "run-s-x.json"
+
+def test_unrecorded_output_is_kept_on_abort(m):
+    j = m.RunJournal.create("site", "s")
+    out = m.GdlOutput(echo=False); out.new_files = 3
+    j.add_output("s", out, 2.0)  # Ctrl+C → Abort: the URL itself is not recorded
+    j.finish(m.DIR_LOGS / "run-s-x.json", complete=False)
+    _, stats = m.RunJournal.load(j.path)
+    assert stats.new_files == 3 and stats.attempted == 0 and stats.per_site["s"]["download_sec"] == 2.0
+
+def test_complete_run_drops_journal(m):
+    j = m.RunJournal.create("site", "s"); j.finish(m.DIR_LOGS / "run.json", complete=True)
+    assert not j.path.exists() and m.find_interrupted_journal() is None
+
+def test_live_journals_are_not_offered(m):
+    live = m.RunJournal.create("site", "s")  # this process, no end record
+    assert m.RunJournal.is_live(live.path) and m.find_interrupted_journal() is None
+    live.finish(m.DIR_LOGS / "run.json", complete=False)
+    assert not m.RunJournal.is_live(live.path) and m.find_interrupted_journal() == live.path
+
+def test_dead_owner_is_not_live(m):
+    p = subprocess.Popen([sys.executable, "-c", "pass"]); p.wait()
+    j = m.RunJournal.create("site", "s")
+    j._append({"type": "owner", "pid": p.pid, "host": m._host_name(), "ts": 0})  # crashed resume
+    assert not m.RunJournal.is_live(j.path) and m.find_interrupted_journal() == j.path
+    j.claim()
+    assert m.RunJournal.is_live(j.path)
+
+def test_other_host_is_live_while_recent(m):
+    j = m.RunJournal.create("site", "s")
+    j._append({"type": "owner", "pid": 1, "host": "elsewhere", "ts": 0})
+    assert m.RunJournal.is_live(j.path)
+    old = j.path.stat().st_mtime - m.JOURNAL_STALE_SEC - 60; os.utime(j.path, (old, old))
+    assert not m.RunJournal.is_live(j.path)
+
+def test_resume_runs_only_unfinished_urls(m, gdl):
+    urls = [f"https://a.example/{i}" for i in range(1, 5)]
+    gdl("s", urls)
+    j = _aborted_journal(m, done=[(urls[0], True), (urls[1], True)])
+    stats = m.resume_interrupted(ask=False)
+    assert sorted(p.name for p in m.DIR_DOWNLOADS.iterdir()) == ["3.bin", "4.bin"]
+    assert (stats.attempted, stats.succeeded, stats.new_files) == (4, 4, 6)
+    assert not j.path.exists() and m.find_interrupted_journal() is None
+    log = json.loads(next(m.DIR_LOGS.glob("run-*.json")).read_text(encoding="utf-8"))
+    assert log["resumed"] == 1 and log["succeeded"] == 4
+    runs = m._history_db().execute("SELECT id, succeeded FROM runs").fetchall()
+    assert runs == [(j.header["run_id"], 4)]  # the crashed run's row is reused, not duplicated
@@ -0,0 +1,46 @@
+def test_counts_new_and_skipped_files(m, tmp_path):
+    f = tmp_path / "a.jpg"; f.write_bytes(b"x" * 1500)
+    out = m.GdlOutput(echo=False)
+    out.feed(f"{f}\n"); out.feed(f"# {tmp_path / 'old.jpg'}\n"); out.feed("\n")
+    out.feed("https://example.com/not-a-file\n")  # -g / -j style output
+    assert (out.new_files, out.skipped_files, out.bytes, out.errors) == (1, 1, 1500, 0)
+    assert out.summary() == "1 new, 1 skipped, 1.5 KB"
+
+def test_stderr_errors_and_warnings(m):
+    out = m.GdlOutput(echo=False)
+    out.feed("\x1b[1;31m[twitter][error] HttpError: '429 Too Many Requests' for 'https://x'\x1b[0m", err=True)
+    out.feed("Traceback (most recent call last):", err=True)
+    out.feed("[downloader.http][warning] '403 Forbidden' for 'https://x/a.jpg' (1/5)", err=True)
+    out.feed("[twitter][info] No results", err=True)
+    assert out.errors == 2
+    assert out.error_lines[0] == "[twitter][error] HttpError: '429 Too Many Requests' for 'https://x'"
+    assert out.warn_lines == ["[downloader.http][warning] '403 Forbidden' for 'https://x/a.jpg' (1/5)"]
+    assert out.summary().endswith(", 2 errors")
+
+def test_error_lines_are_capped(m):
+    out = m.GdlOutput(echo=False)
+    for i in range(80): out.feed(f"[x][error] failure {i}", err=True)
+    assert out.errors == 80 and len(out.error_lines) == 50
+
+def test_echo(m, capsys):
+    out = m.GdlOutput(echo=True)
+    out.feed("# /tmp/seen.jpg"); out.feed("[x][error] boom", err=True)
+    cap = capsys.readouterr()
+    assert cap.out == "# /tmp/seen.jpg\n" and cap.err == "[x][error] boom\n"
+
+def test_unparsed_output_means_unknown_counts(m, tmp_path):
+    out = m.GdlOutput(echo=False)
+    out.feed("\r✔ /somewhere/moved.jpg")  # terminal-mode line or a file a post-processor moved
+    assert not out.known and out.new_files_known() is None and out.summary() == "file counts unknown"
+    f = tmp_path / "a.jpg"; f.write_bytes(b"x")
+    out.feed(str(f))
+    assert out.known and out.new_files_known() == 1
+    assert m.GdlOutput(echo=False).new_files_known() == 0  # no output at all: nothing new
+
+def test_args_force_pipe_output_and_drop_quiet(m, tmp_path, capsys, monkeypatch):
+    monkeypatch.setitem(m._ARGS_WARNED, "quiet", False)
+    args = m.gallery_dl_args("https://a.example/1", tmp_path, tmp_path / "s.sqlite", "-q --retries 3",
+                             "-o output.mode=terminal -w", ["--range", "1-5"])
+    assert args[-3:] == ["-o", "output.mode=pipe", "https://a.example/1"]  # after every user -o
+    assert not set(args) & {"-q", "--quiet", "-w", "--warning"} and "--retries" in args and "--range" in args
+    assert "Ignoring -q" in capsys.readouterr().out
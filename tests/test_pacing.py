@@ -0,0 +1,49 @@
+import os
+import signal
+import sys
+import threading
+import time
+
+import pytest
+
+
+@pytest.mark.parametrize("rc,lines,want", [
+    (4, ["[twitter][error] HttpError: '429 Too Many Requests' for 'https://x'"], True),
+    (4, ["[downloader.http][warning] '403 Forbidden' for 'https://x/a.jpg' (1/5)",
+         "[download][error] Failed to download a.jpg"], True),
+    (4, ["[x][error] ChallengeError: Cloudflare challenge (403 Forbidden) for 'https://x'"], True),
+    (4, ["[x][error] API rate limit exceeded"], True),
+    (4, ["[x][error] HttpError: '500 Internal Server Error' for 'https://x/429/403'"], False),
+    (4, ["[x][error] post 4291 is 403 KB"], False),   # numbers outside an HTTP status context
+    (1, ["[x][error] HttpError: '429 Too Many Requests'"], False),  # no HttpError bit
+    (4, [], True), (4, None, True),                   # nothing captured: the exit bit decides
+    (0, ["429 Too Many Requests"], False), (130, None, False),
+])
+def test_is_throttled(m, rc, lines, want):
+    assert m.is_throttled(rc, lines) is want
+
+def test_aimd_feedback(m):
+    p = m.HostPacer(); start, lo, hi = 10.0, 5.0, 60.0
+    assert p.feedback("h", True, False, start, lo, hi) == 20.0
+    assert p.feedback("h", True, False, start, lo, hi) == 40.0
+    assert p.feedback("h", True, False, start, lo, hi) == 60.0   # capped at max_delay
+    d = p.feedback("h", False, True, start, lo, hi)
+    assert d == pytest.approx(30.0)                               # 1/d grows by 1/max_delay
+    assert p.feedback("h", False, False, start, lo, hi) == d      # failed but not throttled: unchanged
+    for _ in range(50): d = p.feedback("h", False, True, start, lo, hi)
+    assert d == lo
+
+def test_pacing_persists(m):
+    p = m.HostPacer(); p.feedback("h", True, False, 10.0, 5.0, 60.0); p.save()
+    assert m.HostPacer()._state("h", 10.0, 5.0, 60.0)["delay"] == 20.0
+
+def test_ctrl_c_wakes_sleeps_and_children(m, tmp_path):
+    threading.Timer(0.2, lambda: os.kill(os.getpid(), signal.SIGINT)).start()
+    t0 = time.time(); m.sleep_interruptible(10)
+    assert time.time() - t0 < 2
+    m.reset_abort()
+    script = tmp_path / "slow.py"; script.write_text("import time; time.sleep(30)\n", encoding="utf-8")
+    threading.Timer(0.2, lambda: os.kill(os.getpid(), signal.SIGINT)).start()
+    t0 = time.time()
+    assert m.run_gallery_dl(f"{sys.executable} {script}", "https://a.example/1", tmp_path, tmp_path / "a.sqlite", "", "") == 130
+    assert time.time() - t0 < 2
@@ -0,0 +1,38 @@
+import pytest
+
+from conftest import write_list
+
+A = [f"https://a.example/{i}" for i in range(1, 5)]
+
+
+@pytest.fixture
+def history(m):
+    """Site a: 4 URLs, two with a recorded duration (10s, 20s); a's runs average 11s. Site b: 1 new URL."""
+    write_list(m, "a", A); write_list(m, "b", ["https://b.example/1"])
+    sites = m.load_site_settings()
+    for s in ("a", "b"): sites[s].update({"delay_between_urls_sec": 30, "base_sleep_sec": 2, "jitter_sec": 0})
+    m.save_json(m.FILE_SITE_SETTINGS, sites)
+    for url, sec in ((A[0], 10), (A[1], 20)): m.url_state_record("a", url, 0, sec, 1)
+    for url, sec in ((A[0], 10), (A[1], 20), ("https://a.example/gone", 3)): m.history_url("a", url, 0, sec)
+
+def test_site_estimate(m, history):
+    p = m.plan_site("a", m.load_site_settings()["a"], 15.0)
+    assert (p["urls"], p["due"], p["known"], p["per_url_sec"]) == (4, 4, 2, 11.0)
+    assert p["work_sec"] == 10 + 20 + 2 * 11  # unknown URLs take the site's mean
+    assert p["sleep_sec"] == 4 * 2 + 3 * 30  # base sleep per URL, delay between URLs
+    assert p["total_sec"] == 150 and p["held_back"] == 0
+
+def test_run_estimate_and_sleep_share(m, history):
+    plan = m.plan_run()
+    b = next(r for r in plan["sites"] if r["site"] == "b")
+    assert (b["work_sec"], b["sleep_sec"]) == (11, 2)  # no history of its own: the mean over all sites
+    assert (plan["sequential_sec"], plan["sleep_sec"], plan["work_sec"], plan["wall_sec"]) == (163, 100, 63, 163)
+    assert m.plan_run(jobs=2)["wall_sec"] == 150  # b runs alongside a
+    half = m.plan_run(["a"], delay_scale=0.5)
+    assert half["sleep_sec"] == 4 * 1 + 3 * 15 and half["work_sec"] == 52 and half["what_if"] == {"delay_scale": 0.5}
+
+def test_time_budget_holds_urls_back(m, history):
+    cfg = {**m.load_site_settings()["a"], "max_run_minutes": 1}
+    p = m.plan_site("a", cfg, 15.0)
+    assert p["total_sec"] == 60 and p["held_back"] == 3
+    assert p["sleep_sec"] == round(98 * 60 / 150, 1)  # the share of sleeping is kept
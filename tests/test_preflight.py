@@ -0,0 +1,38 @@
+import pytest
+
+
+@pytest.fixture
+def lookups(m, monkeypatch):
+    """dns_ok() without the network: hosts containing "bad" fail; every call is recorded."""
+    seen = []
+    monkeypatch.setattr(m, "dns_ok", lambda h: seen.append(h) or "bad" not in h)
+    return seen
+
+def _age(m, host, sec):
+    cache = m.load_json(m.FILE_DNS_CACHE, {}); cache[host]["ts"] -= sec; m.save_json(m.FILE_DNS_CACHE, cache)
+
+def test_answers_are_cached_until_the_ttl(m, lookups):
+    assert m.resolve_hosts(["a.example"], 5, 3600) == {"a.example": "OK"} and lookups == ["a.example"]
+    assert m.resolve_hosts(["a.example"], 5, 3600) == {"a.example": "OK"} and lookups == ["a.example"]
+    _age(m, "a.example", 3500)
+    m.resolve_hosts(["a.example"], 5, 3600)
+    assert lookups == ["a.example"]
+    _age(m, "a.example", 200)  # 3700s old
+    m.resolve_hosts(["a.example"], 5, 3600)
+    assert lookups == ["a.example", "a.example"]
+    assert m.resolve_hosts(["a.example"], 5, 0) == {"a.example": "OK"} and len(lookups) == 3  # ttl 0: no cache
+
+def test_failures_expire_sooner(m, lookups):
+    assert m.resolve_hosts(["bad.example"], 5, 3600) == {"bad.example": "DNS FAIL"}
+    _age(m, "bad.example", m.DNS_FAIL_TTL_SEC - 10)
+    m.resolve_hosts(["bad.example"], 5, 3600)
+    assert lookups == ["bad.example"]
+    _age(m, "bad.example", 20)
+    m.resolve_hosts(["bad.example"], 5, 3600)
+    assert lookups == ["bad.example", "bad.example"]
+
+def test_expired_entries_are_dropped(m, lookups):
+    m.resolve_hosts(["a.example", "b.example"], 5, 3600)
+    _age(m, "b.example", 7200)
+    m.resolve_hosts(["a.example", "c.example"], 5, 3600)
+    assert sorted(m.load_json(m.FILE_DNS_CACHE, {})) == ["a.example", "c.example"]
@@ -0,0 +1,41 @@
+import os
+import sys
+
+import pytest
+
+
+@pytest.fixture
+def tool(m, tmp_path, monkeypatch):
+    """A fake gallery-dl executable that counts how often it is spawned; the tool cache starts empty."""
+    monkeypatch.setattr(m, "_TOOLS", {"find": None, "disk": None, "refreshing": False})
+    exe = tmp_path / "gallery-dl"; calls = tmp_path / "calls"
+    exe.write_text(f"#!{sys.executable}\nopen({str(calls)!r}, 'a').write('x')\nprint('1.2.3')\n", encoding="utf-8")
+    exe.chmod(0o755)
+    return exe, lambda: len(calls.read_text()) if calls.exists() else 0
+
+def _touch(p, delta):
+    st = p.stat(); os.utime(p, ns=(st.st_atime_ns, st.st_mtime_ns + delta))
+
+@pytest.mark.skipif(os.name == "nt", reason="shebang script")
+def test_version_is_probed_again_when_the_executable_changes(m, tool):
+    exe, spawned = tool
+    assert m.gallery_dl_version(str(exe), str(exe)) == "1.2.3" and spawned() == 1
+    assert m.gallery_dl_version(str(exe), str(exe)) == "1.2.3" and spawned() == 1
+    m._TOOLS["disk"] = None  # a new process: the answer comes from config/tool-cache.json
+    assert m.gallery_dl_version(str(exe), str(exe)) == "1.2.3" and spawned() == 1
+    _touch(exe, 10 ** 9)  # upgraded in place
+    assert m.gallery_dl_version(str(exe), str(exe)) == "1.2.3" and spawned() == 2
+    assert m.gallery_dl_version(str(exe), str(exe), refresh=True) and spawned() == 3
+
+def test_find_is_probed_again_when_the_executable_changes(m, tool, monkeypatch):
+    exe, _ = tool; probes = []
+    real = m._find_gallery_dl
+    monkeypatch.setattr(m, "_find_gallery_dl", lambda app: probes.append(1) or real(app))
+    app = {"gallery_dl_path": str(exe)}
+    assert m.find_gallery_dl(app) == (str(exe), str(exe)) and m.find_gallery_dl(app) == (str(exe), str(exe))
+    assert len(probes) == 1
+    _touch(exe, 10 ** 9)
+    m.find_gallery_dl(app)
+    assert len(probes) == 2
+    m.find_gallery_dl({"gallery_dl_path": str(exe) + " --config x"})  # another setting is another key
+    assert len(probes) == 3
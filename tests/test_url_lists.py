@@ -0,0 +1,55 @@
+import os
+
+import pytest
+
+from conftest import write_list
+
+
+@pytest.mark.parametrize("a,b", [
+    ("http://Example.com/a/", "https://example.com/a"),
+    ("https://example.com:443/a#frag", "https://example.com/a"),
+    ("HTTPS://EXAMPLE.com/a?x=1", "https://example.com/a?x=1"),
+])
+def test_url_key_same(m, a, b):
+    assert m.url_key(a) == m.url_key(b)
+
+@pytest.mark.parametrize("a,b", [
+    ("https://example.com/A", "https://example.com/a"),       # paths are case-sensitive
+    ("https://example.com/a?x=1", "https://example.com/a?x=2"),
+    ("https://example.com:8080/a", "https://example.com/a"),
+])
+def test_url_key_different(m, a, b):
+    assert m.url_key(a) != m.url_key(b)
+
+def test_url_key_not_a_url(m):
+    assert m.url_key("just text") == "just text"
+
+def test_read_site_urls_skips_and_dedups(m):
+    write_list(m, "s", ["https://a.example/1", "", "# comment", "- https://a.example/off", "* starred", "42",
+                        "http://A.example/1/", "https://a.example/2"])
+    write_list(m, "s", ["https://a.example/2#x", "https://a.example/3"], name="part1.txt")
+    info = {}
+    assert m.read_site_urls("s", info) == ("https://a.example/1", "https://a.example/2", "https://a.example/3")
+    assert info["dupes"] == 2
+
+def test_read_site_urls_shared_and_cached_on_disk(m, monkeypatch):
+    write_list(m, "s", [f"https://a.example/{i}" for i in range(5)] + ["https://a.example/0"])
+    first = m.read_site_urls("s")
+    assert m.read_site_urls("s") is first  # no copy per call
+    m._URL_LISTS.clear()  # a new process: served from config/url-cache without parsing
+    monkeypatch.setattr(m, "iter_site_urls", None)
+    info = {}
+    assert m.read_site_urls("s", info) == first and info["dupes"] == 1
+
+def test_read_site_urls_reparses_on_change(m):
+    p = write_list(m, "s", ["https://a.example/1"])
+    assert m.read_site_urls("s") == ("https://a.example/1",)
+    p.write_text("https://a.example/1\nhttps://a.example/2\n", encoding="utf-8")
+    st = p.stat(); os.utime(p, (st.st_atime, st.st_mtime + 5))
+    assert m.read_site_urls("s") == ("https://a.example/1", "https://a.example/2")
+
+def test_empty_list(m):
+    write_list(m, "s", ["# nothing yet"])
+    assert m.read_site_urls("s") == ()
+    m._URL_LISTS.clear()
+    assert m.read_site_urls("s") == ()
@@ -0,0 +1,21 @@
+def _row(m, url):
+    return m.url_state_for_site("s")[url]
+
+def test_recheck_interval_doubles_per_empty_run(m):
+    cfg = {"min_recheck_hours": 2, "max_recheck_hours": 10}
+    for _ in range(2): m.url_state_record("s", "https://a.example/1", 0, 1.0, 0)
+    assert _row(m, "https://a.example/1")["zero_streak"] == 2 and m.recheck_interval_hours(_row(m, "https://a.example/1"), cfg) == 8
+    m.url_state_record("s", "https://a.example/1", 0, 1.0, 0)
+    assert m.recheck_interval_hours(_row(m, "https://a.example/1"), cfg) == 10  # capped
+    m.url_state_record("s", "https://a.example/1", 4, 1.0, None)  # failures don't touch the streak
+    assert _row(m, "https://a.example/1")["zero_streak"] == 3 and m.url_is_due(_row(m, "https://a.example/1"), cfg)
+
+def test_zero_streak_follows_parsed_output(m, gdl):
+    new, unparsed = "https://a.example/new1", "https://a.example/nolist1"
+    gdl("s", [new, unparsed])
+    for url in (new, unparsed):
+        for _ in range(3): m.url_state_record("s", url, 0, 1.0, 0)
+    m.run_site("s", m.load_app_settings())
+    assert (_row(m, new)["zero_streak"], _row(m, new)["last_new_items"]) == (0, 1)
+    assert (_row(m, unparsed)["zero_streak"], _row(m, unparsed)["last_new_items"]) == (3, None)  # unknown: streak unchanged
+    assert _row(m, unparsed)["attempts"] == 4 and _row(m, unparsed)["last_rc"] == 0
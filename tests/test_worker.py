@@ -0,0 +1,76 @@
+import os
+import signal
+import sys
+import threading
+import time
+
+import pytest
+
+from conftest import FAKE_GDL
+
+# A fake `gallery_dl` package for the resident worker: per URL "fail" → rc 4, "die" kills the
+# worker process, "slow" hangs; an existing <package>/broken file makes the import fail.
+FAKE_PKG = {
+    "__init__.py": r'''
+import os, sys, time
+if os.path.exists(os.path.join(os.path.dirname(__file__), "broken")): raise ImportError("broken install")
+__version__ = "0.0-test"
+def main():
+    args = sys.argv[1:]; dest = args[args.index("--dest") + 1]; rc = 0
+    for u in [a for a in args if a.startswith("http")]:
+        if "die" in u: os._exit(9)
+        if "slow" in u: time.sleep(30)
+        if "fail" in u: sys.stderr.write("[fake][error] HttpError: '404 Not Found' for '%s'\n" % u); rc |= 4; continue
+        print("# " + os.path.join(dest, u.rsplit("/", 1)[-1] + ".bin"))
+    return rc
+''',
+    "config.py": "def clear(): pass\n",
+    "job.py": "class Job:\n    ulog = None\n",
+}
+
+
+@pytest.fixture
+def worker(m, tmp_path, monkeypatch):
+    pkg = tmp_path / "fake" / "gallery_dl"; pkg.mkdir(parents=True)
+    for name, src in FAKE_PKG.items(): (pkg / name).write_text(src, encoding="utf-8")
+    monkeypatch.setenv("PYTHONPATH", str(pkg.parent))
+    w = m.GdlWorker([sys.executable])
+    yield w
+    w.close(kill=True)
+
+def _run(m, w, url, invocation="unused"):
+    out = m.GdlOutput(echo=False)
+    rc = m.run_gallery_dl(invocation, url, m.DIR_DOWNLOADS, m.DIR_ARCHIVES / "s.sqlite", "", "", worker=w, out=out)
+    return rc, out
+
+def test_rc_per_url_in_one_worker(m, worker):
+    rc, out = _run(m, worker, "https://a.example/1")
+    assert rc == 0 and out.skipped_files == 1 and worker.version == "0.0-test"
+    pid = worker.proc.pid
+    rc, out = _run(m, worker, "https://a.example/fail")
+    assert rc == 4 and out.errors == 1
+    assert _run(m, worker, "https://a.example/2")[0] == 0
+    assert worker.proc.pid == pid  # the same child served every URL
+
+def test_dead_worker_restarts_or_falls_back(m, worker, tmp_path):
+    script = tmp_path / "fake_gdl.py"; script.write_text(FAKE_GDL, encoding="utf-8")
+    invocation = f"{sys.executable} {script}"
+    assert _run(m, worker, "https://a.example/1", invocation)[0] == 0
+    assert _run(m, worker, "https://a.example/die", invocation)[0] == 9  # that URL fails with the child's rc
+    assert worker.proc is None
+    assert _run(m, worker, "https://a.example/2", invocation)[0] == 0  # a fresh worker takes the next one
+    worker.proc.kill(); worker.proc.wait()
+    (tmp_path / "fake" / "gallery_dl" / "broken").write_text("", encoding="utf-8")  # and can't come back
+    rc, out = _run(m, worker, "https://a.example/3", invocation)
+    assert rc == 0 and out.new_files == 1 and not worker.usable
+    assert (m.DIR_DOWNLOADS / "3.bin").exists()  # downloaded by a per-URL process
+
+def test_abort_kills_the_worker(m, worker):
+    assert _run(m, worker, "https://a.example/1")[0] == 0
+    proc = worker.proc
+    threading.Timer(0.3, lambda: os.kill(os.getpid(), signal.SIGINT)).start()
+    t0 = time.time()
+    assert _run(m, worker, "https://a.example/slow")[0] == 130
+    assert time.time() - t0 < 5 and worker.proc is None and proc.poll() is not None
+    m.reset_abort()
+    assert _run(m, worker, "https://a.example/2")[0] == 0 and worker.proc.pid != proc.pid